@@ -6,6 +6,7 @@ Main entry point for the application
 
 import os
 import sys
+import asyncio
 import argparse
 import logging
 from pathlib import Path
@@ -19,23 +20,23 @@ from src.core.task_manager import TaskManager
 from src.database.connection import DatabaseConnection
 from src.llm.llm_manager import LLMManager
 from src.utils.config import Config
+from src.utils.logger import setup_logging
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('db_gpt.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 logger = logging.getLogger(__name__)
 
 
+def run_event_loop(coro):
+    """Run a coroutine on uvloop when it is installed, else on the default asyncio loop"""
+    try:
+        import uvloop  # type: ignore[import-not-found]
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
+
+
 def main():
     """Main entry point for DB-GPT application"""
     parser = argparse.ArgumentParser(description='DB-GPT: BabyAGI with Database Integration')
@@ -45,16 +46,24 @@ def main():
                        help='Path to configuration file')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Enable verbose logging')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Disable reuse of LLM responses for repeated task results')
     
     args = parser.parse_args()
     
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
-    
     try:
         # Load configuration
         config = Config(args.config)
         
+        # Configure logging
+        logging_config = dict(config.logging)
+        if args.verbose:
+            logging_config['level'] = 'DEBUG'
+        setup_logging(logging_config)
+        
+        if args.no_cache:
+            config.set('agent.llm_cache', False)
+        
         # Initialize components
         logger.info("Initializing DB-GPT components...")
         
@@ -73,7 +82,7 @@ def main():
         logger.info(f"Starting DB-GPT with objective: {args.objective}")
         
         # Start the main execution loop
-        agent_manager.run(args.objective)
+        run_event_loop(agent_manager.run_async(args.objective))
         
     except KeyboardInterrupt:
         logger.info("Received interrupt signal, shutting down gracefully...")
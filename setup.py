@@ -15,6 +15,23 @@ def read_requirements():
     with open("requirements.txt", "r", encoding="utf-8") as fh:
         return [line.strip() for line in fh if line.strip() and not line.startswith("#")]
 
+# Optionally compile the task loop modules to C extensions with mypyc
+# (DB_GPT_MYPYC=1). Compiled classes cannot be monkey-patched, so the test
+# suite runs against the pure-Python sources.
+def native_modules():
+    if os.environ.get("DB_GPT_MYPYC") != "1":
+        return []
+    from mypyc.build import mypycify
+    return mypycify([
+        "--ignore-missing-imports",
+        "--follow-imports=silent",
+        "src/core/prompts.py",
+        "src/core/task_loop.py",
+        "src/core/task_manager.py",
+        "src/core/agent_manager.py",
+        "src/core/babyagi.py",
+    ])
+
 setup(
     name="db-gpt",
     version="0.1.0",
@@ -42,6 +59,7 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=read_requirements(),
+    ext_modules=native_modules(),
     extras_require={
         "dev": [
             "pytest>=7.4.0",
@@ -2,8 +2,9 @@
 Core components for DB-GPT
 """
 
+from .task_loop import TaskLoop
 from .agent_manager import AgentManager
 from .task_manager import TaskManager
 from .babyagi import BabyAGI
 
-__all__ = ["AgentManager", "TaskManager", "BabyAGI"] 
\ No newline at end of file
+__all__ = ["TaskLoop", "AgentManager", "TaskManager", "BabyAGI"] 
\ No newline at end of file
@@ -2,17 +2,49 @@
 Agent Manager for coordinating multiple AI agents
 """
 
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Any, Optional
+import sys
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 from ..llm.llm_manager import LLMManager
 from ..database.connection import DatabaseConnection
 from ..utils.config import Config
+from .prompts import (
+    ANALYSIS_PROMPT_PREFIX, GENERAL_PROMPT_PREFIX, SCHEMA_PROMPT_PREFIX, SQL_PROMPT_PREFIX
+)
+from .task_loop import TaskLoop
+from .task_manager import _SLOTS
 
 logger = logging.getLogger(__name__)
 
+# Rank used to order pending tasks (lower runs first)
+PRIORITY_ORDER = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
+
+# Capabilities that select an execution kind, in order of precedence; agents
+# with none of them run general tasks
+CAPABILITY_ORDER = ('sql_generation', 'data_analysis', 'schema_design')
+
+# Handler method for each execution kind (looked up by name on the instance)
+TASK_HANDLERS = {
+    'sql_generation': '_execute_sql_task',
+    'data_analysis': '_execute_analysis_task',
+    'schema_design': '_execute_schema_task',
+    'general': '_execute_general_task',
+}
+
+# Execution kinds: instructions and the result key the LLM response is stored under
+TASK_KINDS = {
+    'sql_generation': (SQL_PROMPT_PREFIX, 'sql_query'),
+    'data_analysis': (ANALYSIS_PROMPT_PREFIX, 'analysis'),
+    'schema_design': (SCHEMA_PROMPT_PREFIX, 'schema_recommendations'),
+    'general': (GENERAL_PROMPT_PREFIX, 'response'),
+}
+
 
 class AgentRole(Enum):
     """Enumeration of available agent roles"""
@@ -21,104 +53,86 @@ class AgentRole(Enum):
     RESEARCHER = "researcher"
 
 
-@dataclass
+# Position of each role in AgentManager's per-role agent tuple
+ROLE_INDEX = {role: index for index, role in enumerate(AgentRole)}
+
+
+@dataclass(frozen=True, **_SLOTS)
 class Agent:
     """Represents an AI agent with specific capabilities"""
     name: str
     role: AgentRole
     description: str
-    capabilities: List[str]
+    capabilities: FrozenSet[str]
     is_active: bool = True
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'capabilities', frozenset(self.capabilities))
+
+
+@lru_cache(maxsize=64)
+def _make_agent(name: str, description: str, capabilities: FrozenSet[str]) -> Agent:
+    """Build an agent for a configured role (agents are immutable, so managers share them)"""
+    # Task role lookups hash the same interned string every time
+    name = sys.intern(name)
+    return Agent(name=name, role=AgentRole(name), description=description, capabilities=capabilities)
 
 
-class AgentManager:
+class AgentManager(TaskLoop):
     """Manages multiple AI agents for collaborative database tasks"""
     
+    # Kept apart from BabyAGI's log when both run in one directory
+    results_log_file = 'agent_results.jsonl'
+    
     def __init__(self, config: Dict[str, Any], llm_manager: LLMManager, 
                  db_connection: DatabaseConnection):
         self.config = config
-        self.llm_manager = llm_manager
         self.db_connection = db_connection
         self.agents: Dict[str, Agent] = {}
-        self.current_objective: Optional[str] = None
+        self._agent_kinds: Dict[str, str] = {}
         self.task_history: List[Dict[str, Any]] = []
+        self._pending_heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._task_counter = itertools.count()
+        super().__init__(llm_manager)
         
         self._initialize_agents()
     
+    @property
+    def current_objective(self) -> Optional[str]:
+        """The objective being worked on"""
+        return self.objective
+    
+    @current_objective.setter
+    def current_objective(self, objective: Optional[str]):
+        self.objective = objective
+    
+    def _setting(self, name: str, default: Any) -> Any:
+        """Look up a value in the agent configuration"""
+        return self.config.get(name, default)
+    
     def _initialize_agents(self):
         """Initialize agents based on configuration"""
         for role_config in self.config.get('roles', []):
-            role = AgentRole(role_config['name'])
-            agent = Agent(
-                name=role_config['name'],
-                role=role,
-                description=role_config['description'],
-                capabilities=role_config['capabilities']
-            )
+            agent = _make_agent(role_config['name'], role_config['description'],
+                                frozenset(role_config['capabilities']))
             self.agents[agent.name] = agent
+            self._agent_kinds[agent.name] = self._agent_kind(agent)
             logger.info(f"Initialized agent: {agent.name} - {agent.description}")
+        self._agents_by_role = tuple(self.agents.get(role.value) for role in AgentRole)
     
-    def run(self, objective: str):
-        """Main execution loop for the agent system"""
-        self.current_objective = objective
-        logger.info(f"Starting agent system with objective: {objective}")
-        
-        # Create initial task
-        initial_task = self._create_initial_task(objective)
-        self.task_history.append(initial_task)
-        
-        iteration = 0
-        max_iterations = self.config.get('max_iterations', 10)
-        
-        while iteration < max_iterations:
-            logger.info(f"Starting iteration {iteration + 1}/{max_iterations}")
-            
-            # Get next task
-            current_task = self._get_next_task()
-            if not current_task:
-                logger.info("No more tasks to execute")
-                break
-            
-            # Execute task with appropriate agent
-            result = self._execute_task(current_task)
-            
-            # Create new tasks based on result
-            new_tasks = self._create_new_tasks(result)
-            self.task_history.extend(new_tasks)
-            
-            iteration += 1
-            
-            # Check for completion
-            if self._is_objective_complete(result):
-                logger.info("Objective completed successfully")
-                break
-        
-        # Generate final summary
-        self._generate_summary()
+    def agent_for(self, role: AgentRole) -> Optional[Agent]:
+        """Get the agent configured for a role, or None if there is none"""
+        return self._agents_by_role[ROLE_INDEX[role]]
     
-    def _create_initial_task(self, objective: str) -> Dict[str, Any]:
-        """Create the initial task from the objective"""
-        prompt = f"""
-        Given the objective: "{objective}"
-        
-        Break this down into the first task that needs to be completed.
-        Consider what database queries, analysis, or setup might be needed.
-        
-        Return a JSON object with:
-        - task_id: unique identifier
-        - task_name: descriptive name
-        - task_description: detailed description
-        - priority: HIGH, MEDIUM, or LOW
-        - agent_role: which agent should handle this (analyst, engineer, researcher)
-        - expected_output: what should be produced
-        """
-        
-        response = self.llm_manager.generate(prompt)
-        # Parse response and create task
-        # This is a simplified version - in practice, you'd parse the JSON response
+    def _initial_task_from_response(self, objective: str, response: str) -> Dict[str, Any]:
+        """Build the initial task from the LLM response"""
+        tasks = self._tasks_from_response(response)
+        if tasks:
+            return tasks[0]
         
+        logger.warning("Could not parse the initial task from the LLM response, using a default task")
         return {
-            'task_id': f"task_{len(self.task_history) + 1}",
+            'task_id': self._next_task_id(),
             'task_name': f"Initial analysis of: {objective}",
             'task_description': f"Begin analysis of the objective: {objective}",
             'priority': 'HIGH',
@@ -127,192 +141,135 @@ class AgentManager:
             'status': 'pending'
         }
     
+    def _enqueue(self, task: Dict[str, Any]):
+        """Record a task and queue it for execution by priority"""
+        task.setdefault('status', 'pending')
+        rank = PRIORITY_ORDER.get(task['priority'], len(PRIORITY_ORDER))
+        heapq.heappush(self._pending_heap, (rank, next(self._task_counter), task))
+        self.task_history.append(task)
+    
     def _get_next_task(self) -> Optional[Dict[str, Any]]:
         """Get the next highest priority task"""
-        pending_tasks = [task for task in self.task_history if task['status'] == 'pending']
-        if not pending_tasks:
-            return None
-        
-        # Sort by priority
-        priority_order = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
-        pending_tasks.sort(key=lambda x: priority_order.get(x['priority'], 4))
-        
-        return pending_tasks[0]
+        return heapq.heappop(self._pending_heap)[2] if self._pending_heap else None
+    
+    def _get_next_tasks(self, limit: int) -> List[Dict[str, Any]]:
+        """Get up to ``limit`` pending tasks in priority order"""
+        return [heapq.heappop(self._pending_heap)[2]
+                for _ in range(min(limit, len(self._pending_heap)))]
     
     def _execute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a task using the appropriate agent"""
         logger.info(f"Executing task: {task['task_name']}")
         
         agent_role = task['agent_role']
-        agent = self.agents.get(agent_role)
+        kind = self._agent_kinds.get(agent_role)
         
-        if not agent:
+        if kind is None:
             logger.error(f"No agent found for role: {agent_role}")
             return {'status': 'error', 'message': f'No agent for role {agent_role}'}
         
-        # Execute based on agent capabilities
-        if 'sql_generation' in agent.capabilities:
-            result = self._execute_sql_task(task)
-        elif 'data_analysis' in agent.capabilities:
-            result = self._execute_analysis_task(task)
-        elif 'schema_design' in agent.capabilities:
-            result = self._execute_schema_task(task)
-        else:
-            result = self._execute_general_task(task)
+        # Execute with the handler chosen from the agent's capabilities
+        result = getattr(self, TASK_HANDLERS[kind])(task)
         
-        # Update task status
-        task['status'] = 'completed'
-        task['result'] = result
+        self._complete_task(task, result)
+        return result
+    
+    async def _aexecute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a task asynchronously using the appropriate agent"""
+        logger.info(f"Executing task: {task['task_name']}")
         
+        execution = self._execution_prompt(task)
+        if execution is None:
+            logger.error(f"No agent found for role: {task['agent_role']}")
+            return {'status': 'error', 'message': f"No agent for role {task['agent_role']}"}
+        
+        kind, prompt = execution
+        result = self._task_result(kind, await self._agenerate(prompt))
+        
+        self._complete_task(task, result)
         return result
     
+    def _agent_kind(self, agent: Agent) -> str:
+        """Pick the execution kind for an agent from its capabilities"""
+        return next((kind for kind in CAPABILITY_ORDER if kind in agent.capabilities), 'general')
+    
+    def _execution_prompt(self, task: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Build the execution prompt for a task handled by a known agent"""
+        kind = self._agent_kinds.get(task['agent_role'])
+        if kind is None:
+            return None
+        return kind, self._task_prompt(TASK_KINDS[kind][0], task)
+    
+    def _task_result(self, kind: str, response: str) -> Dict[str, Any]:
+        """Build a task result from the LLM response"""
+        return {
+            'type': kind,
+            TASK_KINDS[kind][1]: response,
+            'status': 'success'
+        }
+    
+    def _complete_task(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Update task status with its result"""
+        task['status'] = 'completed'
+        task['result'] = result
+    
+    def _record_result(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Append a completed task to the results log and drop its in-memory result"""
+        if task.get('status') != 'completed':
+            return
+        self.result_log.append(dict(task))
+        task.pop('result', None)
+    
     def _execute_sql_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute SQL generation task"""
-        prompt = f"""
-        Task: {task['task_description']}
-        
-        Generate SQL queries to accomplish this task. Consider:
-        1. What tables might be involved
-        2. What data needs to be retrieved or analyzed
-        3. Any joins, aggregations, or filtering needed
-        
-        Return the SQL query and explain what it does.
-        """
+        prompt = self._task_prompt(SQL_PROMPT_PREFIX, task)
         
         response = self.llm_manager.generate(prompt)
         
         # In a real implementation, you'd parse the SQL and execute it
         # For now, return the response
-        return {
-            'type': 'sql_generation',
-            'sql_query': response,
-            'status': 'success'
-        }
+        return self._task_result('sql_generation', response)
     
     def _execute_analysis_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute data analysis task"""
-        prompt = f"""
-        Task: {task['task_description']}
-        
-        Analyze the data and provide insights. Consider:
-        1. Key patterns or trends
-        2. Anomalies or outliers
-        3. Business implications
-        4. Recommendations
-        
-        Provide a comprehensive analysis.
-        """
+        prompt = self._task_prompt(ANALYSIS_PROMPT_PREFIX, task)
         
         response = self.llm_manager.generate(prompt)
         
-        return {
-            'type': 'data_analysis',
-            'analysis': response,
-            'status': 'success'
-        }
+        return self._task_result('data_analysis', response)
     
     def _execute_schema_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute schema design task"""
-        prompt = f"""
-        Task: {task['task_description']}
-        
-        Design or optimize database schema. Consider:
-        1. Table structure and relationships
-        2. Indexing strategies
-        3. Data types and constraints
-        4. Performance optimization
-        
-        Provide schema recommendations.
-        """
+        prompt = self._task_prompt(SCHEMA_PROMPT_PREFIX, task)
         
         response = self.llm_manager.generate(prompt)
         
-        return {
-            'type': 'schema_design',
-            'schema_recommendations': response,
-            'status': 'success'
-        }
+        return self._task_result('schema_design', response)
     
     def _execute_general_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute general task"""
-        prompt = f"""
-        Task: {task['task_description']}
-        
-        Provide a comprehensive response to accomplish this task.
-        """
+        prompt = self._task_prompt(GENERAL_PROMPT_PREFIX, task)
         
         response = self.llm_manager.generate(prompt)
         
-        return {
-            'type': 'general',
-            'response': response,
-            'status': 'success'
-        }
-    
-    def _create_new_tasks(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Create new tasks based on the result of the previous task"""
-        prompt = f"""
-        Based on the completed task result:
-        {result}
-        
-        And the original objective: {self.current_objective}
-        
-        What are the next logical tasks that should be created?
-        Consider what follow-up actions, deeper analysis, or new directions are needed.
-        
-        Return a list of new tasks in JSON format.
-        """
-        
-        response = self.llm_manager.generate(prompt)
-        
-        # In practice, you'd parse the JSON response
-        # For now, return an empty list
-        return []
+        return self._task_result('general', response)
     
-    def _is_objective_complete(self, result: Dict[str, Any]) -> bool:
-        """Check if the objective has been completed"""
-        prompt = f"""
-        Original objective: {self.current_objective}
-        Latest result: {result}
-        
-        Has the objective been fully completed? Consider:
-        1. All required analysis done
-        2. All necessary insights generated
-        3. All actionable recommendations provided
-        
-        Answer with just 'YES' or 'NO'.
-        """
-        
-        response = self.llm_manager.generate(prompt)
-        return 'YES' in response.upper()
+    def _new_tasks_from_response(self, response: str) -> List[Dict[str, Any]]:
+        """Build follow-up tasks from the LLM response"""
+        return self._tasks_from_response(response)
     
-    def _generate_summary(self):
-        """Generate a final summary of all completed work"""
-        logger.info("Generating final summary...")
-        
-        completed_tasks = [task for task in self.task_history if task['status'] == 'completed']
-        
-        summary_prompt = f"""
-        Original objective: {self.current_objective}
-        
-        Completed tasks:
-        {completed_tasks}
-        
-        Generate a comprehensive summary of:
-        1. What was accomplished
-        2. Key findings and insights
-        3. Recommendations and next steps
-        4. Any limitations or areas for improvement
-        """
-        
-        summary = self.llm_manager.generate(summary_prompt)
-        
+    def _write_summary(self, summary: str):
+        """Log the final summary and save it to file"""
         logger.info("Final Summary:")
         logger.info(summary)
         
         # Save summary to file
         with open('result_summary.txt', 'w') as f:
-            f.write(f"DB-GPT Execution Summary\n")
-            f.write(f"Objective: {self.current_objective}\n")
-            f.write(f"Tasks completed: {len(completed_tasks)}\n")
-            f.write(f"\nSummary:\n{summary}\n") 
\ No newline at end of file
+            f.write(
+                f"DB-GPT Execution Summary\n"
+                f"Objective: {self.objective}\n"
+                f"Tasks completed: {len(self.result_log)}\n"
+                f"\nSummary:\n{summary}\n"
+            )
+        
+        self.result_log.close() 
\ No newline at end of file
@@ -4,16 +4,33 @@ Provides the foundational task execution framework
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
 from ..llm.llm_manager import LLMManager
 from ..database.connection import DatabaseConnection
+from ..utils.cache import make_cache_key
+from ..utils.json_utils import dumps, loads
+from .prompts import GENERAL_PROMPT_PREFIX, SQL_PROMPT_PREFIX
+from .task_loop import TaskLoop
 from .task_manager import TaskManager, Task, TaskPriority, TaskStatus
 
 logger = logging.getLogger(__name__)
 
+# Results carry raw time.time_ns() stamps; they are formatted in this zone
+# only when the detailed results are written
+_LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# Write buffer for detailed_results.json, so records reach the file in large chunks
+DETAILED_RESULTS_BUFFER = 64 * 1024
+
+
+def _format_ts(ts_ns: int) -> str:
+    """Format a time.time_ns() stamp as an ISO 8601 string"""
+    return datetime.fromtimestamp(ts_ns / 1e9, tz=_LOCAL_TZ).isoformat()
+
 
 @dataclass
 class BabyAGIConfig:
@@ -23,9 +40,15 @@ class BabyAGIConfig:
     human_input_mode: str = "NEVER"  # NEVER, ALWAYS, TERMINATE
     task_list_file: str = "task_list.json"
     result_summary_file: str = "result_summary.json"
+    results_log_file: str = "babyagi_results.jsonl"  # every task result, appended as it completes
+    result_summary_window: int = 100  # most recent results kept in memory for the summary
+    max_concurrency: int = 4  # cap on in-flight LLM requests in run_async
+    max_parallel_tasks: int = 1  # tasks per iteration (batched in run, concurrent in run_async)
+    llm_cache: bool = True  # reuse follow-up/completion responses for repeated results
+    llm_cache_size: int = 256
 
 
-class BabyAGI:
+class BabyAGI(TaskLoop):
     """
     BabyAGI: An AI agent that can generate and execute tasks based on an objective
     """
@@ -33,113 +56,80 @@ class BabyAGI:
     def __init__(self, config: BabyAGIConfig, llm_manager: LLMManager, 
                  db_connection: DatabaseConnection):
         self.config = config
-        self.llm_manager = llm_manager
         self.db_connection = db_connection
         self.task_manager = TaskManager({
             'task_list_file': config.task_list_file,
             'result_summary_file': config.result_summary_file
         })
         
-        self.objective: Optional[str] = None
         self.task_list: List[Dict[str, Any]] = []
-        self.result_summary: List[Dict[str, Any]] = []
-        self.current_task_id = 1
+        self.current_task_id = 1  # id given to the next task created
+        self._consecutive_auto_reply = 0
+        super().__init__(llm_manager)
     
-    def run(self, objective: str):
-        """
-        Run the BabyAGI agent with a given objective
-        
-        Args:
-            objective (str): The main objective to accomplish
-        """
-        self.objective = objective
-        logger.info(f"Starting BabyAGI with objective: {objective}")
-        
-        # Create the first task
-        first_task = self._create_first_task(objective)
-        self.task_list.append(first_task)
-        
-        # Main execution loop
-        iteration = 0
-        consecutive_auto_reply = 0
-        
-        while iteration < self.config.max_iterations:
-            logger.info(f"Starting iteration {iteration + 1}/{self.config.max_iterations}")
-            
-            # Get the next task
-            if not self.task_list:
-                logger.info("No more tasks to execute")
-                break
-            
-            current_task = self.task_list[0]
-            task_id = current_task['task_id']
-            
-            # Execute the task
-            logger.info(f"Executing task {task_id}: {current_task['task_name']}")
-            result = self._execute_task(current_task)
-            
-            # Add result to summary
-            self.result_summary.append({
-                'task_id': task_id,
-                'task_name': current_task['task_name'],
-                'result': result,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Remove the completed task
-            self.task_list.pop(0)
-            
-            # Create new tasks based on the result
-            new_tasks = self._create_new_tasks(result)
-            self.task_list.extend(new_tasks)
-            
-            # Check if we should ask for human input
-            if self.config.human_input_mode == "ALWAYS":
+    def _setting(self, name: str, default: Any) -> Any:
+        """Look up a value in the BabyAGI configuration"""
+        return getattr(self.config, name, default)
+    
+    @property
+    def result_summary(self) -> List[Dict[str, Any]]:
+        """Most recent task results (the full history lives in the results log)"""
+        return list(self.result_log.recent)
+    
+    def _enqueue(self, task: Dict[str, Any]):
+        """Queue a task at the end of the task list"""
+        self.task_list.append(task)
+    
+    def _get_next_tasks(self, limit: int) -> List[Dict[str, Any]]:
+        """Take up to ``limit`` tasks from the front of the task list"""
+        batch = self.task_list[:limit]
+        del self.task_list[:len(batch)]
+        for task in batch:
+            logger.info(f"Executing task {task['task_id']}: {task['task_name']}")
+        return batch
+    
+    def _record_result(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Append a task result to the results log"""
+        self.result_log.append({
+            'task_id': task['task_id'],
+            'task_name': task['task_name'],
+            'result': result,
+            'ts_ns': time.time_ns()
+        })
+    
+    def _should_stop(self) -> bool:
+        """Ask for human input according to ``human_input_mode``"""
+        if self.config.human_input_mode == "ALWAYS":
+            user_input = input("Press Enter to continue or type 'stop' to end: ")
+            return user_input.lower() == 'stop'
+        elif self.config.human_input_mode == "TERMINATE":
+            if self._consecutive_auto_reply >= self.config.max_consecutive_auto_reply:
+                self._consecutive_auto_reply = 0
                 user_input = input("Press Enter to continue or type 'stop' to end: ")
-                if user_input.lower() == 'stop':
-                    break
-            elif self.config.human_input_mode == "TERMINATE":
-                if consecutive_auto_reply >= self.config.max_consecutive_auto_reply:
-                    user_input = input("Press Enter to continue or type 'stop' to end: ")
-                    if user_input.lower() == 'stop':
-                        break
-                    consecutive_auto_reply = 0
-                else:
-                    consecutive_auto_reply += 1
-            
-            iteration += 1
-            
-            # Check if objective is complete
-            if self._is_objective_complete(result):
-                logger.info("Objective completed successfully")
-                break
-        
-        # Generate final summary
-        self._generate_final_summary()
+                return user_input.lower() == 'stop'
+            self._consecutive_auto_reply += 1
+        return False
     
-    def _create_first_task(self, objective: str) -> Dict[str, Any]:
-        """Create the first task based on the objective"""
-        prompt = f"""
-        Given the objective: "{objective}"
-        
-        Create the first task that needs to be completed to achieve this objective.
-        Consider what initial analysis, data gathering, or setup might be needed.
-        
-        Return a JSON object with:
-        - task_id: "task_1"
-        - task_name: descriptive name
-        - task_description: detailed description
-        - priority: "HIGH"
-        - agent_role: "analyst"
-        - expected_output: what should be produced
-        """
-        
-        response = self.llm_manager.generate(prompt)
+    def _result_cache_key(self, kind: str, result: Dict[str, Any]) -> str:
+        """Cache key for a result, ignoring when it was produced"""
+        content = {k: v for k, v in result.items() if k != 'ts_ns'}
+        return make_cache_key(kind, self.objective, content)
+    
+    def _next_task_id(self) -> str:
+        """Allocate the next sequential task id"""
+        task_id = f'task_{self.current_task_id}'
+        self.current_task_id += 1
+        return task_id
+    
+    def _initial_task_from_response(self, objective: str, response: str) -> Dict[str, Any]:
+        """Build the first task from the LLM response"""
+        tasks = self._tasks_from_response(response)
+        if tasks:
+            return tasks[0]
         
-        # In a real implementation, you'd parse the JSON response
-        # For now, create a basic task structure
+        logger.warning("Could not parse the first task from the LLM response, using a default task")
         return {
-            'task_id': 'task_1',
+            'task_id': self._next_task_id(),
             'task_name': f'Initial analysis of: {objective}',
             'task_description': f'Begin analysis of the objective: {objective}',
             'priority': 'HIGH',
@@ -149,83 +139,53 @@ class BabyAGI:
     
     def _execute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a single task"""
-        task_description = task['task_description']
-        
-        # Generate SQL query if needed
-        if 'database' in task_description.lower() or 'query' in task_description.lower():
-            sql_prompt = f"""
-            Task: {task_description}
-            
-            Generate SQL queries to accomplish this task. Consider:
-            1. What tables might be involved
-            2. What data needs to be retrieved or analyzed
-            3. Any joins, aggregations, or filtering needed
-            
-            Return the SQL query and explain what it does.
-            """
-            
-            sql_response = self.llm_manager.generate(sql_prompt)
-            
-            # In a real implementation, you'd execute the SQL
-            # For now, return the generated query
-            return {
-                'type': 'sql_generation',
-                'sql_query': sql_response,
-                'status': 'success',
-                'timestamp': datetime.now().isoformat()
-            }
-        
-        # General task execution
-        general_prompt = f"""
-        Task: {task_description}
-        
-        Provide a comprehensive response to accomplish this task.
-        Consider the objective: {self.objective}
+        result_type, prompt = self._execution_prompt(task)
+        response = self.llm_manager.generate(prompt)
+        return self._task_result(result_type, response)
+    
+    async def _aexecute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a single task asynchronously"""
+        result_type, prompt = self._execution_prompt(task)
+        response = await self._agenerate(prompt)
+        return self._task_result(result_type, response)
+    
+    def _execution_prompt(self, task: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Build the execution prompt for a task
         
-        Include:
-        1. Analysis of the task requirements
-        2. Steps taken to complete the task
-        3. Results and findings
-        4. Any recommendations or next steps
+        Returns:
+            Tuple of (result type, prompt)
         """
+        task_description = task['task_description'].lower()
         
-        response = self.llm_manager.generate(general_prompt)
+        # Generate SQL query if needed
+        if 'database' in task_description or 'query' in task_description:
+            return 'sql_generation', self._task_prompt(SQL_PROMPT_PREFIX, task)
         
+        # General task execution
+        return 'general_task', self._task_prompt(GENERAL_PROMPT_PREFIX, task)
+    
+    def _task_result(self, result_type: str, response: str) -> Dict[str, Any]:
+        """Build the task result from the LLM response"""
+        # In a real implementation, you'd execute the generated SQL
+        # For now, return the generated query
+        response_key = 'sql_query' if result_type == 'sql_generation' else 'response'
         return {
-            'type': 'general_task',
-            'response': response,
+            'type': result_type,
+            response_key: response,
             'status': 'success',
-            'timestamp': datetime.now().isoformat()
+            'ts_ns': time.time_ns()
         }
     
-    def _create_new_tasks(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Create new tasks based on the result of the previous task"""
-        prompt = f"""
-        Based on the completed task result:
-        {result}
-        
-        And the original objective: {self.objective}
-        
-        What are the next logical tasks that should be created?
-        Consider what follow-up actions, deeper analysis, or new directions are needed.
-        
-        Return a list of new tasks in JSON format. Each task should have:
-        - task_id: "task_X" (increment from current task)
-        - task_name: descriptive name
-        - task_description: detailed description
-        - priority: HIGH, MEDIUM, or LOW
-        - agent_role: analyst, engineer, or researcher
-        - expected_output: what should be produced
-        """
-        
-        response = self.llm_manager.generate(prompt)
-        
-        # In practice, you'd parse the JSON response
-        # For now, create a simple follow-up task
-        self.current_task_id += 1
+    def _new_tasks_from_response(self, response: str) -> List[Dict[str, Any]]:
+        """Build follow-up tasks from the LLM response"""
+        tasks = self._tasks_from_response(response)
+        if tasks:
+            return tasks
         
+        # Keep the loop going with a generic follow-up when nothing parses
         return [{
-            'task_id': f'task_{self.current_task_id}',
+            'task_id': self._next_task_id(),
             'task_name': f'Follow-up analysis based on previous results',
             'task_description': f'Analyze the results from the previous task and provide deeper insights',
             'priority': 'MEDIUM',
@@ -233,71 +193,53 @@ class BabyAGI:
             'expected_output': 'Detailed analysis and recommendations'
         }]
     
-    def _is_objective_complete(self, result: Dict[str, Any]) -> bool:
-        """Check if the objective has been completed"""
-        prompt = f"""
-        Original objective: {self.objective}
-        Latest result: {result}
-        
-        Has the objective been fully completed? Consider:
-        1. All required analysis done
-        2. All necessary insights generated
-        3. All actionable recommendations provided
-        
-        Answer with just 'YES' or 'NO'.
-        """
-        
-        response = self.llm_manager.generate(prompt)
-        return 'YES' in response.upper()
-    
-    def _generate_final_summary(self):
-        """Generate a final summary of all completed work"""
-        logger.info("Generating final summary...")
-        
-        summary_prompt = f"""
-        Original objective: {self.objective}
-        
-        Completed tasks and results:
-        {self.result_summary}
-        
-        Generate a comprehensive summary of:
-        1. What was accomplished
-        2. Key findings and insights
-        3. Recommendations and next steps
-        4. Any limitations or areas for improvement
-        """
-        
-        summary = self.llm_manager.generate(summary_prompt)
-        
+    def _write_summary(self, summary: str):
+        """Log the final summary and save it along with the detailed results"""
         logger.info("Final Summary:")
         logger.info(summary)
         
         # Save summary to file
         with open(self.config.result_summary_file, 'w') as f:
-            f.write(f"BabyAGI Execution Summary\n")
-            f.write(f"Objective: {self.objective}\n")
-            f.write(f"Tasks completed: {len(self.result_summary)}\n")
-            f.write(f"\nSummary:\n{summary}\n")
-        
-        # Also save detailed results
-        import json
-        detailed_results = {
+            f.write(
+                f"BabyAGI Execution Summary\n"
+                f"Objective: {self.objective}\n"
+                f"Tasks completed: {len(self.result_log)}\n"
+                f"\nSummary:\n{summary}\n"
+            )
+        
+        # Also save detailed results, streaming them from the results log
+        # instead of holding every record in memory
+        header = dumps({
             'objective': self.objective,
-            'tasks_completed': len(self.result_summary),
+            'tasks_completed': len(self.result_log),
             'summary': summary,
-            'detailed_results': self.result_summary,
             'completed_at': datetime.now().isoformat()
-        }
-        
-        with open('detailed_results.json', 'w') as f:
-            json.dump(detailed_results, f, indent=2)
+        })
+        records = (
+            f"{',' if i else ''}\n  {dumps(self._with_timestamps(loads(line)))}"
+            for i, line in enumerate(self.result_log.lines())
+        )
+        with open('detailed_results.json', 'w', buffering=DETAILED_RESULTS_BUFFER) as f:
+            f.write(header[:-1] + ', "detailed_results": [')
+            f.writelines(records)
+            f.write('\n]}\n')
+        
+        self.result_log.close()
+    
+    def _with_timestamps(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the raw ts_ns stamps of a logged record with ISO timestamps"""
+        record['timestamp'] = _format_ts(record.pop('ts_ns'))
+        result = record.get('result')
+        if isinstance(result, dict) and 'ts_ns' in result:
+            result['timestamp'] = _format_ts(result.pop('ts_ns'))
+        return record
     
     def get_task_list(self) -> List[Dict[str, Any]]:
         """Get the current task list"""
         return self.task_list
     
     def get_result_summary(self) -> List[Dict[str, Any]]:
-        """Get the result summary"""
+        """Get the most recent task results"""
         return self.result_summary
     
     def add_task(self, task: Dict[str, Any]):
@@ -314,6 +256,9 @@ class BabyAGI:
         """Reset the BabyAGI instance"""
         self.objective = None
         self.task_list.clear()
-        self.result_summary.clear()
+        self.result_log.reset()
         self.current_task_id = 1
+        self._consecutive_auto_reply = 0
+        if self._llm_cache is not None:
+            self._llm_cache.clear()
         logger.info("Reset BabyAGI instance") 
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Prompt templates for the DB-GPT task loop
+
+Static instruction blocks are emitted verbatim at the start of each prompt
+so that backends with prefix caching (e.g. vLLM --enable-prefix-caching)
+reuse their KV cache; only the section after the separator varies.
+"""
+
+from string import Template
+
+PROMPT_SEPARATOR = "\n---\n"
+
+INITIAL_TASK_PROMPT_PREFIX = """Break the objective below down into the first task that needs to be completed.
+Consider what database queries, analysis, or setup might be needed.
+
+Return a JSON object with:
+- task_id: unique identifier
+- task_name: descriptive name
+- task_description: detailed description
+- priority: HIGH, MEDIUM, or LOW
+- agent_role: which agent should handle this (analyst, engineer, researcher)
+- expected_output: what should be produced
+"""
+
+NEW_TASKS_PROMPT_PREFIX = """Given the completed task result and the original objective below, what are the
+next logical tasks that should be created? Consider what follow-up actions,
+deeper analysis, or new directions are needed.
+
+Return a list of new tasks in JSON format. Each task should have:
+- task_id: unique identifier
+- task_name: descriptive name
+- task_description: detailed description
+- priority: HIGH, MEDIUM, or LOW
+- agent_role: analyst, engineer, or researcher
+- expected_output: what should be produced
+"""
+
+COMPLETION_PROMPT_PREFIX = """Decide whether the objective below has been fully completed. Consider:
+1. All required analysis done
+2. All necessary insights generated
+3. All actionable recommendations provided
+
+Answer with just 'YES' or 'NO'.
+"""
+
+SUMMARY_PROMPT_PREFIX = """Generate a comprehensive summary of the work below:
+1. What was accomplished
+2. Key findings and insights
+3. Recommendations and next steps
+4. Any limitations or areas for improvement
+"""
+
+SQL_PROMPT_PREFIX = """Generate SQL queries to accomplish the task below. Consider:
+1. What tables might be involved
+2. What data needs to be retrieved or analyzed
+3. Any joins, aggregations, or filtering needed
+
+Return the SQL query and explain what it does.
+"""
+
+ANALYSIS_PROMPT_PREFIX = """Analyze the data for the task below and provide insights. Consider:
+1. Key patterns or trends
+2. Anomalies or outliers
+3. Business implications
+4. Recommendations
+
+Provide a comprehensive analysis.
+"""
+
+SCHEMA_PROMPT_PREFIX = """Design or optimize the database schema for the task below. Consider:
+1. Table structure and relationships
+2. Indexing strategies
+3. Data types and constraints
+4. Performance optimization
+
+Provide schema recommendations.
+"""
+
+GENERAL_PROMPT_PREFIX = """Provide a comprehensive response to accomplish the task below. Include:
+1. Analysis of the task requirements
+2. Steps taken to complete the task
+3. Results and findings
+4. Any recommendations or next steps
+"""
+
+INITIAL_TASK_PROMPT = Template(
+    INITIAL_TASK_PROMPT_PREFIX + PROMPT_SEPARATOR
+    + 'Objective: "$objective"\n'
+)
+
+NEW_TASKS_PROMPT = Template(
+    NEW_TASKS_PROMPT_PREFIX + PROMPT_SEPARATOR
+    + "Original objective: $objective\n"
+    + "Completed task result: $result\n"
+)
+
+COMPLETION_PROMPT = Template(
+    COMPLETION_PROMPT_PREFIX + PROMPT_SEPARATOR
+    + "Original objective: $objective\n"
+    + "Latest result: $result\n"
+)
+
+SUMMARY_PROMPT = Template(
+    SUMMARY_PROMPT_PREFIX + PROMPT_SEPARATOR
+    + "Original objective: $objective\n"
+    + "Completed tasks (most recent $shown of $total):\n$results\n"
+)
+
+# Execution prompts take one of the *_PROMPT_PREFIX blocks as instructions
+TASK_PROMPT = Template(
+    "$instructions" + PROMPT_SEPARATOR
+    + "Objective: $objective\n"
+    + "Task: $task\n"
+)
@@ -0,0 +1,419 @@
+"""
+Objective-driven task loop shared by BabyAGI and the AgentManager
+"""
+
+import asyncio
+import itertools
+import logging
+import sys
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..llm.llm_manager import LLMManager
+from ..utils.cache import LRUCache, make_cache_key
+from ..utils.json_utils import parse_llm_json
+from ..utils.result_log import ResultLog
+from . import prompts
+from .task_manager import TaskPriority
+
+logger = logging.getLogger(__name__)
+
+
+class TaskLoop:
+    """
+    Create, execute and follow up on tasks until an objective is met
+    
+    Subclasses decide how pending tasks are stored (``_enqueue`` and
+    ``_get_next_tasks``) and how a task is executed (``_execute_task``);
+    the loop, the prompts and the LLM plumbing live here.
+    """
+    
+    # Where completed task records go unless configured otherwise
+    results_log_file = 'results.jsonl'
+    
+    def __init__(self, llm_manager: LLMManager):
+        self.llm_manager = llm_manager
+        self.objective: Optional[str] = None
+        self.result_log = ResultLog(
+            self._setting('results_log_file', self.results_log_file),
+            self._setting('result_summary_window', 100)
+        )
+        self._task_ids = itertools.count(1)
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+        self._llm_cache: Optional[LRUCache] = (
+            LRUCache(self._setting('llm_cache_size', 256)) if self._setting('llm_cache', True) else None
+        )
+    
+    def _setting(self, name: str, default: Any) -> Any:
+        """Look up a configuration value"""
+        raise NotImplementedError
+    
+    def run(self, objective: str):
+        """
+        Run the task loop until the objective is complete or the iteration budget is spent
+        
+        Up to ``max_parallel_tasks`` pending tasks are taken per iteration and
+        same-kind prompts among them are sent as one batched LLM request.
+        """
+        self.objective = objective
+        self.result_log.reset()
+        logger.info(f"Starting {type(self).__name__} with objective: {objective}")
+        
+        # Create initial task
+        self._enqueue(self._create_initial_task(objective))
+        
+        iteration = 0
+        max_iterations = self._setting('max_iterations', 10)
+        max_parallel_tasks = self._setting('max_parallel_tasks', 1)
+        started = time.perf_counter()
+        
+        while iteration < max_iterations:
+            logger.info(f"Starting iteration {iteration + 1}/{max_iterations}")
+            
+            # Get next batch of tasks
+            batch = self._get_next_tasks(max_parallel_tasks)
+            if not batch:
+                logger.info("No more tasks to execute")
+                break
+            
+            # Execute the batch
+            results = self._execute_tasks(batch)
+            for task, result in zip(batch, results):
+                self._record_result(task, result)
+            
+            # Create new tasks based on the results
+            for result in results:
+                for new_task in self._create_new_tasks(result):
+                    self._enqueue(new_task)
+            
+            if self._should_stop():
+                break
+            
+            iteration += 1
+            
+            # Check for completion
+            if any(self._is_objective_complete(result) for result in results):
+                logger.info("Objective completed successfully")
+                break
+        
+        self._log_loop_time(iteration, started)
+        
+        # Generate final summary
+        self._generate_summary()
+    
+    async def run_async(self, objective: str):
+        """
+        Run the task loop asynchronously
+        
+        Independent LLM calls are overlapped: the follow-up task generation and
+        the completion check for a result run concurrently, and up to
+        ``max_parallel_tasks`` pending tasks are executed side by side.
+        In-flight LLM requests are capped by ``max_concurrency``.
+        """
+        self.objective = objective
+        self.result_log.reset()
+        self._llm_slots = asyncio.Semaphore(self._setting('max_concurrency', 4))
+        logger.info(f"Starting {type(self).__name__} with objective: {objective}")
+        
+        # Create initial task
+        self._enqueue(await self._acreate_initial_task(objective))
+        
+        iteration = 0
+        max_iterations = self._setting('max_iterations', 10)
+        max_parallel_tasks = self._setting('max_parallel_tasks', 1)
+        started = time.perf_counter()
+        
+        while iteration < max_iterations:
+            logger.info(f"Starting iteration {iteration + 1}/{max_iterations}")
+            
+            # Get next batch of tasks
+            batch = self._get_next_tasks(max_parallel_tasks)
+            if not batch:
+                logger.info("No more tasks to execute")
+                break
+            
+            # Execute the batch concurrently
+            results = await asyncio.gather(*(self._aexecute_task(task) for task in batch))
+            for task, result in zip(batch, results):
+                self._record_result(task, result)
+            
+            # Create new tasks and check for completion concurrently
+            follow_ups = await asyncio.gather(*(
+                asyncio.gather(self._acreate_new_tasks(result), self._ais_objective_complete(result))
+                for result in results
+            ))
+            
+            objective_complete = False
+            for new_tasks, is_complete in follow_ups:
+                for new_task in new_tasks:
+                    self._enqueue(new_task)
+                objective_complete = objective_complete or is_complete
+            
+            if self._should_stop():
+                break
+            
+            iteration += 1
+            
+            if objective_complete:
+                logger.info("Objective completed successfully")
+                break
+        
+        self._log_loop_time(iteration, started)
+        
+        # Generate final summary
+        await self._agenerate_summary()
+    
+    def _log_loop_time(self, iterations: int, started: float):
+        """Log how long the task loop ran"""
+        elapsed = time.perf_counter() - started
+        per_iteration = elapsed / iterations if iterations else 0.0
+        logger.info(f"Task loop finished {iterations} iterations in {elapsed:.2f}s "
+                    f"({per_iteration:.2f}s per iteration)")
+    
+    def _enqueue(self, task: Dict[str, Any]):
+        """Queue a task for execution"""
+        raise NotImplementedError
+    
+    def _get_next_tasks(self, limit: int) -> List[Dict[str, Any]]:
+        """Take up to ``limit`` pending tasks in execution order"""
+        raise NotImplementedError
+    
+    def _execute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a single task"""
+        raise NotImplementedError
+    
+    def _execute_tasks(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute a batch of tasks
+        
+        Prompts of the same kind are sent to the LLM as one batched request;
+        tasks without a batchable prompt, or alone in their kind, go through
+        _execute_task.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        
+        if len(tasks) > 1:
+            groups: Dict[str, List[Tuple[int, str]]] = {}
+            for i, task in enumerate(tasks):
+                prepared = self._execution_prompt(task)
+                if prepared is not None:
+                    kind, prompt = prepared
+                    groups.setdefault(kind, []).append((i, prompt))
+            
+            for kind, members in groups.items():
+                if len(members) < 2:
+                    continue
+                logger.info(f"Executing {len(members)} {kind} tasks in one batch")
+                # Similar-length prompts waste less padding on local models
+                members.sort(key=lambda member: len(member[1]))
+                responses = self.llm_manager.batch_generate([prompt for _, prompt in members])
+                for (i, _), response in zip(members, responses):
+                    result = self._task_result(kind, response)
+                    self._complete_task(tasks[i], result)
+                    results[i] = result
+        
+        return [self._execute_task(task) if result is None else result
+                for task, result in zip(tasks, results)]
+    
+    def _execution_prompt(self, task: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """
+        Build the execution prompt for a task, if it can be batched
+        
+        Returns:
+            Tuple of (result kind, prompt), or None to execute the task on its own
+        """
+        return None
+    
+    def _task_result(self, kind: str, response: str) -> Dict[str, Any]:
+        """Build a task result from the LLM response"""
+        raise NotImplementedError
+    
+    def _complete_task(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Mark a task as completed with its result"""
+        pass
+    
+    async def _aexecute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a task without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        async with self._get_llm_slots():
+            return await loop.run_in_executor(None, self._execute_task, task)
+    
+    def _record_result(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Append a task result to the results log"""
+        self.result_log.append({
+            'task_id': task['task_id'],
+            'task_name': task['task_name'],
+            'result': result
+        })
+    
+    def _next_task_id(self) -> str:
+        """Allocate the next sequential task id"""
+        return f"task_{next(self._task_ids)}"
+    
+    def _tasks_from_response(self, response: str) -> List[Dict[str, Any]]:
+        """
+        Build tasks from the JSON object or list in an LLM response
+        
+        Entries without a name or description are skipped, unknown priorities
+        become MEDIUM and ids are always assigned locally so they stay unique.
+        """
+        parsed = parse_llm_json(response)
+        if isinstance(parsed, dict):
+            parsed = parsed.get('tasks', [parsed])
+        if not isinstance(parsed, list):
+            return []
+        
+        tasks = []
+        for item in parsed:
+            if not isinstance(item, dict):
+                continue
+            description = item.get('task_description') or item.get('task_name')
+            if not description:
+                continue
+            priority = str(item.get('priority', 'MEDIUM')).upper()
+            tasks.append({
+                'task_id': self._next_task_id(),
+                'task_name': str(item.get('task_name') or description),
+                'task_description': str(description),
+                # Interned, so priority and role lookups compare by identity
+                'priority': sys.intern(priority) if priority in TaskPriority.__members__ else 'MEDIUM',
+                'agent_role': sys.intern(str(item.get('agent_role', 'analyst')).lower()),
+                'expected_output': str(item.get('expected_output', ''))
+            })
+        return tasks
+    
+    def _should_stop(self) -> bool:
+        """Whether the loop should stop before the next iteration"""
+        return False
+    
+    async def _agenerate(self, prompt: str) -> str:
+        """Generate text asynchronously, bounded by the concurrency cap"""
+        async with self._get_llm_slots():
+            return await self.llm_manager.agenerate(prompt)
+    
+    def _get_llm_slots(self) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent LLM requests"""
+        if self._llm_slots is None:
+            self._llm_slots = asyncio.Semaphore(self._setting('max_concurrency', 4))
+        return self._llm_slots
+    
+    def _cached_generate(self, kind: str, result: Dict[str, Any], prompt: str) -> str:
+        """Generate text for a result-derived prompt, reusing the response for repeated results"""
+        if self._llm_cache is None:
+            return self.llm_manager.generate(prompt)
+        
+        key = self._result_cache_key(kind, result)
+        response = self._llm_cache.get(key)
+        if response is None:
+            response = self.llm_manager.generate(prompt)
+            self._cache_response(key, response)
+        return response
+    
+    async def _acached_generate(self, kind: str, result: Dict[str, Any], prompt: str) -> str:
+        """Async counterpart of _cached_generate"""
+        if self._llm_cache is None:
+            return await self._agenerate(prompt)
+        
+        key = self._result_cache_key(kind, result)
+        response = self._llm_cache.get(key)
+        if response is None:
+            response = await self._agenerate(prompt)
+            self._cache_response(key, response)
+        return response
+    
+    def _result_cache_key(self, kind: str, result: Dict[str, Any]) -> str:
+        """Cache key for a result-derived prompt"""
+        return make_cache_key(kind, self.objective, result)
+    
+    def _cache_response(self, key: str, response: str):
+        """Cache an LLM response unless the provider reported an error"""
+        if self._llm_cache is not None and not response.startswith("Error generating response"):
+            self._llm_cache.put(key, response)
+    
+    def _create_initial_task(self, objective: str) -> Dict[str, Any]:
+        """Create the initial task from the objective"""
+        response = self.llm_manager.generate(self._initial_task_prompt(objective))
+        return self._initial_task_from_response(objective, response)
+    
+    async def _acreate_initial_task(self, objective: str) -> Dict[str, Any]:
+        """Create the initial task from the objective asynchronously"""
+        response = await self._agenerate(self._initial_task_prompt(objective))
+        return self._initial_task_from_response(objective, response)
+    
+    def _initial_task_prompt(self, objective: str) -> str:
+        """Build the prompt used to derive the initial task"""
+        return prompts.INITIAL_TASK_PROMPT.substitute(objective=objective)
+    
+    def _initial_task_from_response(self, objective: str, response: str) -> Dict[str, Any]:
+        """Build the initial task from the LLM response"""
+        raise NotImplementedError
+    
+    def _create_new_tasks(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Create new tasks based on the result of the previous task"""
+        response = self._cached_generate('new_tasks', result, self._new_tasks_prompt(result))
+        return self._new_tasks_from_response(response)
+    
+    async def _acreate_new_tasks(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Create new tasks based on the result of the previous task asynchronously"""
+        response = await self._acached_generate('new_tasks', result, self._new_tasks_prompt(result))
+        return self._new_tasks_from_response(response)
+    
+    def _new_tasks_prompt(self, result: Dict[str, Any]) -> str:
+        """Build the prompt used to derive follow-up tasks"""
+        return prompts.NEW_TASKS_PROMPT.substitute(objective=self.objective, result=result)
+    
+    def _new_tasks_from_response(self, response: str) -> List[Dict[str, Any]]:
+        """Build follow-up tasks from the LLM response"""
+        raise NotImplementedError
+    
+    def _is_objective_complete(self, result: Dict[str, Any]) -> bool:
+        """Check if the objective has been completed"""
+        response = self._cached_generate('completion', result, self._completion_prompt(result))
+        return 'YES' in response.upper()
+    
+    async def _ais_objective_complete(self, result: Dict[str, Any]) -> bool:
+        """Check if the objective has been completed asynchronously"""
+        response = await self._acached_generate('completion', result, self._completion_prompt(result))
+        return 'YES' in response.upper()
+    
+    def _completion_prompt(self, result: Dict[str, Any]) -> str:
+        """Build the prompt used to check for objective completion"""
+        return prompts.COMPLETION_PROMPT.substitute(objective=self.objective, result=result)
+    
+    def _task_prompt(self, instructions: str, task: Dict[str, Any]) -> str:
+        """Build a task prompt from a static instruction block and the task-specific section"""
+        return prompts.TASK_PROMPT.substitute(
+            instructions=instructions,
+            objective=self.objective,
+            task=task['task_description']
+        )
+    
+    def _generate_summary(self):
+        """Generate a final summary of all completed work"""
+        logger.info("Generating final summary...")
+        summary = self.llm_manager.generate(self._summary_prompt())
+        self._write_summary(summary)
+    
+    async def _agenerate_summary(self):
+        """Generate a final summary of all completed work asynchronously"""
+        logger.info("Generating final summary...")
+        summary = await self._agenerate(self._summary_prompt())
+        # File writes happen on a worker thread so the event loop is not blocked
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_summary, summary)
+    
+    def _summary_prompt(self) -> str:
+        """Build the prompt used for the final summary"""
+        # Only the most recent results are kept in memory, which also keeps
+        # the prompt within the model's context window on long runs
+        recent = list(self.result_log.recent)
+        return prompts.SUMMARY_PROMPT.substitute(
+            objective=self.objective,
+            shown=len(recent),
+            total=len(self.result_log),
+            results=recent
+        )
+    
+    def _write_summary(self, summary: str):
+        """Log the final summary and save it"""
+        raise NotImplementedError
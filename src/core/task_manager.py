@@ -2,16 +2,70 @@
 Task Manager for handling task lifecycle
 """
 
-import json
+import atexit
+import heapq
 import logging
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+import os
+import queue
+import sys
+import threading
+import weakref
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, TextIO, Tuple
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 
+try:
+    import ijson  # type: ignore[import-not-found]
+except ImportError:
+    ijson = None
+
+from ..utils.cache import make_cache_key
+from ..utils.json_utils import dumps, dumps_bytes, loads
+
 logger = logging.getLogger(__name__)
 
 
+# Requests for the writer thread
+_WRITE = 'write'
+_STOP = 'stop'
+
+
+def _writer_loop(manager_ref: "weakref.ref[TaskManager]", write_queue: "queue.Queue[str]",
+                 interval: float):
+    """Log a manager's dirty tasks when asked to, or every ``interval`` seconds"""
+    while True:
+        try:
+            requests = [write_queue.get(timeout=interval)]
+        except queue.Empty:
+            requests = []
+        # Coalesce everything queued meanwhile into a single write
+        while True:
+            try:
+                requests.append(write_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        # Only hold the manager while writing, so it can still be collected
+        manager = manager_ref()
+        if manager is not None:
+            manager._write_dirty()
+        stop = manager is None or _STOP in requests
+        manager = None
+        
+        for _ in requests:
+            write_queue.task_done()
+        if stop:
+            return
+
+
+def _flush_at_exit(manager_ref: "weakref.ref[TaskManager]"):
+    """Write out pending task changes of a manager still alive at interpreter exit"""
+    manager = manager_ref()
+    if manager is not None:
+        manager.flush()
+
+
 class TaskPriority(Enum):
     """Task priority levels"""
     CRITICAL = "CRITICAL"
@@ -29,7 +83,30 @@ class TaskStatus(Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+def _task_number(task_id: str) -> int:
+    """Sequence number of a ``task_<n>`` id"""
+    return int(task_id.rpartition('_')[2])
+
+
+# Statuses in which a resubmitted identical task is merged into the existing one
+ACTIVE_STATUSES = (TaskStatus.PENDING, TaskStatus.IN_PROGRESS)
+
+
+def task_signature(task_name: str, task_description: str, agent_role: str,
+                   expected_output: str) -> str:
+    """Digest of the fields that make two task submissions the same work"""
+    return make_cache_key(task_name, task_description, agent_role, expected_output)
+
+
+# dataclass(slots=True) needs Python 3.10+
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Rank used to order pending tasks (lower runs first): TaskPriority lists
+# its members from most to least urgent
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(TaskPriority)}
+
+
+@dataclass(**_SLOTS)
 class Task:
     """Represents a task in the system"""
     task_id: str
@@ -39,7 +116,7 @@ class Task:
     agent_role: str
     expected_output: str
     status: TaskStatus = TaskStatus.PENDING
-    created_at: datetime = None
+    created_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     result: Optional[Dict[str, Any]] = None
@@ -48,6 +125,29 @@ class Task:
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now()
+    
+    def to_json_dict(self) -> Dict[str, Any]:
+        """JSON-serializable view of the task (``result`` is shared, not copied)"""
+        return {
+            'task_id': self.task_id,
+            'task_name': self.task_name,
+            'task_description': self.task_description,
+            'priority': self.priority.value,
+            'agent_role': self.agent_role,
+            'expected_output': self.expected_output,
+            'status': self.status.value,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'result': self.result,
+            'error_message': self.error_message
+        }
+    
+    @property
+    def signature(self) -> str:
+        """Deduplication signature of the task"""
+        return task_signature(self.task_name, self.task_description,
+                              self.agent_role, self.expected_output)
 
 
 class TaskManager:
@@ -56,43 +156,231 @@ class TaskManager:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.tasks: List[Task] = []
+        self._by_id: Dict[str, Task] = {}  # task_id -> Task, for O(1) lookups
+        # Inverted indexes (ordered sets of task ids) behind the get_tasks_by_* queries
+        self._by_status: Dict[TaskStatus, Dict[str, None]] = {}
+        self._by_priority: Dict[TaskPriority, Dict[str, None]] = {}
+        self._by_agent: Dict[str, Dict[str, None]] = {}
+        # Pending tasks as (rank, created_at, task_id); entries for tasks that
+        # have since left PENDING are dropped lazily by get_next_task
+        self._pending_heap: List[Tuple[int, datetime, str]] = []
+        # Signature -> id of the active task doing that work, for deduplication
+        self.deduplicate_tasks = config.get('deduplicate_tasks', True)
+        self._by_signature: Dict[str, str] = {}
         self.task_counter = 0
         self.task_list_file = config.get('task_list_file', 'task_list.json')
         self.result_summary_file = config.get('result_summary_file', 'result_summary.json')
         
+        # task_list_file holds a snapshot; changes since then are appended to
+        # the task log, which is folded into the snapshot once it grows past
+        # compact_log_bytes
+        self.task_log_file = config.get(
+            'task_log_file', os.path.splitext(self.task_list_file)[0] + '.log.jsonl')
+        self.compact_log_bytes = config.get('compact_log_bytes', 4 * 1024 * 1024)
+        self._log_fh: Optional[TextIO] = None
+        
+        # Mutations only mark tasks dirty; a background writer thread logs
+        # them once flush_batch_size have piled up, and otherwise every
+        # flush_interval_s
+        self.flush_batch_size = config.get('flush_batch_size', 32)
+        self.flush_interval_s = config.get('flush_interval_s', 5)
+        self._dirty: Dict[str, None] = {}  # ordered set, so tasks replay in creation order
+        self._unlogged: List[Dict[str, Any]] = []  # records of dropped tasks still to be logged
+        self._lock = threading.RLock()  # guards the tasks, indexes and dirty set
+        self._io_lock = threading.Lock()  # serializes writes to the task files
+        self._write_queue: "queue.Queue[str]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        
         self._load_tasks()
+        atexit.register(_flush_at_exit, weakref.ref(self))
     
     def _load_tasks(self):
-        """Load tasks from file if it exists"""
+        """Load the task snapshot, then replay the task log over it"""
+        tasks: Dict[str, Task] = {}
+        snapshot_counter: Optional[int] = None
         try:
-            with open(self.task_list_file, 'r') as f:
-                task_data = json.load(f)
-                for task_dict in task_data:
+            with open(self.task_list_file, 'rb') as f:
+                snapshot_counter, task_dicts = self._read_snapshot(f)
+                for task_dict in task_dicts:
                     task = self._dict_to_task(task_dict)
-                    self.tasks.append(task)
-                    self.task_counter = max(self.task_counter, int(task.task_id.split('_')[1]))
+                    tasks[task.task_id] = task
         except FileNotFoundError:
             logger.info("No existing task file found, starting fresh")
         except Exception as e:
             logger.error(f"Error loading tasks: {e}")
-    
-    def _save_tasks(self):
-        """Save tasks to file"""
+        
+        logged_ids: List[str] = []
         try:
-            task_data = [asdict(task) for task in self.tasks]
-            # Convert datetime objects to strings for JSON serialization
-            for task_dict in task_data:
-                if task_dict['created_at']:
-                    task_dict['created_at'] = task_dict['created_at'].isoformat()
-                if task_dict['started_at']:
-                    task_dict['started_at'] = task_dict['started_at'].isoformat()
-                if task_dict['completed_at']:
-                    task_dict['completed_at'] = task_dict['completed_at'].isoformat()
-            
-            with open(self.task_list_file, 'w') as f:
-                json.dump(task_data, f, indent=2)
+            with open(self.task_log_file, 'r') as f:
+                for line in f:
+                    try:
+                        task = self._dict_to_task(loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        # A crash can leave a partly written last line
+                        logger.warning(f"Skipping unreadable task log entry: {e}")
+                        continue
+                    tasks[task.task_id] = task
+                    logged_ids.append(task.task_id)
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logger.error(f"Error saving tasks: {e}")
+            logger.error(f"Error replaying task log: {e}")
+        
+        self.tasks.extend(tasks.values())
+        self._reindex()
+        
+        # The snapshot header carries the counter, so only ids logged since
+        # (or every id, for a snapshot without a header) need parsing
+        new_ids = tasks.keys() if snapshot_counter is None else logged_ids
+        self.task_counter = max(snapshot_counter or 0,
+                                max((_task_number(task_id) for task_id in new_ids), default=0))
+    
+    def _read_snapshot(self, f: BinaryIO) -> Tuple[Optional[int], Iterable[Dict[str, Any]]]:
+        """Read the task counter (None for a bare task list) and the task dicts of a snapshot"""
+        if ijson is None:
+            data = loads(f.read())
+            if isinstance(data, list):
+                return None, data
+            return data['task_counter'], data['tasks']
+        
+        # Stream the tasks one at a time; the counter header comes first, so
+        # fetching it only parses the start of the file
+        is_list = f.read(1) == b'['
+        f.seek(0)
+        if is_list:
+            return None, ijson.items(f, 'item', use_float=True)
+        task_counter = next(ijson.items(f, 'task_counter'))
+        f.seek(0)
+        return task_counter, ijson.items(f, 'tasks.item', use_float=True)
+    
+    def _reindex(self):
+        """Rebuild the lookup indexes from the task list"""
+        self._by_id = {task.task_id: task for task in self.tasks}
+        self._by_status = {status: {} for status in TaskStatus}
+        self._by_priority = {priority: {} for priority in TaskPriority}
+        self._by_agent = {}
+        self._pending_heap = []
+        self._by_signature = {}
+        for task in self.tasks:
+            self._index(task)
+    
+    def _index(self, task: Task):
+        """Add a task to the status, priority and agent indexes"""
+        self._by_status[task.status][task.task_id] = None
+        self._by_priority[task.priority][task.task_id] = None
+        self._by_agent.setdefault(task.agent_role, {})[task.task_id] = None
+        if task.status in ACTIVE_STATUSES:
+            self._by_signature[task.signature] = task.task_id
+        if task.status == TaskStatus.PENDING:
+            self._push_pending(task)
+    
+    def _push_pending(self, task: Task):
+        """Queue a pending task by priority, then creation time"""
+        created_at = task.created_at or datetime.min
+        heapq.heappush(self._pending_heap, (PRIORITY_RANK[task.priority], created_at, task.task_id))
+    
+    def _set_status(self, task: Task, status: TaskStatus):
+        """Change the status of a task and move it in the status index"""
+        del self._by_status[task.status][task.task_id]
+        task.status = status
+        self._by_status[status][task.task_id] = None
+        if status in ACTIVE_STATUSES:
+            self._by_signature[task.signature] = task.task_id
+        elif self._by_signature.get(task.signature) == task.task_id:
+            del self._by_signature[task.signature]
+        if status == TaskStatus.PENDING:
+            self._push_pending(task)
+    
+    def _compact(self):
+        """Rewrite the task snapshot and truncate the task log"""
+        with self._lock:
+            snapshot = {
+                'task_counter': self.task_counter,
+                'tasks': [task.to_json_dict() for task in self.tasks]
+            }
+        tmp_file = self.task_list_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(dumps(snapshot))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.task_list_file)
+        
+        # Every logged change is now in the snapshot
+        if self._log_fh is not None:
+            self._log_fh.close()
+        self._log_fh = open(self.task_log_file, 'w')
+    
+    def _mark_dirty(self, task_id: str):
+        """Record an unsaved change to a task for the writer thread"""
+        with self._lock:
+            self._dirty[task_id] = None
+            self._request_write(len(self._dirty) >= self.flush_batch_size)
+    
+    def _request_write(self, now: bool = True):
+        """Start the writer thread if needed and, if ``now``, wake it up"""
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=_writer_loop,
+                args=(weakref.ref(self), self._write_queue, self.flush_interval_s),
+                name='task-writer', daemon=True)
+            self._writer.start()
+        if now:
+            self._write_queue.put(_WRITE)
+    
+    def _write_dirty(self):
+        """Append the dirty tasks to the task log, compacting it once it is too big"""
+        # Writes are serialized so log lines land in the order they were taken
+        with self._io_lock:
+            with self._lock:
+                records = self._unlogged + [self._by_id[task_id].to_json_dict()
+                                            for task_id in self._dirty if task_id in self._by_id]
+                self._unlogged = []
+                self._dirty.clear()
+            if not records:
+                return
+            try:
+                if self._log_fh is None:
+                    self._log_fh = open(self.task_log_file, 'a')
+                self._log_fh.writelines(dumps(record) + '\n' for record in records)
+                self._log_fh.flush()
+            except Exception as e:
+                logger.error(f"Error saving tasks: {e}")
+                # Keep the records for the next write; replaying a record
+                # twice is harmless, losing one is not
+                with self._lock:
+                    self._unlogged = records + self._unlogged
+                self._close_log()
+                return
+            try:
+                if self._log_fh.tell() > self.compact_log_bytes:
+                    self._compact()
+            except Exception as e:
+                logger.error(f"Error compacting task log: {e}")
+    
+    def _close_log(self):
+        """Close the task log after a failed write, dropping whatever is still buffered"""
+        fh, self._log_fh = self._log_fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except OSError:
+                pass
+    
+    def flush(self):
+        """Write pending task changes to the task log before returning"""
+        self._write_dirty()
+    
+    def close(self):
+        """Stop the writer thread, flush pending changes and close the task log"""
+        if self._writer is not None:
+            self._write_queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        self._write_dirty()
+        with self._io_lock:
+            if self._log_fh is not None:
+                self._log_fh.close()
+                self._log_fh = None
     
     def _dict_to_task(self, task_dict: Dict[str, Any]) -> Task:
         """Convert dictionary to Task object"""
@@ -107,13 +395,21 @@ class TaskManager:
         # Convert string enums back to enum objects
         task_dict['priority'] = TaskPriority(task_dict['priority'])
         task_dict['status'] = TaskStatus(task_dict['status'])
+        task_dict['agent_role'] = sys.intern(task_dict['agent_role'])
         
         return Task(**task_dict)
     
     def create_task(self, task_name: str, task_description: str, 
                    priority: TaskPriority, agent_role: str, 
                    expected_output: str) -> Task:
-        """Create a new task"""
+        """Create a new task, or return the active task already doing the same work"""
+        if self.deduplicate_tasks:
+            signature = task_signature(task_name, task_description, agent_role, expected_output)
+            existing = self._by_signature.get(signature)
+            if existing is not None:
+                logger.info(f"Task already queued as {existing}: {task_name}")
+                return self._by_id[existing]
+        
         self.task_counter += 1
         task_id = f"task_{self.task_counter}"
         
@@ -122,33 +418,28 @@ class TaskManager:
             task_name=task_name,
             task_description=task_description,
             priority=priority,
-            agent_role=agent_role,
+            agent_role=sys.intern(agent_role),
             expected_output=expected_output
         )
         
         self.tasks.append(task)
-        self._save_tasks()
+        self._by_id[task_id] = task
+        self._index(task)
+        self._mark_dirty(task_id)
         
         logger.info(f"Created task: {task_id} - {task_name}")
         return task
     
     def get_next_task(self) -> Optional[Task]:
         """Get the next highest priority pending task"""
-        pending_tasks = [task for task in self.tasks if task.status == TaskStatus.PENDING]
-        
-        if not pending_tasks:
-            return None
-        
-        # Sort by priority
-        priority_order = {
-            TaskPriority.CRITICAL: 0,
-            TaskPriority.HIGH: 1,
-            TaskPriority.MEDIUM: 2,
-            TaskPriority.LOW: 3
-        }
-        
-        pending_tasks.sort(key=lambda x: priority_order.get(x.priority, 4))
-        return pending_tasks[0]
+        heap = self._pending_heap
+        while heap:
+            task = self._by_id.get(heap[0][2])
+            if task is not None and task.status == TaskStatus.PENDING:
+                return task
+            # Stale entry: the task was started, finished or cleared
+            heapq.heappop(heap)
+        return None
     
     def start_task(self, task_id: str) -> bool:
         """Mark a task as in progress"""
@@ -161,9 +452,9 @@ class TaskManager:
             logger.warning(f"Task {task_id} is not in pending status: {task.status}")
             return False
         
-        task.status = TaskStatus.IN_PROGRESS
+        self._set_status(task, TaskStatus.IN_PROGRESS)
         task.started_at = datetime.now()
-        self._save_tasks()
+        self._mark_dirty(task_id)
         
         logger.info(f"Started task: {task_id}")
         return True
@@ -175,10 +466,10 @@ class TaskManager:
             logger.error(f"Task not found: {task_id}")
             return False
         
-        task.status = TaskStatus.COMPLETED
+        self._set_status(task, TaskStatus.COMPLETED)
         task.completed_at = datetime.now()
         task.result = result
-        self._save_tasks()
+        self._mark_dirty(task_id)
         
         logger.info(f"Completed task: {task_id}")
         return True
@@ -190,10 +481,10 @@ class TaskManager:
             logger.error(f"Task not found: {task_id}")
             return False
         
-        task.status = TaskStatus.FAILED
+        self._set_status(task, TaskStatus.FAILED)
         task.completed_at = datetime.now()
         task.error_message = error_message
-        self._save_tasks()
+        self._mark_dirty(task_id)
         
         logger.error(f"Failed task: {task_id} - {error_message}")
         return True
@@ -205,19 +496,16 @@ class TaskManager:
             logger.error(f"Task not found: {task_id}")
             return False
         
-        task.status = TaskStatus.CANCELLED
+        self._set_status(task, TaskStatus.CANCELLED)
         task.completed_at = datetime.now()
-        self._save_tasks()
+        self._mark_dirty(task_id)
         
         logger.info(f"Cancelled task: {task_id}")
         return True
     
     def _get_task_by_id(self, task_id: str) -> Optional[Task]:
         """Get a task by its ID"""
-        for task in self.tasks:
-            if task.task_id == task_id:
-                return task
-        return None
+        return self._by_id.get(task_id)
     
     def get_task_status(self, task_id: str) -> Optional[TaskStatus]:
         """Get the status of a task"""
@@ -226,27 +514,26 @@ class TaskManager:
     
     def get_tasks_by_status(self, status: TaskStatus) -> List[Task]:
         """Get all tasks with a specific status"""
-        return [task for task in self.tasks if task.status == status]
+        return [self._by_id[task_id] for task_id in self._by_status[status]]
     
     def get_tasks_by_priority(self, priority: TaskPriority) -> List[Task]:
         """Get all tasks with a specific priority"""
-        return [task for task in self.tasks if task.priority == priority]
+        return [self._by_id[task_id] for task_id in self._by_priority[priority]]
     
     def get_tasks_by_agent(self, agent_role: str) -> List[Task]:
         """Get all tasks assigned to a specific agent"""
-        return [task for task in self.tasks if task.agent_role == agent_role]
+        return [self._by_id[task_id] for task_id in self._by_agent.get(agent_role, ())]
     
     def get_task_statistics(self) -> Dict[str, Any]:
         """Get statistics about tasks"""
+        # Counted from the index sizes, without visiting any task
         total_tasks = len(self.tasks)
-        completed_tasks = len(self.get_tasks_by_status(TaskStatus.COMPLETED))
-        failed_tasks = len(self.get_tasks_by_status(TaskStatus.FAILED))
-        pending_tasks = len(self.get_tasks_by_status(TaskStatus.PENDING))
-        in_progress_tasks = len(self.get_tasks_by_status(TaskStatus.IN_PROGRESS))
+        completed_tasks = len(self._by_status[TaskStatus.COMPLETED])
+        failed_tasks = len(self._by_status[TaskStatus.FAILED])
+        pending_tasks = len(self._by_status[TaskStatus.PENDING])
+        in_progress_tasks = len(self._by_status[TaskStatus.IN_PROGRESS])
         
-        priority_stats = {}
-        for priority in TaskPriority:
-            priority_stats[priority.value] = len(self.get_tasks_by_priority(priority))
+        priority_stats = {priority.value: len(ids) for priority, ids in self._by_priority.items()}
         
         return {
             'total_tasks': total_tasks,
@@ -268,25 +555,36 @@ class TaskManager:
         }
         
         try:
-            with open(self.result_summary_file, 'w') as f:
-                json.dump(summary_data, f, indent=2)
+            with open(self.result_summary_file, 'wb') as f:
+                f.write(dumps_bytes(summary_data, indent=2))
             logger.info("Result summary saved")
         except Exception as e:
             logger.error(f"Error saving result summary: {e}")
     
     def clear_completed_tasks(self):
         """Clear completed tasks from memory (keep in file)"""
-        self.tasks = [task for task in self.tasks if task.status != TaskStatus.COMPLETED]
+        with self._lock:
+            # A completion not yet logged would be lost once the task leaves
+            # the indexes, and a reload would bring back its pending state
+            for task in self.tasks:
+                if task.status == TaskStatus.COMPLETED and task.task_id in self._dirty:
+                    self._unlogged.append(task.to_json_dict())
+                    del self._dirty[task.task_id]
+            self.tasks = [task for task in self.tasks if task.status != TaskStatus.COMPLETED]
+            self._reindex()
+        self.flush()
         logger.info("Cleared completed tasks from memory")
     
     def reset_all_tasks(self):
         """Reset all tasks to pending status"""
-        for task in self.tasks:
-            task.status = TaskStatus.PENDING
-            task.started_at = None
-            task.completed_at = None
-            task.result = None
-            task.error_message = None
-        
-        self._save_tasks()
+        with self._lock:
+            for task in self.tasks:
+                self._set_status(task, TaskStatus.PENDING)
+                task.started_at = None
+                task.completed_at = None
+                task.result = None
+                task.error_message = None
+                self._dirty[task.task_id] = None
+            
+            self._request_write()
         logger.info("Reset all tasks to pending status") 
\ No newline at end of file
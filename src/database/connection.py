@@ -5,16 +5,57 @@ Handles connections to different database types
 
 import logging
 import os
-from typing import Dict, Any, Optional, List
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    from sqlalchemy import text
+except ImportError:
+    text = None
+
+from ..utils.cache import LRUCache
+from ..utils.sql_tokens import SKIPPED_SPANS, split_statements
 
 logger = logging.getLogger(__name__)
 
+# Statements that can change the schema or table contents
+_DDL_STATEMENT = re.compile(r'\s*(CREATE|ALTER|DROP|RENAME|TRUNCATE)\b', re.I)
+_READ_STATEMENT = re.compile(r'\s*(SELECT|WITH|EXPLAIN|SHOW)\b', re.I)
+
+# Data-changing keywords outside quotes and comments; a WITH or EXPLAIN
+# (ANALYZE) statement containing one may write
+_WRITE_KEYWORD = re.compile(
+    SKIPPED_SPANS + r"  | (?P<write>\b(?:INSERT|UPDATE|DELETE|MERGE)\b)", re.S | re.X | re.I)
+
+
+@lru_cache(maxsize=256)
+def _is_read_statement(query: str) -> bool:
+    """Whether a statement only reads data (PRAGMA counts as a write, since it can set values)"""
+    match = _READ_STATEMENT.match(query)
+    if match is None:
+        return False
+    if match.group(1).upper() in ('WITH', 'EXPLAIN'):
+        return not any(token.group('write') for token in _WRITE_KEYWORD.finditer(query))
+    return True
+
+
+# Statements a script uses to manage its own transaction, after any leading
+# comments. END is left out since it also closes trigger bodies.
+_TRANSACTION_CONTROL = re.compile(
+    r'(?:\s+|--[^\n]*|/\*.*?\*/)*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.I | re.S)
+
 
 class DatabaseProvider(ABC):
     """Abstract base class for database providers"""
     
+    # Whether queries may be issued from several threads at once
+    supports_concurrent_queries = False
+    
     @abstractmethod
     def connect(self) -> bool:
         """Establish connection to the database"""
@@ -26,8 +67,8 @@ class DatabaseProvider(ABC):
         pass
     
     @abstractmethod
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """Execute a query and return results"""
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a query (with optional :name bind parameters) and return results"""
         pass
     
     @abstractmethod
@@ -39,11 +80,34 @@ class DatabaseProvider(ABC):
     def test_connection(self) -> bool:
         """Test the database connection"""
         pass
+    
+    def is_connected(self) -> bool:
+        """Whether the provider is connected (override with a check that needs no query)"""
+        return self.test_connection()
+    
+    @contextmanager
+    def session(self):
+        """Run the queries issued inside the block on one connection"""
+        yield
+    
+    def execute_transaction(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """Execute queries in order, returning the results of each"""
+        return [self.execute_query(query) for query in queries]
+    
+    def execute_script(self, sql_script: str) -> List[Dict[str, Any]]:
+        """Execute several semicolon-separated statements"""
+        results = []
+        for statement in split_statements(sql_script):
+            results.extend(self.execute_query(statement))
+        return results
 
 
 class PostgreSQLProvider(DatabaseProvider):
     """PostgreSQL database provider"""
     
+    # Each query checks out its own pooled connection
+    supports_concurrent_queries = True
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.connection = None
@@ -61,6 +125,11 @@ class PostgreSQLProvider(DatabaseProvider):
         self.pool_size = config.get('pool_size', 10)
         self.max_overflow = config.get('max_overflow', 20)
         self.pool_timeout = config.get('pool_timeout', 30)
+        # Compiled statements SQLAlchemy keeps, so a repeated query text skips compilation
+        self.statement_cache_size = config.get('statement_cache_size', 500)
+        
+        # Connection checked out by session() for the current thread
+        self._local = threading.local()
     
     def connect(self) -> bool:
         """Establish connection to PostgreSQL"""
@@ -74,7 +143,9 @@ class PostgreSQLProvider(DatabaseProvider):
                     self.url,
                     pool_size=self.pool_size,
                     max_overflow=self.max_overflow,
-                    pool_timeout=self.pool_timeout
+                    pool_timeout=self.pool_timeout,
+                    pool_pre_ping=True,
+                    query_cache_size=self.statement_cache_size
                 )
             else:
                 # Build connection URL from components
@@ -86,12 +157,14 @@ class PostgreSQLProvider(DatabaseProvider):
                     connection_url,
                     pool_size=self.pool_size,
                     max_overflow=self.max_overflow,
-                    pool_timeout=self.pool_timeout
+                    pool_timeout=self.pool_timeout,
+                    pool_pre_ping=True,
+                    query_cache_size=self.statement_cache_size
                 )
             
             # Test the connection
             with self.engine.connect() as conn:
-                conn.execute("SELECT 1")
+                conn.execute(text("SELECT 1"))
             
             logger.info("PostgreSQL connection established successfully")
             return True
@@ -106,22 +179,56 @@ class PostgreSQLProvider(DatabaseProvider):
         """Close PostgreSQL connection"""
         if self.engine:
             self.engine.dispose()
+            self.engine = None
             logger.info("PostgreSQL connection closed")
     
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    def is_connected(self) -> bool:
+        """Whether an engine exists; the pool pings stale connections itself"""
+        return self.engine is not None
+    
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Execute a query on PostgreSQL"""
         try:
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                return self._execute(conn, query, params)
             with self.engine.connect() as conn:
-                result = conn.execute(query)
-                if result.returns_rows:
-                    columns = result.keys()
-                    return [dict(zip(columns, row)) for row in result.fetchall()]
-                else:
-                    return [{"affected_rows": result.rowcount}]
+                return self._execute(conn, query, params)
         except Exception as e:
             logger.error(f"PostgreSQL query execution failed: {e}")
             raise
     
+    def _execute(self, conn, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a query on a checked-out connection, committing anything but a pure read"""
+        try:
+            result = conn.execute(text(query), params or {})
+            if result.returns_rows:
+                # Also covers INSERT/UPDATE/DELETE ... RETURNING
+                rows = [dict(row) for row in result.mappings()]
+            else:
+                rows = [{"affected_rows": result.rowcount}]
+            if not _is_read_statement(query):
+                conn.commit()
+            return rows
+        except Exception:
+            # A failed statement aborts the transaction; roll it back so the
+            # rest of a session() block can still run queries
+            conn.rollback()
+            raise
+    
+    @contextmanager
+    def session(self):
+        """Check out one pooled connection for the queries issued inside the block"""
+        if getattr(self._local, 'conn', None) is not None:
+            yield  # Already inside a session on this thread
+            return
+        with self.engine.connect() as conn:
+            self._local.conn = conn
+            try:
+                yield
+            finally:
+                self._local.conn = None
+    
     def get_schema(self) -> Dict[str, Any]:
         """Get PostgreSQL schema information"""
         try:
@@ -138,23 +245,16 @@ class PostgreSQLProvider(DatabaseProvider):
             ORDER BY t.table_name, c.ordinal_position
             """
             
+            # Organize by table as the rows stream in
+            schema: Dict[str, Any] = {}
             with self.engine.connect() as conn:
-                result = conn.execute(schema_query)
-                columns = result.keys()
-                rows = [dict(zip(columns, row)) for row in result.fetchall()]
-            
-            # Organize by table
-            schema = {}
-            for row in rows:
-                table_name = row['table_name']
-                if table_name not in schema:
-                    schema[table_name] = []
-                schema[table_name].append({
-                    'column_name': row['column_name'],
-                    'data_type': row['data_type'],
-                    'is_nullable': row['is_nullable'],
-                    'column_default': row['column_default']
-                })
+                for row in conn.execute(text(schema_query)).mappings():
+                    schema.setdefault(row['table_name'], []).append({
+                        'column_name': row['column_name'],
+                        'data_type': row['data_type'],
+                        'is_nullable': row['is_nullable'],
+                        'column_default': row['column_default']
+                    })
             
             return schema
             
@@ -162,11 +262,37 @@ class PostgreSQLProvider(DatabaseProvider):
             logger.error(f"Failed to get PostgreSQL schema: {e}")
             return {}
     
+    def execute_transaction(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """Execute queries on PostgreSQL in one transaction with a single commit"""
+        try:
+            results = []
+            with self.engine.begin() as conn:
+                for query in queries:
+                    result = conn.execute(text(query))
+                    if result.returns_rows:
+                        results.append([dict(row) for row in result.mappings()])
+                    else:
+                        results.append([{"affected_rows": result.rowcount}])
+            return results
+        except Exception as e:
+            logger.error(f"PostgreSQL transaction failed and was rolled back: {e}")
+            raise
+    
+    def execute_script(self, sql_script: str) -> List[Dict[str, Any]]:
+        """Execute several statements on PostgreSQL in one transaction and round trip"""
+        try:
+            with self.engine.begin() as conn:
+                result = conn.exec_driver_sql(sql_script)
+                return [{"affected_rows": result.rowcount}]
+        except Exception as e:
+            logger.error(f"PostgreSQL script execution failed: {e}")
+            raise
+    
     def test_connection(self) -> bool:
         """Test PostgreSQL connection"""
         try:
             with self.engine.connect() as conn:
-                conn.execute("SELECT 1")
+                conn.execute(text("SELECT 1"))
             return True
         except Exception as e:
             logger.error(f"PostgreSQL connection test failed: {e}")
@@ -180,12 +306,15 @@ class SQLiteProvider(DatabaseProvider):
         self.config = config
         self.connection = None
         self.database_path = config.get('database_path', 'db_gpt.db')
+        # Prepared statements sqlite3 keeps per connection, keyed by query text
+        self.statement_cache_size = config.get('statement_cache_size', 500)
     
     def connect(self) -> bool:
         """Establish connection to SQLite"""
         try:
             import sqlite3
-            self.connection = sqlite3.connect(self.database_path)
+            self.connection = sqlite3.connect(self.database_path,
+                                              cached_statements=self.statement_cache_size)
             self.connection.row_factory = sqlite3.Row  # Enable dict-like access
             logger.info(f"SQLite connection established: {self.database_path}")
             return True
@@ -197,17 +326,22 @@ class SQLiteProvider(DatabaseProvider):
         """Close SQLite connection"""
         if self.connection:
             self.connection.close()
+            self.connection = None
             logger.info("SQLite connection closed")
     
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    def is_connected(self) -> bool:
+        """Whether the database file has been opened"""
+        return self.connection is not None
+    
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Execute a query on SQLite"""
         try:
             cursor = self.connection.cursor()
-            cursor.execute(query)
+            cursor.execute(query, params or ())
             
             if query.strip().upper().startswith('SELECT'):
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                # Rows are sqlite3.Row, which dict() converts without a zip
+                return [dict(row) for row in cursor.fetchall()]
             else:
                 self.connection.commit()
                 return [{"affected_rows": cursor.rowcount}]
@@ -218,34 +352,32 @@ class SQLiteProvider(DatabaseProvider):
     def get_schema(self) -> Dict[str, Any]:
         """Get SQLite schema information"""
         try:
+            # Every column of every table in one query (pragma_table_info
+            # is a table-valued function since SQLite 3.16)
             schema_query = """
             SELECT 
-                name as table_name,
-                sql as table_sql
-            FROM sqlite_master 
-            WHERE type='table'
+                m.name as table_name,
+                p.name as column_name,
+                p.type as data_type,
+                p."notnull" as not_null,
+                p.dflt_value as column_default
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type='table'
+            ORDER BY m.name, p.cid
             """
             
             cursor = self.connection.cursor()
             cursor.execute(schema_query)
-            tables = cursor.fetchall()
             
-            schema = {}
-            for table in tables:
-                table_name = table['table_name']
-                schema[table_name] = []
-                
-                # Get columns for this table
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = cursor.fetchall()
-                
-                for col in columns:
-                    schema[table_name].append({
-                        'column_name': col[1],
-                        'data_type': col[2],
-                        'is_nullable': not col[3],
-                        'column_default': col[4]
-                    })
+            schema: Dict[str, Any] = {}
+            for row in cursor.fetchall():
+                schema.setdefault(row['table_name'], []).append({
+                    'column_name': row['column_name'],
+                    'data_type': row['data_type'],
+                    'is_nullable': not row['not_null'],
+                    'column_default': row['column_default']
+                })
             
             return schema
             
@@ -253,6 +385,44 @@ class SQLiteProvider(DatabaseProvider):
             logger.error(f"Failed to get SQLite schema: {e}")
             return {}
     
+    def execute_transaction(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """Execute queries on SQLite in one transaction with a single commit"""
+        try:
+            results = []
+            cursor = self.connection.cursor()
+            # Commits on success and rolls back on error; the explicit BEGIN
+            # also takes in DDL, which sqlite3 would otherwise autocommit
+            with self.connection:
+                cursor.execute("BEGIN")
+                for query in queries:
+                    cursor.execute(query)
+                    if cursor.description is not None:
+                        results.append([dict(row) for row in cursor.fetchall()])
+                    else:
+                        results.append([{"affected_rows": cursor.rowcount}])
+            return results
+        except Exception as e:
+            logger.error(f"SQLite transaction failed and was rolled back: {e}")
+            raise
+    
+    def execute_script(self, sql_script: str) -> List[Dict[str, Any]]:
+        """Execute several statements on SQLite, in one transaction unless the script manages its own"""
+        try:
+            changes = self.connection.total_changes
+            if any(_TRANSACTION_CONTROL.match(statement) for statement in split_statements(sql_script)):
+                self.connection.executescript(sql_script)
+            else:
+                # Commits on success and rolls back on error
+                with self.connection:
+                    self.connection.executescript(f"BEGIN;\n{sql_script}\n;COMMIT;")
+            return [{"affected_rows": self.connection.total_changes - changes}]
+        except Exception as e:
+            # Don't leave a transaction the script opened hanging
+            if self.connection.in_transaction:
+                self.connection.rollback()
+            logger.error(f"SQLite script execution failed: {e}")
+            raise
+    
     def test_connection(self) -> bool:
         """Test SQLite connection"""
         try:
@@ -272,6 +442,17 @@ class DatabaseConnection:
         self.db_type = config.get('type', 'postgresql')
         self.provider = self._initialize_provider()
         
+        # Catalog lookups are cached for schema_cache_ttl seconds; schema
+        # changes made through this connection drop the cache right away
+        self._schema_ttl = config.get('schema_cache_ttl', 60)
+        self._schema_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._table_counts = LRUCache(config.get('table_count_cache_size', 128))
+        # SQL file contents by path, reused while the file's mtime is unchanged
+        self._sql_files: Dict[str, Tuple[float, str]] = {}
+        # Bumped whenever data or schema may have changed, so result caches
+        # built on this connection can tell their entries are stale
+        self.data_version = 0
+        
         logger.info(f"Initialized database connection for: {self.db_type}")
     
     def _initialize_provider(self) -> DatabaseProvider:
@@ -291,13 +472,47 @@ class DatabaseConnection:
         """Close database connection"""
         self.provider.disconnect()
     
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """Execute a database query"""
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a database query, binding any :name parameters from params"""
+        if _DDL_STATEMENT.match(query):
+            self.invalidate_schema_cache()
+        elif not _is_read_statement(query):
+            self._table_counts.clear()
+            self.data_version += 1
+        if params:
+            return self.provider.execute_query(query, params)
         return self.provider.execute_query(query)
     
+    def execute_transaction(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """Execute queries atomically, returning the results of each"""
+        if any(_DDL_STATEMENT.match(query) for query in queries):
+            self.invalidate_schema_cache()
+        elif not all(_is_read_statement(query) for query in queries):
+            self._table_counts.clear()
+            self.data_version += 1
+        return self.provider.execute_transaction(queries)
+    
+    @property
+    def supports_concurrent_queries(self) -> bool:
+        """Whether queries may be issued from several threads at once"""
+        return self.provider.supports_concurrent_queries
+    
     def get_schema(self) -> Dict[str, Any]:
-        """Get database schema"""
-        return self.provider.get_schema()
+        """Get database schema (cached for ``schema_cache_ttl`` seconds)"""
+        now = time.monotonic()
+        if self._schema_cache is not None and now - self._schema_cache[0] < self._schema_ttl:
+            return self._schema_cache[1]
+        
+        schema = self.provider.get_schema()
+        if schema:
+            self._schema_cache = (now, schema)
+        return schema
+    
+    def invalidate_schema_cache(self):
+        """Drop cached schema information and table row counts"""
+        self._schema_cache = None
+        self._table_counts.clear()
+        self.data_version += 1
     
     def test_connection(self) -> bool:
         """Test database connection"""
@@ -305,30 +520,26 @@ class DatabaseConnection:
     
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        try:
-            if not self.test_connection():
-                self.connect()
+        """Context manager that runs the queries issued inside it on one connection"""
+        if not self.provider.is_connected():
+            self.connect()
+        with self.provider.session():
             yield self
-        finally:
-            pass  # Connection is managed by the provider
     
     def execute_sql_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Execute SQL commands from a file"""
+        """Execute SQL commands from a file as a single script"""
         try:
-            with open(file_path, 'r') as f:
-                sql_content = f.read()
-            
-            # Split by semicolon and execute each statement
-            statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip()]
-            results = []
-            
-            for statement in statements:
-                if statement:
-                    result = self.execute_query(statement)
-                    results.extend(result)
+            mtime = os.path.getmtime(file_path)
+            cached = self._sql_files.get(file_path)
+            if cached is not None and cached[0] == mtime:
+                sql_content = cached[1]
+            else:
+                with open(file_path, 'r') as f:
+                    sql_content = f.read()
+                self._sql_files[file_path] = (mtime, sql_content)
             
-            return results
+            self.invalidate_schema_cache()
+            return self.provider.execute_script(sql_content)
             
         except Exception as e:
             logger.error(f"Failed to execute SQL file {file_path}: {e}")
@@ -345,10 +556,16 @@ class DatabaseConnection:
         return list(schema.keys())
     
     def get_table_count(self, table_name: str) -> int:
-        """Get the number of rows in a table"""
+        """Get the number of rows in a table (cached like the schema)"""
+        cached = self._table_counts.get(table_name)
+        if cached is not None and time.monotonic() - cached[0] < self._schema_ttl:
+            return cached[1]
+        
         try:
             result = self.execute_query(f"SELECT COUNT(*) as count FROM {table_name}")
-            return result[0]['count'] if result else 0
+            count = result[0]['count'] if result else 0
+            self._table_counts.put(table_name, (time.monotonic(), count))
+            return count
         except Exception as e:
             logger.error(f"Failed to get count for table {table_name}: {e}")
             return 0 
\ No newline at end of file
@@ -3,48 +3,270 @@ Query Executor for handling SQL query execution
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+from ..utils.cache import LRUCache
+from ..utils.sql_tokens import SKIPPED_SPANS, is_skipped
+
 logger = logging.getLogger(__name__)
 
+# Only plain SELECTs have their results cached
+_CACHEABLE_QUERY = re.compile(r'\s*SELECT\b', re.I)
+
+# Queries that can run alongside each other in execute_batch
+_READ_ONLY_QUERY = re.compile(r'\s*(SELECT|EXPLAIN|SHOW)\b', re.I)
+
+# Statements whose results are just an affected row count
+_WRITE_QUERY = re.compile(r'\s*(INSERT|UPDATE|DELETE)\b', re.I)
+
+# Quoted literals/identifiers (kept verbatim) or a run of whitespace
+_QUOTED_OR_SPACE = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|\s+""")
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace outside quotes and drop a trailing semicolon"""
+    normalized = _QUOTED_OR_SPACE.sub(
+        lambda m: ' ' if m.group()[0] not in '\'"' else m.group(), query)
+    return normalized.strip().rstrip(';').rstrip()
+
+
+# Statements whose compared literals are turned into bind parameters; DDL
+# is left alone since CHECK and DEFAULT clauses cannot take parameters
+_PARAMETERIZABLE_QUERY = re.compile(r'\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.I)
+
+# A string or integer literal compared with = <> < > LIKE (not one cast with
+# ::), a parenthesis or word to track the clause, or a quoted span/comment
+# to skip over
+_COMPARED_LITERAL = re.compile(r"""
+    (?P<op>(?:[<>!]?=|<>|[<>]|\bLIKE\b)\s*)
+    (?P<literal>'(?:[^']|'')*'|-?\d{1,18}\b(?!\.))(?!\s*::)
+  | (?P<paren>[()])
+  | (?P<word>[A-Za-z_]\w*)
+  |""" + SKIPPED_SPANS, re.S | re.X | re.I)
+
+# Keywords that start a new clause of a statement
+_CLAUSE_KEYWORDS = frozenset({
+    'SELECT', 'FROM', 'JOIN', 'ON', 'USING', 'WHERE', 'GROUP', 'HAVING', 'WINDOW',
+    'ORDER', 'LIMIT', 'OFFSET', 'FETCH', 'SET', 'VALUES', 'RETURNING', 'INTO',
+    'UNION', 'INTERSECT', 'EXCEPT'
+})
+
+# A :name marker as SQLAlchemy's text() finds it, even inside a quoted span
+_BIND_MARKER = re.compile(r'(?<![:\w\\]):\w+(?!:)')
+
+
+@lru_cache(maxsize=512)
+def parameterize_query(query: str) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+    """
+    Replace the literals a query compares against with :pN bind parameters
+    
+    Queries that differ only in those literals share one template, so the
+    driver's statement cache can reuse the prepared statement. Only literals
+    outside parentheses in the top-level WHERE and HAVING clauses are bound:
+    elsewhere a literal may need to match an expression in GROUP BY or the
+    predicate of a partial index, which a parameter never does. Queries that
+    already contain a :name marker are left alone.
+    
+    Returns:
+        Tuple of (template, ((name, value), ...))
+    """
+    if not _PARAMETERIZABLE_QUERY.match(query) or _BIND_MARKER.search(query):
+        return query, ()
+    
+    params: List[Tuple[str, Any]] = []
+    depth = 0
+    clause = None
+    
+    def bind(match):
+        nonlocal depth, clause
+        literal = match.group('literal')
+        if literal is None:
+            if match.group('paren'):
+                depth += 1 if match.group('paren') == '(' else -1
+            elif match.group('word') and depth == 0 and match.group('word').upper() in _CLAUSE_KEYWORDS:
+                clause = match.group('word').upper()
+            return match.group()
+        if depth or clause not in ('WHERE', 'HAVING'):
+            return match.group()
+        name = f'p{len(params)}'
+        if literal[0] == "'":
+            params.append((name, literal[1:-1].replace("''", "'")))
+        else:
+            params.append((name, int(literal)))
+        return f"{match.group('op')}:{name}"
+    
+    template = _COMPARED_LITERAL.sub(bind, query)
+    return template, tuple(params)
+
+
+# Statements validate_query accepts as the leading keyword (WITH for CTEs)
+_SQL_COMMANDS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'DROP', 'WITH'})
+
+# What validate_query looks at: quoted spans and comments (skipped whole),
+# parentheses and words
+_VALIDATION_TOKEN = re.compile(SKIPPED_SPANS + r"""
+  | [()]
+  | [A-Za-z_]\w*
+""", re.S | re.X)
+
+
+@lru_cache(maxsize=256)
+def _validation_error(query: str) -> Optional[str]:
+    """Check a query in one pass over its tokens, returning the first problem found"""
+    depth = 0
+    first_keyword = None
+    has_from = False
+    for token in _VALIDATION_TOKEN.finditer(query):
+        text = token.group()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+            if depth < 0:
+                break
+        elif is_skipped(text):
+            continue
+        elif first_keyword is None:
+            first_keyword = text.upper()
+        elif not has_from and len(text) == 4 and text.upper() == 'FROM':
+            has_from = True
+    
+    # Check for a basic SQL command
+    if first_keyword not in _SQL_COMMANDS:
+        return 'Query must contain a valid SQL command'
+    
+    # Check for balanced parentheses
+    if depth != 0:
+        return 'Unbalanced parentheses in query'
+    
+    # Check for basic structure
+    if first_keyword == 'SELECT' and not has_from:
+        return 'SELECT query must contain FROM clause'
+    
+    return None
+
+def to_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn result rows into one column-name list plus a value list per row"""
+    if not rows:
+        return {'columns': [], 'rows': []}
+    # Rows of one result share their keys, in the same order
+    return {'columns': list(rows[0]), 'rows': [list(row.values()) for row in rows]}
+
 
 class QueryExecutor:
     """Handles SQL query execution and result processing"""
     
-    def __init__(self, db_connection):
+    __slots__ = ('db_connection', 'schema_manager', 'max_workers', 'parameterize_literals',
+                 '_pool', 'cache_ttl', '_exact_cache', '_normalized_cache', '_cache_lock')
+    
+    def __init__(self, db_connection, cache_ttl: float = 30, cache_size: int = 256,
+                 max_workers: int = 10, parameterize_literals: bool = True,
+                 schema_manager=None):
         self.db_connection = db_connection
+        # Cached column metadata for get_table_stats, when available
+        self.schema_manager = schema_manager
+        self.max_workers = max_workers
+        # Send compared literals as bind parameters (see parameterize_query)
+        self.parameterize_literals = parameterize_literals
+        self._pool: Optional[ThreadPoolExecutor] = None
+        
+        # Results of SELECTs, looked up by exact text first and then by
+        # whitespace-normalized text; entries expire after cache_ttl seconds
+        # or as soon as the connection reports a write
+        self.cache_ttl = cache_ttl
+        self._exact_cache = LRUCache(cache_size)
+        self._normalized_cache = LRUCache(cache_size)
+        self._cache_lock = threading.RLock()
+    
+    def invalidate(self):
+        """Drop all cached query results"""
+        with self._cache_lock:
+            self._exact_cache.clear()
+            self._normalized_cache.clear()
     
-    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _cached_result(self, query: str) -> Optional[Dict[str, Any]]:
+        """Look up a fresh cached result for a query"""
+        version = getattr(self.db_connection, 'data_version', None)
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._exact_cache.get(query)
+            if entry is None:
+                entry = self._normalized_cache.get(normalize_query(query))
+                if entry is not None:
+                    self._exact_cache.put(query, entry)
+            if entry is None or entry[0] < now or entry[1] != version:
+                return None
+            # Copy the rows too, so a caller editing them leaves the entry intact
+            result = entry[2]
+            return {**result, 'results': [dict(row) for row in result['results']]}
+    
+    def _cache_result(self, query: str, result: Dict[str, Any]):
+        """Remember the result of a successful SELECT"""
+        # Store copies of the rows, since the caller gets the originals
+        rows = [dict(row) for row in result['results']]
+        entry = (time.monotonic() + self.cache_ttl,
+                 getattr(self.db_connection, 'data_version', None), {**result, 'results': rows})
+        with self._cache_lock:
+            self._exact_cache.put(query, entry)
+            self._normalized_cache.put(normalize_query(query), entry)
+    
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None,
+                      columnar: bool = False) -> Dict[str, Any]:
         """
         Execute a SQL query and return results
         
         Args:
             query: SQL query to execute
             params: Optional parameters for prepared statements
+            columnar: Return results as {'columns': [...], 'rows': [[...], ...]}
+                instead of one dict per row
         
         Returns:
             Dictionary containing query results and metadata
         """
-        start_time = datetime.now()
+        result = self._execute_query(query, params)
+        if columnar and result['success']:
+            result = {**result, 'results': to_columnar(result['results'])}
+        return result
+    
+    def _execute_query(self, query: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Execute a query, with results as row dicts"""
+        cacheable = not params and self.cache_ttl > 0 and _CACHEABLE_QUERY.match(query)
+        if cacheable:
+            cached = self._cached_result(query)
+            if cached is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Query result served from cache: %s", query[:100])
+                return cached
+        
+        start_time = time.perf_counter()
         
         try:
-            logger.info(f"Executing query: {query[:100]}...")
+            # Skip building the message on the hot path when INFO is off
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Executing query: %s...", query[:100])
             
             # Execute the query
             if params:
-                # For parameterized queries, we'd need to implement this
-                # based on the specific database provider
-                results = self.db_connection.execute_query(query)
+                results = self.db_connection.execute_query(query, params)
+            elif self.parameterize_literals:
+                template, bound = parameterize_query(query)
+                results = self.db_connection.execute_query(template, dict(bound))
             else:
                 results = self.db_connection.execute_query(query)
             
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             # Process results
             processed_results = self._process_results(results)
             
-            return {
+            result = {
                 'success': True,
                 'results': processed_results,
                 'row_count': len(results),
@@ -52,9 +274,12 @@ class QueryExecutor:
                 'query': query,
                 'timestamp': datetime.now().isoformat()
             }
+            if cacheable:
+                self._cache_result(query, result)
+            return result
             
         except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             logger.error(f"Query execution failed: {e}")
             
             return {
@@ -67,22 +292,40 @@ class QueryExecutor:
     
     def _process_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process and clean up query results"""
-        processed = []
+        # Columns share a type across rows, so find the datetime columns once
+        # from the first non-NULL value of each and only touch those
+        datetime_columns = []
+        unknown = list(results[0]) if results else []
+        for row in results:
+            if not unknown:
+                break
+            still_unknown = []
+            for key in unknown:
+                value = row.get(key)
+                if value is None:
+                    still_unknown.append(key)
+                elif isinstance(value, datetime):
+                    datetime_columns.append(key)
+            unknown = still_unknown
         
+        # Rows are fresh dicts from the provider, so convert them in place
         for row in results:
-            processed_row = {}
-            for key, value in row.items():
-                # Convert datetime objects to strings
-                if isinstance(value, datetime):
-                    processed_row[key] = value.isoformat()
-                else:
-                    processed_row[key] = value
-            processed.append(processed_row)
+            for key in datetime_columns:
+                value = row.get(key)
+                if value is not None:
+                    row[key] = value.isoformat()
         
-        return processed
+        return results
     
     def execute_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
         """Execute multiple queries in batch"""
+        # Independent reads run concurrently when the database allows it;
+        # anything with a write keeps strict statement order
+        if (len(queries) > 1 and self.max_workers > 1
+                and getattr(self.db_connection, 'supports_concurrent_queries', False) is True
+                and all(_READ_ONLY_QUERY.match(query) for query in queries)):
+            return self._execute_concurrently(queries)
+        
         results = []
         
         for query in queries:
@@ -95,24 +338,46 @@ class QueryExecutor:
         
         return results
     
+    def _execute_concurrently(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Run read-only queries on the thread pool, reporting them in submission order"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='query')
+        futures = [self._pool.submit(self.execute_query, query) for query in queries]
+        
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            
+            # Report up to the first failure, like the sequential path
+            if not result['success']:
+                break
+        
+        return results
+    
     def execute_transaction(self, queries: List[str]) -> Dict[str, Any]:
         """Execute queries in a transaction"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
-            # This would need to be implemented based on the database provider
-            # For now, we'll execute them sequentially
-            results = []
+            # One BEGIN/COMMIT on the database connection; any failure rolls
+            # back every statement
+            statement_results = self.db_connection.execute_transaction(queries)
             
-            for query in queries:
-                result = self.execute_query(query)
-                results.append(result)
-                
-                if not result['success']:
-                    # Rollback would happen here
-                    raise Exception(f"Query failed: {result['error']}")
+            results = []
+            for query, rows in zip(queries, statement_results):
+                # Write statements only report affected_rows, nothing to clean up
+                if not _WRITE_QUERY.match(query):
+                    rows = self._process_results(rows)
+                results.append({
+                    'success': True,
+                    'results': rows,
+                    'row_count': len(rows),
+                    'query': query
+                })
             
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             
             return {
                 'success': True,
@@ -123,14 +388,14 @@ class QueryExecutor:
             }
             
         except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             logger.error(f"Transaction failed: {e}")
             
             return {
                 'success': False,
                 'error': str(e),
                 'execution_time': execution_time,
-                'queries_executed': len(results),
+                'queries_executed': 0,
                 'timestamp': datetime.now().isoformat()
             }
     
@@ -161,28 +426,11 @@ class QueryExecutor:
     def validate_query(self, query: str) -> Dict[str, Any]:
         """Validate a query without executing it"""
         try:
-            # Basic syntax validation
-            query_upper = query.upper().strip()
-            
-            # Check for basic SQL keywords
-            if not any(keyword in query_upper for keyword in ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'DROP']):
-                return {
-                    'valid': False,
-                    'error': 'Query must contain a valid SQL command'
-                }
-            
-            # Check for balanced parentheses
-            if query.count('(') != query.count(')'):
-                return {
-                    'valid': False,
-                    'error': 'Unbalanced parentheses in query'
-                }
-            
-            # Check for basic structure
-            if query_upper.startswith('SELECT') and 'FROM' not in query_upper:
+            error = _validation_error(query)
+            if error:
                 return {
                     'valid': False,
-                    'error': 'SELECT query must contain FROM clause'
+                    'error': error
                 }
             
             return {
@@ -197,25 +445,31 @@ class QueryExecutor:
             }
     
     def get_table_stats(self, table_name: str) -> Dict[str, Any]:
-        """Get statistics about a table"""
+        """Get statistics about a table (row_count is the planner's estimate on PostgreSQL)"""
         try:
             # Get row count
-            count_query = f"SELECT COUNT(*) as row_count FROM {table_name}"
-            count_result = self.execute_query(count_query)
-            
-            if not count_result['success']:
-                return count_result
-            
-            row_count = count_result['results'][0]['row_count']
+            row_count = self._estimated_row_count(table_name)
+            approximate = row_count is not None
+            if row_count is None:
+                count_query = f"SELECT COUNT(*) as row_count FROM {table_name}"
+                count_result = self.execute_query(count_query)
+                
+                if not count_result['success']:
+                    return count_result
+                
+                row_count = count_result['results'][0]['row_count']
             
             # Get column information
-            schema = self.db_connection.get_schema()
-            table_schema = schema.get(table_name, [])
+            if self.schema_manager is not None:
+                table_schema = self.schema_manager.get_table_schema(table_name)
+            else:
+                table_schema = self.db_connection.get_schema().get(table_name, [])
             
             return {
                 'success': True,
                 'table_name': table_name,
                 'row_count': row_count,
+                'approximate': approximate,
                 'column_count': len(table_schema),
                 'columns': table_schema,
                 'timestamp': datetime.now().isoformat()
@@ -227,4 +481,20 @@ class QueryExecutor:
                 'success': False,
                 'error': str(e),
                 'table_name': table_name
-            } 
\ No newline at end of file
+            }
+    
+    def _estimated_row_count(self, table_name: str) -> Optional[int]:
+        """Row count from the PostgreSQL catalog, or None where no estimate is available"""
+        if getattr(self.db_connection, 'db_type', None) != 'postgresql':
+            return None
+        
+        result = self.execute_query(
+            "SELECT reltuples::BIGINT AS row_count FROM pg_class WHERE oid = to_regclass(:table_name)",
+            {'table_name': table_name}
+        )
+        if not result['success'] or not result['results']:
+            return None
+        
+        # reltuples is -1 (0 before PostgreSQL 14) until the table is first analyzed
+        estimate = result['results'][0]['row_count']
+        return estimate if estimate and estimate > 0 else None
\ No newline at end of file
@@ -3,28 +3,122 @@ Schema Manager for database schema operations
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
 
+from ..utils.json_utils import dumps, dumps_bytes
+
 logger = logging.getLogger(__name__)
 
 
 class SchemaManager:
     """Manages database schema operations and metadata"""
     
+    __slots__ = ('db_connection', '_schema', '_column_index', '_column_names', '_validation',
+                 'schema_loaded', '_load_lock')
+    
     def __init__(self, db_connection):
         self.db_connection = db_connection
-        self.schema_cache: Dict[str, Any] = {}
-        self._load_schema()
+        # The schema is read from the database on first use rather than here
+        self._schema: Dict[str, Any] = {}
+        # Per-table column lookups, rebuilt with every schema load
+        self._column_index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._column_names: Dict[str, Tuple[str, ...]] = {}
+        self._validation: Optional[Dict[str, Any]] = None
+        self.schema_loaded = False
+        self._load_lock = threading.Lock()
+    
+    @property
+    def schema_cache(self) -> Dict[str, Any]:
+        """The cached schema, loaded on first access"""
+        self._ensure_loaded()
+        return self._schema
+    
+    def _ensure_loaded(self):
+        """Load the schema once, on first use"""
+        if not self.schema_loaded:
+            with self._load_lock:
+                if not self.schema_loaded:
+                    self._load_schema()
     
     def _load_schema(self):
         """Load database schema"""
         try:
-            self.schema_cache = self.db_connection.get_schema()
-            logger.info(f"Loaded schema for {len(self.schema_cache)} tables")
+            schema = self.db_connection.get_schema()
+            logger.info("Loaded schema for %d tables", len(schema))
         except Exception as e:
             logger.warning(f"Failed to load schema: {e}")
-            self.schema_cache = {}
+            schema = {}
+        
+        # Build the lookups before publishing, so readers never see a
+        # schema without them
+        column_index, column_names = self._index_columns(schema)
+        self._schema = schema
+        self._column_index = column_index
+        self._column_names = column_names
+        self._validation = None
+        self.schema_loaded = True
+    
+    @staticmethod
+    def _index_columns(schema: Dict[str, Any]):
+        """Index the columns of every table by name (the first of duplicate names wins)"""
+        column_index = {
+            table: {col['column_name']: col for col in reversed(columns)}
+            for table, columns in schema.items()
+        }
+        column_names = {
+            table: tuple(col['column_name'] for col in columns)
+            for table, columns in schema.items()
+        }
+        return column_index, column_names
+    
+    def _column_entry(self, name: str, data_type: str, nullable: bool = True,
+                      default: Optional[str] = None) -> Dict[str, Any]:
+        """
+        A column description in the shape get_schema returns
+        
+        is_nullable follows the provider: 'YES'/'NO' on PostgreSQL, as
+        information_schema reports it, and a bool elsewhere. data_type is kept
+        as written in the DDL, which PostgreSQL's catalog may spell differently
+        (VARCHAR(50) reads back as 'character varying').
+        """
+        is_nullable: Union[bool, str] = nullable
+        if getattr(self.db_connection, 'db_type', None) == 'postgresql':
+            is_nullable = 'YES' if nullable else 'NO'
+        return {
+            'column_name': name,
+            'data_type': data_type,
+            'is_nullable': is_nullable,
+            'column_default': default
+        }
+    
+    def _update_table(self, table_name: str, columns: Optional[List[Dict[str, Any]]]):
+        """Apply a known change to one table (None drops it) without re-reading the schema"""
+        # Not loaded yet: the first access reads the changed schema anyway
+        if not self.schema_loaded:
+            return
+        
+        with self._load_lock:
+            # Copy the maps instead of editing them, since the schema dict
+            # may be shared with the connection's own cache
+            schema = dict(self._schema)
+            column_index = dict(self._column_index)
+            column_names = dict(self._column_names)
+            if columns is None:
+                schema.pop(table_name, None)
+                column_index.pop(table_name, None)
+                column_names.pop(table_name, None)
+            else:
+                table_index, table_names = self._index_columns({table_name: columns})
+                schema[table_name] = columns
+                column_index.update(table_index)
+                column_names.update(table_names)
+            
+            self._schema = schema
+            self._column_index = column_index
+            self._column_names = column_names
+            self._validation = None
     
     def get_schema(self) -> Dict[str, Any]:
         """Get the current schema"""
@@ -40,16 +134,13 @@ class SchemaManager:
     
     def get_table_columns(self, table_name: str) -> List[str]:
         """Get column names for a table"""
-        columns = self.get_table_schema(table_name)
-        return [col['column_name'] for col in columns]
+        self._ensure_loaded()
+        return list(self._column_names.get(table_name, ()))
     
     def get_column_info(self, table_name: str, column_name: str) -> Optional[Dict[str, Any]]:
         """Get detailed information about a specific column"""
-        columns = self.get_table_schema(table_name)
-        for col in columns:
-            if col['column_name'] == column_name:
-                return col
-        return None
+        self._ensure_loaded()
+        return self._column_index.get(table_name, {}).get(column_name)
     
     def get_primary_keys(self, table_name: str) -> List[str]:
         """Get primary key columns for a table"""
@@ -90,10 +181,12 @@ class SchemaManager:
             
             self.db_connection.execute_query(create_sql)
             
-            # Refresh schema cache
-            self._load_schema()
+            self._update_table(table_name, [
+                self._column_entry(col['name'], col['type'], col.get('nullable', True), col.get('default'))
+                for col in columns
+            ])
             
-            logger.info(f"Created table: {table_name}")
+            logger.info("Created table: %s", table_name)
             return True
             
         except Exception as e:
@@ -106,10 +199,9 @@ class SchemaManager:
             drop_sql = f"DROP TABLE {table_name}"
             self.db_connection.execute_query(drop_sql)
             
-            # Refresh schema cache
-            self._load_schema()
+            self._update_table(table_name, None)
             
-            logger.info(f"Dropped table: {table_name}")
+            logger.info("Dropped table: %s", table_name)
             return True
             
         except Exception as e:
@@ -130,10 +222,11 @@ class SchemaManager:
             
             self.db_connection.execute_query(alter_sql)
             
-            # Refresh schema cache
-            self._load_schema()
+            self._update_table(table_name, self._schema.get(table_name, []) + [
+                self._column_entry(column_name, column_type, nullable, default)
+            ])
             
-            logger.info(f"Added column {column_name} to table {table_name}")
+            logger.info("Added column %s to table %s", column_name, table_name)
             return True
             
         except Exception as e:
@@ -146,10 +239,11 @@ class SchemaManager:
             alter_sql = f"ALTER TABLE {table_name} DROP COLUMN {column_name}"
             self.db_connection.execute_query(alter_sql)
             
-            # Refresh schema cache
-            self._load_schema()
+            self._update_table(table_name, [
+                col for col in self._schema.get(table_name, []) if col['column_name'] != column_name
+            ])
             
-            logger.info(f"Dropped column {column_name} from table {table_name}")
+            logger.info("Dropped column %s from table %s", column_name, table_name)
             return True
             
         except Exception as e:
@@ -165,7 +259,7 @@ class SchemaManager:
             
             self.db_connection.execute_query(index_sql)
             
-            logger.info(f"Created index {index_name} on table {table_name}")
+            logger.info("Created index %s on table %s", index_name, table_name)
             return True
             
         except Exception as e:
@@ -178,7 +272,7 @@ class SchemaManager:
             drop_sql = f"DROP INDEX {index_name}"
             self.db_connection.execute_query(drop_sql)
             
-            logger.info(f"Dropped index: {index_name}")
+            logger.info("Dropped index: %s", index_name)
             return True
             
         except Exception as e:
@@ -208,59 +302,80 @@ class SchemaManager:
     
     def validate_schema(self) -> Dict[str, Any]:
         """Validate the database schema"""
-        validation_results = {
-            'valid': True,
-            'errors': [],
-            'warnings': [],
-            'tables_checked': len(self.schema_cache)
+        self._ensure_loaded()
+        # Reused until the schema changes
+        if self._validation is None:
+            self._validation = self._validate()
+        
+        return {
+            **self._validation,
+            'errors': list(self._validation['errors']),
+            'warnings': list(self._validation['warnings'])
         }
+    
+    def _validate(self) -> Dict[str, Any]:
+        """Run the schema checks"""
+        errors: List[str] = []
+        warnings: List[str] = []
         
-        for table_name, columns in self.schema_cache.items():
+        schema, column_index = self._schema, self._column_index
+        for table_name, columns in schema.items():
             # Check for empty tables
             if not columns:
-                validation_results['warnings'].append(f"Table {table_name} has no columns")
+                warnings.append(f"Table {table_name} has no columns")
             
-            # Check for duplicate column names
-            column_names = [col['column_name'] for col in columns]
-            if len(column_names) != len(set(column_names)):
-                validation_results['errors'].append(f"Table {table_name} has duplicate column names")
-                validation_results['valid'] = False
+            # Check for duplicate column names (the name index holds each name once)
+            if len(column_index.get(table_name, columns)) != len(columns):
+                errors.append(f"Table {table_name} has duplicate column names")
         
-        return validation_results
+        return {
+            'valid': not errors,
+            'errors': errors,
+            'warnings': warnings,
+            'tables_checked': len(schema)
+        }
     
-    def export_schema(self, format: str = 'json') -> str:
-        """Export schema in various formats"""
+    def export_schema(self, format: str = 'json', indent: Optional[int] = 2,
+                      as_bytes: bool = False) -> Union[str, bytes]:
+        """Export schema in various formats (indent=None gives compact JSON)"""
         if format.lower() == 'json':
-            import json
-            return json.dumps(self.schema_cache, indent=2)
+            if as_bytes:
+                return dumps_bytes(self.schema_cache, indent=indent)
+            return dumps(self.schema_cache, indent=indent)
         elif format.lower() == 'sql':
-            return self._generate_create_statements()
+            sql = self._generate_create_statements()
+            return sql.encode() if as_bytes else sql
         else:
             raise ValueError(f"Unsupported export format: {format}")
     
     def _generate_create_statements(self) -> str:
         """Generate CREATE TABLE statements for all tables"""
-        statements = []
+        # Every piece goes into one fragment list that is joined once
+        out: List[str] = []
         
         for table_name, columns in self.schema_cache.items():
-            column_definitions = []
-            for col in columns:
-                col_def = f"{col['column_name']} {col['data_type']}"
+            if out:
+                out.append("\n\n")
+            out += ("CREATE TABLE ", table_name, " (\n")
+            for i, col in enumerate(columns):
+                out += (",\n  " if i else "  ", col['column_name'], " ", col['data_type'])
                 if not col['is_nullable']:
-                    col_def += " NOT NULL"
+                    out.append(" NOT NULL")
                 if col['column_default']:
-                    col_def += f" DEFAULT {col['column_default']}"
-                column_definitions.append(col_def)
-            
-            create_stmt = f"CREATE TABLE {table_name} (\n"
-            create_stmt += ",\n".join(f"  {col_def}" for col_def in column_definitions)
-            create_stmt += "\n);"
-            
-            statements.append(create_stmt)
+                    out += (" DEFAULT ", str(col['column_default']))
+            out.append("\n);")
         
-        return "\n\n".join(statements)
+        return "".join(out)
     
-    def refresh_schema(self):
-        """Refresh the schema cache"""
-        self._load_schema()
-        logger.info("Schema cache refreshed") 
\ No newline at end of file
+    def refresh_schema(self, background: bool = False):
+        """Refresh the schema cache (in a daemon thread if background, serving the old schema meanwhile)"""
+        if background:
+            threading.Thread(target=self._refresh, name='schema-refresh', daemon=True).start()
+        else:
+            self._refresh()
+    
+    def _refresh(self):
+        """Reload the schema"""
+        with self._load_lock:
+            self._load_schema()
+        logger.info("Schema cache refreshed")
\ No newline at end of file
@@ -3,6 +3,6 @@ LLM (Large Language Model) components for DB-GPT
 """
 
 from .llm_manager import LLMManager
-from .providers import OpenAIProvider, LocalLLMProvider
+from .providers import OpenAIProvider, LocalLLMProvider, VLLMProvider
 
-__all__ = ["LLMManager", "OpenAIProvider", "LocalLLMProvider"] 
\ No newline at end of file
+__all__ = ["LLMManager", "OpenAIProvider", "LocalLLMProvider", "VLLMProvider"] 
\ No newline at end of file
@@ -2,11 +2,16 @@
 LLM Manager for handling different language model providers
 """
 
+import asyncio
+import copy
 import logging
 import os
+import threading
 from typing import Dict, Any, Optional, List
 from abc import ABC, abstractmethod
 
+from ..utils.cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,6 +32,34 @@ class LLMProvider(ABC):
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the model"""
         pass
+    
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Generate text asynchronously (runs the blocking call in a worker thread by default)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.generate(prompt, **kwargs))
+    
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate text for several independent prompts (one request per prompt by default)"""
+        return [self.generate(prompt, **kwargs) for prompt in prompts]
+    
+    async def agenerate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
+        """Generate text with context asynchronously (in a worker thread by default)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.generate_with_context(prompt, context, **kwargs))
+    
+    async def agenerate_batch(self, prompts: List[str], context: Optional[List[str]] = None,
+                              max_concurrency: int = 8, **kwargs) -> List[str]:
+        """Generate text for several prompts concurrently, all sharing the same context"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                if context:
+                    return await self.agenerate_with_context(prompt, context, **kwargs)
+                return await self.agenerate(prompt, **kwargs)
+        
+        return list(await asyncio.gather(*(run(prompt) for prompt in prompts)))
 
 
 class OpenAIProvider(LLMProvider):
@@ -48,16 +81,62 @@ class OpenAIProvider(LLMProvider):
             self.client = openai.OpenAI(api_key=self.api_key)
         except ImportError:
             raise ImportError("OpenAI package not installed. Run: pip install openai")
+        
+        self._async_client = None
+        
+        # Request arguments shared by every call; callers may override these keys
+        self._default_kwargs = {
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            'timeout': self.timeout
+        }
+        # System messages for recently used contexts, reused as the prefix of
+        # every request with the same context
+        self._context_messages = LRUCache(config.get('context_cache_size', 64))
+        self._context_lock = threading.Lock()
+    
+    @property
+    def async_client(self):
+        """Lazily create the asyncio-native OpenAI client"""
+        if self._async_client is None:
+            import openai
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key)
+        return self._async_client
+    
+    def _request_kwargs(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion arguments for a call"""
+        request = {**self._default_kwargs, 'messages': messages}
+        if kwargs:
+            request.update((k, v) for k, v in kwargs.items() if k in self._default_kwargs and k != 'model')
+        return request
+    
+    def _context_prefix(self, context: List[str]) -> List[Dict[str, str]]:
+        """System messages for a context, built once per distinct context"""
+        key = tuple(context)
+        with self._context_lock:
+            prefix = self._context_messages.get(key)
+            if prefix is None:
+                prefix = [{"role": "system", "content": ctx} for ctx in context]
+                self._context_messages.put(key, prefix)
+        return prefix
     
     def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using OpenAI API"""
         try:
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=kwargs.get('max_tokens', self.max_tokens),
-                temperature=kwargs.get('temperature', self.temperature),
-                timeout=kwargs.get('timeout', self.timeout)
+                **self._request_kwargs([{"role": "user", "content": prompt}], kwargs)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return f"Error generating response: {str(e)}"
+    
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Generate text using the async OpenAI client"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._request_kwargs([{"role": "user", "content": prompt}], kwargs)
             )
             return response.choices[0].message.content
         except Exception as e:
@@ -66,22 +145,25 @@ class OpenAIProvider(LLMProvider):
     
     def generate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
         """Generate text with context using OpenAI API"""
-        messages = []
-        
-        # Add context as system messages
-        for ctx in context:
-            messages.append({"role": "system", "content": ctx})
-        
-        # Add the main prompt
-        messages.append({"role": "user", "content": prompt})
+        # Context as system messages, then the main prompt
+        messages = self._context_prefix(context) + [{"role": "user", "content": prompt}]
         
         try:
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=kwargs.get('max_tokens', self.max_tokens),
-                temperature=kwargs.get('temperature', self.temperature),
-                timeout=kwargs.get('timeout', self.timeout)
+                **self._request_kwargs(messages, kwargs)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return f"Error generating response: {str(e)}"
+    
+    async def agenerate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
+        """Generate text with context using the async OpenAI client"""
+        messages = self._context_prefix(context) + [{"role": "user", "content": prompt}]
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._request_kwargs(messages, kwargs)
             )
             return response.choices[0].message.content
         except Exception as e:
@@ -110,6 +192,11 @@ class LocalLLMProvider(LLMProvider):
         if not self.model_path:
             raise ValueError("Local LLM model path not found")
         
+        # Context token ids and their KV cache, so a repeated context is not
+        # run through the model again
+        self._kv_cache = LRUCache(config.get('kv_cache_size', 4))
+        self._kv_lock = threading.Lock()
+        
         self._load_model()
     
     def _load_model(self):
@@ -134,6 +221,8 @@ class LocalLLMProvider(LLMProvider):
             # Set pad token if not present
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
+            # Batched prompts must end where generation starts
+            self.tokenizer.padding_side = 'left'
             
         except ImportError:
             raise ImportError("Transformers package not installed. Run: pip install transformers torch")
@@ -141,39 +230,83 @@ class LocalLLMProvider(LLMProvider):
             logger.error(f"Error loading local model: {e}")
             raise
     
+    def _generate_ids(self, inputs: Dict[str, Any], **kwargs):
+        """Run model.generate and return only the newly generated token ids"""
+        import torch
+        
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=kwargs.get('max_tokens', 512),
+                temperature=kwargs.get('temperature', 0.7),
+                do_sample=True,
+                use_cache=True,
+                return_dict_in_generate=False,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+        return outputs[:, inputs['input_ids'].shape[1]:]
+    
     def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using local model"""
+        return self.batch_generate([prompt], **kwargs)[0]
+    
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate text for several prompts in one padded model.generate call"""
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, 
-                                  max_length=self.context_length)
-            
-            if self.device != 'cpu':
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True,
+                                    max_length=self.context_length)
+            inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
             
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=kwargs.get('max_tokens', 512),
-                    temperature=kwargs.get('temperature', 0.7),
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
+            outputs = self._generate_ids(inputs, **kwargs)
             
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            # Remove the original prompt from the response
-            response = response[len(prompt):].strip()
-            
-            return response
+            return [text.strip() for text in
+                    self.tokenizer.batch_decode(outputs, skip_special_tokens=True)]
             
         except Exception as e:
             logger.error(f"Local LLM error: {e}")
-            return f"Error generating response: {str(e)}"
+            return [f"Error generating response: {str(e)}"] * len(prompts)
+    
+    def _context_cache(self, context_text: str):
+        """Token ids and KV cache for a context, computed once per distinct context"""
+        import torch
+        
+        with self._kv_lock:
+            cached = self._kv_cache.get(context_text)
+        if cached is None:
+            context_ids = self.tokenizer(context_text, return_tensors="pt").input_ids.to(self.model.device)
+            with torch.inference_mode():
+                past_key_values = self.model(context_ids, use_cache=True).past_key_values
+            cached = (context_ids, past_key_values)
+            with self._kv_lock:
+                self._kv_cache.put(context_text, cached)
+        return cached
     
     def generate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
         """Generate text with context using local model"""
         # Combine context and prompt
-        full_prompt = "\n\n".join(context) + "\n\n" + prompt
-        return self.generate(full_prompt, **kwargs)
+        context_text = "\n\n".join(context) + "\n\n"
+        try:
+            import torch
+            
+            prompt_ids = self.tokenizer(prompt, return_tensors="pt",
+                                        add_special_tokens=False).input_ids
+            context_ids, past_key_values = self._context_cache(context_text)
+            if context_ids.shape[1] + prompt_ids.shape[1] > self.context_length:
+                return self.generate(context_text + prompt, **kwargs)
+            
+            input_ids = torch.cat([context_ids, prompt_ids.to(context_ids.device)], dim=1)
+            # generate() extends the cache it is given, so hand it a copy
+            outputs = self._generate_ids({
+                'input_ids': input_ids,
+                'attention_mask': torch.ones_like(input_ids),
+                'past_key_values': copy.deepcopy(past_key_values)
+            }, **kwargs)
+            
+            return self.tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
+            
+        except Exception as e:
+            logger.error(f"Local LLM error: {e}")
+            return f"Error generating response: {str(e)}"
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get local model information"""
@@ -185,6 +318,97 @@ class LocalLLMProvider(LLMProvider):
         }
 
 
+class VLLMProvider(LLMProvider):
+    """vLLM provider using the server's OpenAI-compatible completions API
+    
+    Concurrent requests are batched server-side by vLLM's continuous batching
+    scheduler, and batch_generate sends a list of prompts in a single request.
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.base_url = config.get('base_url') or os.getenv('VLLM_BASE_URL', 'http://localhost:8000/v1')
+        self.api_key = config.get('api_key') or os.getenv('VLLM_API_KEY', 'EMPTY')
+        self.model = config.get('model')
+        self.max_tokens = config.get('max_tokens', 2048)
+        self.temperature = config.get('temperature', 0.7)
+        self.timeout = config.get('timeout', 30)
+        
+        if not self.model:
+            raise ValueError("vLLM model name not found")
+        
+        try:
+            import openai
+            self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+            self.async_client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        except ImportError:
+            raise ImportError("OpenAI package not installed. Run: pip install openai")
+    
+    def generate(self, prompt: str, **kwargs) -> str:
+        """Generate text using the vLLM server"""
+        try:
+            response = self.client.completions.create(
+                model=self.model,
+                prompt=prompt,
+                max_tokens=kwargs.get('max_tokens', self.max_tokens),
+                temperature=kwargs.get('temperature', self.temperature),
+                timeout=kwargs.get('timeout', self.timeout)
+            )
+            return response.choices[0].text
+        except Exception as e:
+            logger.error(f"vLLM API error: {e}")
+            return f"Error generating response: {str(e)}"
+    
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Generate text asynchronously using the vLLM server"""
+        try:
+            response = await self.async_client.completions.create(
+                model=self.model,
+                prompt=prompt,
+                max_tokens=kwargs.get('max_tokens', self.max_tokens),
+                temperature=kwargs.get('temperature', self.temperature),
+                timeout=kwargs.get('timeout', self.timeout)
+            )
+            return response.choices[0].text
+        except Exception as e:
+            logger.error(f"vLLM API error: {e}")
+            return f"Error generating response: {str(e)}"
+    
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate text for several prompts in one completions request"""
+        try:
+            response = self.client.completions.create(
+                model=self.model,
+                prompt=prompts,
+                max_tokens=kwargs.get('max_tokens', self.max_tokens),
+                temperature=kwargs.get('temperature', self.temperature),
+                timeout=kwargs.get('timeout', self.timeout)
+            )
+            texts = [''] * len(prompts)
+            for choice in response.choices:
+                texts[choice.index] = choice.text
+            return texts
+        except Exception as e:
+            logger.error(f"vLLM API error: {e}")
+            return [f"Error generating response: {str(e)}"] * len(prompts)
+    
+    def generate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
+        """Generate text with context using the vLLM server"""
+        # Combine context and prompt
+        full_prompt = "\n\n".join(context) + "\n\n" + prompt
+        return self.generate(full_prompt, **kwargs)
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """Get vLLM model information"""
+        return {
+            'provider': 'vllm',
+            'model': self.model,
+            'base_url': self.base_url,
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature
+        }
+
+
 class LLMManager:
     """Manager for different LLM providers"""
     
@@ -201,6 +425,8 @@ class LLMManager:
             return OpenAIProvider(self.config)
         elif self.provider_name == 'local':
             return LocalLLMProvider(self.config)
+        elif self.provider_name == 'vllm':
+            return VLLMProvider(self.config)
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider_name}")
     
@@ -208,10 +434,24 @@ class LLMManager:
         """Generate text using the configured provider"""
         return self.provider.generate(prompt, **kwargs)
     
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Generate text asynchronously using the configured provider"""
+        return await self.provider.agenerate(prompt, **kwargs)
+    
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate text for several independent prompts using the configured provider"""
+        return self.provider.batch_generate(prompts, **kwargs)
+    
     def generate_with_context(self, prompt: str, context: List[str], **kwargs) -> str:
         """Generate text with context using the configured provider"""
         return self.provider.generate_with_context(prompt, context, **kwargs)
     
+    async def agenerate_batch(self, prompts: List[str], context: Optional[List[str]] = None,
+                              **kwargs) -> List[str]:
+        """Generate text for several prompts concurrently using the configured provider"""
+        kwargs.setdefault('max_concurrency', self.config.get('max_concurrency', 8))
+        return await self.provider.agenerate_batch(prompts, context, **kwargs)
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
         return self.provider.get_model_info()
@@ -7,6 +7,6 @@ This module contains the actual provider implementations
 # are implemented in the llm_manager.py file for simplicity.
 # In a larger project, you might want to separate them into individual files.
 
-from .llm_manager import OpenAIProvider, LocalLLMProvider
+from .llm_manager import OpenAIProvider, LocalLLMProvider, VLLMProvider
 
-__all__ = ["OpenAIProvider", "LocalLLMProvider"] 
\ No newline at end of file
+__all__ = ["OpenAIProvider", "LocalLLMProvider", "VLLMProvider"] 
\ No newline at end of file
@@ -2,8 +2,10 @@
 Utility modules for DB-GPT
 """
 
+from .cache import LRUCache
 from .config import Config
 from .logger import setup_logging
+from .result_log import ResultLog
 from .text_to_sql import TextToSQLConverter
 
-__all__ = ["Config", "setup_logging", "TextToSQLConverter"] 
\ No newline at end of file
+__all__ = ["Config", "LRUCache", "ResultLog", "setup_logging", "TextToSQLConverter"] 
\ No newline at end of file
@@ -4,36 +4,119 @@ Handles loading and validation of configuration settings
 """
 
 import os
+import pickle
+import re
+import tempfile
+import threading
 import yaml
 import logging
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+# libyaml's C parser and emitter when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader, CDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, Dumper as _YamlDumper
+
 logger = logging.getLogger(__name__)
 
+# Marks a key that is not in the configuration
+_MISSING = object()
+
+# A ${VAR} reference, anywhere in a string value
+_ENV_REFERENCE = re.compile(r'\$\{([^}]+)\}')
+
+
+def _env_value(match: "re.Match") -> str:
+    """Value of a referenced environment variable, or the reference itself if unset"""
+    return os.environ.get(match.group(1), match.group(0))
+
 
 class Config:
     """Configuration manager for DB-GPT"""
     
     def __init__(self, config_path: str = "config.yaml"):
         self.config_path = config_path
-        self.config_data: Dict[str, Any] = {}
-        self._load_config()
-        self._validate_config()
+        # The file is read and validated on first use, not here
+        self._config_data: Dict[str, Any] = {}
+        self._loaded = False
+        self._load_lock = threading.RLock()
+        # Values found by get(), by dotted key; cleared by set(), reload() and
+        # assigning config_data (edit the section dicts through set())
+        self._get_cache: Dict[str, Any] = {}
+    
+    @property
+    def config_data(self) -> Dict[str, Any]:
+        """The configuration settings, loaded on first access"""
+        if not self._loaded:
+            self._ensure_loaded()
+        return self._config_data
+    
+    @config_data.setter
+    def config_data(self, config_data: Dict[str, Any]):
+        with self._load_lock:
+            self._config_data = config_data
+            self._loaded = True
+            self._get_cache.clear()
+    
+    def _ensure_loaded(self):
+        """Load and validate the configuration once"""
+        with self._load_lock:
+            if not self._loaded:
+                self._load_config()
+                self._validate_config()
+                self._loaded = True
     
     def _load_config(self):
         """Load configuration from YAML file"""
         try:
             if os.path.exists(self.config_path):
-                with open(self.config_path, 'r') as f:
-                    self.config_data = yaml.safe_load(f) or {}
+                self._config_data = self._read_config_file()
                 logger.info(f"Loaded configuration from {self.config_path}")
             else:
                 logger.warning(f"Configuration file {self.config_path} not found, using defaults")
-                self.config_data = self._get_default_config()
+                self._config_data = self._get_default_config()
         except Exception as e:
             logger.error(f"Error loading configuration: {e}")
-            self.config_data = self._get_default_config()
+            self._config_data = self._get_default_config()
+    
+    @property
+    def _cache_path(self) -> str:
+        """Pickled copy of the parsed config file, kept next to it"""
+        return f"{self.config_path}.cache.pkl"
+    
+    def _read_config_file(self) -> Dict[str, Any]:
+        """Parse the config file, reusing the pickled result while the file is unchanged"""
+        stat = os.stat(self.config_path)
+        key = (os.path.abspath(self.config_path), stat.st_mtime_ns, stat.st_size)
+        
+        try:
+            with open(self._cache_path, 'rb') as f:
+                cached_key, config_data = pickle.load(f)
+            if cached_key == key:
+                return config_data
+        except Exception:
+            pass  # No usable cache, parse the file
+        
+        with open(self.config_path, 'r') as f:
+            config_data = yaml.load(f, Loader=_YamlLoader) or {}
+        
+        # Write the cache atomically so concurrent processes never read a partial file
+        directory, name = os.path.split(os.path.abspath(self._cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((key, config_data), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.debug(f"Could not cache parsed configuration: {e}")
+        
+        return config_data
     
     def _get_default_config(self) -> Dict[str, Any]:
         """Get default configuration"""
@@ -58,12 +141,23 @@ class Config:
             'agent': {
                 'max_iterations': 10,
                 'max_consecutive_auto_reply': 3,
-                'human_input_mode': 'NEVER'
+                'human_input_mode': 'NEVER',
+                'max_concurrency': 4,
+                'max_parallel_tasks': 1,
+                'llm_cache': True,
+                'llm_cache_size': 256,
+                'results_log_file': 'agent_results.jsonl',
+                'result_summary_window': 100
             },
             'task': {
                 'max_tasks': 100,
                 'task_list_file': 'task_list.json',
-                'result_summary_file': 'result_summary.json'
+                'task_log_file': 'task_list.log.jsonl',
+                'compact_log_bytes': 4 * 1024 * 1024,
+                'result_summary_file': 'result_summary.json',
+                'flush_batch_size': 32,
+                'flush_interval_s': 5,
+                'deduplicate_tasks': True
             },
             'logging': {
                 'level': 'INFO',
@@ -78,18 +172,18 @@ class Config:
         required_sections = ['llm', 'database', 'agent', 'task']
         
         for section in required_sections:
-            if section not in self.config_data:
+            if section not in self._config_data:
                 logger.warning(f"Missing configuration section: {section}")
-                self.config_data[section] = {}
+                self._config_data[section] = {}
         
         # Validate LLM configuration
-        llm_config = self.config_data.get('llm', {})
+        llm_config = self._config_data.get('llm', {})
         if llm_config.get('provider') == 'openai':
             if not llm_config.get('api_key') and not os.getenv('OPENAI_API_KEY'):
                 logger.warning("OpenAI API key not found in configuration or environment")
         
         # Validate database configuration
-        db_config = self.config_data.get('database', {})
+        db_config = self._config_data.get('database', {})
         if db_config.get('type') == 'postgresql':
             required_db_vars = ['username', 'password', 'database']
             for var in required_db_vars:
@@ -98,16 +192,19 @@ class Config:
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value by key (supports dot notation)"""
-        keys = key.split('.')
-        value = self.config_data
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
+        value = self._get_cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.config_data
+            for k in key.split('.'):
+                if isinstance(value, dict) and k in value:
+                    value = value[k]
+                else:
+                    value = _MISSING
+                    break
+            # Absent keys are cached too; the default is applied per call
+            self._get_cache[key] = value
         
-        return value
+        return default if value is _MISSING else value
     
     def set(self, key: str, value: Any):
         """Set configuration value by key (supports dot notation)"""
@@ -120,22 +217,31 @@ class Config:
             config = config[k]
         
         config[keys[-1]] = value
+        self._get_cache.clear()
     
     def save(self, config_path: Optional[str] = None):
         """Save configuration to file"""
         save_path = config_path or self.config_path
         
         try:
+            if os.path.abspath(save_path) == os.path.abspath(self.config_path):
+                try:
+                    os.unlink(self._cache_path)
+                except FileNotFoundError:
+                    pass
             with open(save_path, 'w') as f:
-                yaml.dump(self.config_data, f, default_flow_style=False, indent=2)
+                yaml.dump(self.config_data, f, Dumper=_YamlDumper, default_flow_style=False, indent=2)
             logger.info(f"Configuration saved to {save_path}")
         except Exception as e:
             logger.error(f"Error saving configuration: {e}")
     
     def reload(self):
         """Reload configuration from file"""
-        self._load_config()
-        self._validate_config()
+        with self._load_lock:
+            self._load_config()
+            self._validate_config()
+            self._loaded = True
+            self._get_cache.clear()
     
     @property
     def llm(self) -> Dict[str, Any]:
@@ -178,24 +284,34 @@ class Config:
         return self.config_data.get('performance', {})
     
     def resolve_environment_variables(self, value: str) -> str:
-        """Resolve environment variables in configuration values"""
-        if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
-            env_var = value[2:-1]
-            return os.getenv(env_var, value)
+        """Resolve ${VAR} references in configuration values (unset variables are kept as is)"""
+        if isinstance(value, str) and '$' in value:
+            return _ENV_REFERENCE.sub(_env_value, value)
         return value
     
     def get_resolved_config(self) -> Dict[str, Any]:
-        """Get configuration with environment variables resolved"""
+        """
+        Get configuration with environment variables resolved
+        
+        Only the dicts on the path to a value that actually changed are copied;
+        everything else is shared with ``config_data``, so treat the result as
+        read-only.
+        """
         def resolve_dict(d: Dict[str, Any]) -> Dict[str, Any]:
-            resolved = {}
+            resolved: Optional[Dict[str, Any]] = None
             for key, value in d.items():
+                new_value: Any
                 if isinstance(value, dict):
-                    resolved[key] = resolve_dict(value)
-                elif isinstance(value, str):
-                    resolved[key] = self.resolve_environment_variables(value)
+                    new_value = resolve_dict(value)
+                elif isinstance(value, str) and '$' in value:
+                    new_value = _ENV_REFERENCE.sub(_env_value, value)
                 else:
-                    resolved[key] = value
-            return resolved
+                    continue
+                if new_value is not value and new_value != value:
+                    if resolved is None:
+                        resolved = dict(d)
+                    resolved[key] = new_value
+            return d if resolved is None else resolved
         
         return resolve_dict(self.config_data)
     
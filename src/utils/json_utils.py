@@ -0,0 +1,78 @@
+"""
+JSON helpers for DB-GPT
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def _orjson_option(indent: Optional[int]) -> Optional[int]:
+    """orjson option flags for an indent, or None if orjson cannot produce it"""
+    if orjson is None or indent not in (None, 2):
+        return None
+    return orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+
+
+def _stdlib_dumps(obj: Any, indent: Optional[int]) -> str:
+    """Serialize with the standard library, matching orjson's separators"""
+    separators = (',', ':') if indent is None else (',', ': ')
+    return json.dumps(obj, default=str, indent=indent, separators=separators)
+
+
+def dumps(obj: Any, indent: Optional[int] = None) -> str:
+    """Serialize an object to a JSON string (compact unless indent is given)"""
+    option = _orjson_option(indent)
+    if option is not None:
+        return orjson.dumps(obj, default=str, option=option).decode()
+    return _stdlib_dumps(obj, indent)
+
+
+def dumps_bytes(obj: Any, indent: Optional[int] = None) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON"""
+    option = _orjson_option(indent)
+    if option is not None:
+        return orjson.dumps(obj, default=str, option=option)
+    return _stdlib_dumps(obj, indent).encode()
+
+
+def loads(data: Any) -> Any:
+    """Deserialize a JSON string or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# A fenced ```json block, or else the outermost object/array in the text
+_FENCED_JSON = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_SPAN = re.compile(r'[\[{].*[\]}]', re.S)
+
+
+def parse_llm_json(text: str) -> Optional[Any]:
+    """Extract and parse the JSON object or array embedded in an LLM response"""
+    fenced = _FENCED_JSON.search(text)
+    if fenced:
+        text = fenced.group(1)
+    
+    span = _JSON_SPAN.search(text)
+    if not span:
+        return None
+    
+    try:
+        return loads(span.group(0))
+    except ValueError:
+        pass
+    
+    # Prose after the JSON can contain brackets of its own; decode just the
+    # first complete value instead
+    try:
+        return json.JSONDecoder().raw_decode(text, span.start())[0]
+    except ValueError:
+        return None
@@ -2,31 +2,81 @@
 Logging utility for DB-GPT
 """
 
+import atexit
 import logging
 import logging.handlers
 import os
-from typing import Dict, Any
+import queue
+import re
+from typing import Dict, Any, Optional
+
+_SIZE = re.compile(r'^\s*(\d+)\s*([KMGT]?B)?\s*$', re.I)
+_SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+_LEVELS = {
+    'CRITICAL': logging.CRITICAL,
+    'ERROR': logging.ERROR,
+    'WARNING': logging.WARNING,
+    'INFO': logging.INFO,
+    'DEBUG': logging.DEBUG,
+}
+
+# Loggers handed out by get_logger, so repeat calls skip the logging manager's lock
+_loggers: Dict[str, logging.Logger] = {}
+
+# Writes records to the real handlers on a background thread
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Handler feeding that listener, installed on the root logger
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def _stop_listener():
+    """Flush queued records and stop the background listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def parse_size(size: str) -> int:
+    """Convert a size such as '10MB', '512kb' or '2048' to bytes"""
+    match = _SIZE.match(size)
+    if not match:
+        raise ValueError(f"Invalid size: {size!r}")
+    return int(match.group(1)) * _SIZE_UNITS[(match.group(2) or 'B').upper()]
 
 
 def setup_logging(config: Dict[str, Any]) -> None:
     """Setup logging configuration"""
-    log_level = getattr(logging, config.get('level', 'INFO').upper())
+    level_name = config.get('level', 'INFO').upper()
+    if level_name not in _LEVELS:
+        raise ValueError(f"Invalid log level: {level_name!r}")
+    log_level = _LEVELS[level_name]
     log_file = config.get('file', 'db_gpt.log')
     max_size = config.get('max_size', '10MB')
     backup_count = config.get('backup_count', 5)
     
     # Convert max_size to bytes
     if isinstance(max_size, str):
-        if max_size.endswith('MB'):
-            max_size = int(max_size[:-2]) * 1024 * 1024
-        elif max_size.endswith('KB'):
-            max_size = int(max_size[:-2]) * 1024
-        else:
-            max_size = int(max_size)
+        max_size = parse_size(max_size)
+    
+    # Records carry nothing the format below doesn't use: no caller frame
+    # lookup, thread, process or multiprocessing details
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
     
     # Create formatter
     formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        validate=False
     )
     
     # Setup file handler with rotation
@@ -41,11 +91,23 @@ def setup_logging(config: Dict[str, Any]) -> None:
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     
-    # Setup root logger
+    # Setup root logger. Log calls only enqueue the record; formatting and
+    # file/console writes happen on the listener's thread
+    global _listener, _queue_handler
+    _stop_listener()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    # Replace the handler from an earlier call rather than stacking another
+    if _queue_handler is not None:
+        root_logger.removeHandler(_queue_handler)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root_logger.addHandler(_queue_handler)
     
     # Set specific logger levels
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
@@ -56,4 +118,7 @@ def setup_logging(config: Dict[str, Any]) -> None:
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance"""
-    return logging.getLogger(name) 
\ No newline at end of file
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = logging.getLogger(name)
+    return logger 
\ No newline at end of file
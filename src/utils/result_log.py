@@ -0,0 +1,60 @@
+"""
+Append-only task result log for DB-GPT
+"""
+
+import os
+from collections import deque
+from typing import Any, Deque, Dict, IO, Iterator, Optional
+
+from .json_utils import dumps, loads
+
+
+class ResultLog:
+    """JSONL log of task results that keeps only the most recent records in memory"""
+    
+    def __init__(self, path: str, window: int = 100):
+        self.path = path
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self.count = 0
+        self._fh: Optional[IO[str]] = None
+    
+    def append(self, record: Dict[str, Any]):
+        """Write a record to disk immediately and remember it in the recent window"""
+        if self._fh is None:
+            # Line buffering keeps every completed record on disk if the process dies
+            self._fh = open(self.path, 'a', buffering=1)
+        self._fh.write(dumps(record) + '\n')
+        self.recent.append(record)
+        self.count += 1
+    
+    def lines(self) -> Iterator[str]:
+        """Stream the serialized records back from disk"""
+        if self._fh is not None:
+            self._fh.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    yield line
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for line in self.lines():
+            yield loads(line)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def close(self):
+        """Close the log file"""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+    
+    def reset(self):
+        """Start a new run: truncate the log file and forget its records"""
+        self.close()
+        self._fh = open(self.path, 'w', buffering=1)
+        self.recent.clear()
+        self.count = 0
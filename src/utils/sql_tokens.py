@@ -0,0 +1,40 @@
+"""
+SQL tokenizing helpers shared by the database layer and the text-to-SQL converter
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Spans whose contents are not SQL: quoted literals and identifiers,
+# dollar-quoted bodies and comments. Token patterns start with this
+# (compiled with re.S | re.X) so keywords, parentheses and semicolons
+# inside such spans are never seen on their own.
+SKIPPED_SPANS = r"""
+    '(?:[^']|'')*'                   # string literal
+  | "(?:[^"]|"")*"                   # quoted identifier
+  | \$(?P<tag>\w*)\$.*?\$(?P=tag)\$  # dollar-quoted body
+  | --[^\n]*                         # line comment
+  | /\*.*?\*/                        # block comment
+"""
+
+# Statement separators, plus the spans a ';' inside of does not end a statement
+_STATEMENT_TOKEN = re.compile(SKIPPED_SPANS + r"  | ;", re.S | re.X)
+
+
+def is_skipped(token: str) -> bool:
+    """Whether a token matched by SKIPPED_SPANS is a quoted span or comment"""
+    return token[0] in '\'"$' or token.startswith(('--', '/*'))
+
+
+@lru_cache(maxsize=32)
+def split_statements(sql_script: str) -> Tuple[str, ...]:
+    """Split a SQL script on the semicolons that end statements"""
+    statements = []
+    start = 0
+    for token in _STATEMENT_TOKEN.finditer(sql_script):
+        if token.group() == ';':
+            statements.append(sql_script[start:token.start()].strip())
+            start = token.end()
+    statements.append(sql_script[start:].strip())
+    return tuple(statement for statement in statements if statement)
@@ -5,20 +5,185 @@ Converts natural language queries to SQL statements
 
 import logging
 import re
-from typing import Dict, List, Any, Optional, Tuple
+import sys
+import threading
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, FrozenSet, Iterator, List, Any, NamedTuple, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
+from .sql_tokens import SKIPPED_SPANS, is_skipped
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# dataclass(slots=True) needs Python 3.10+
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+QUERY_TYPES = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'DROP'})
+
+# Keywords that end a WHERE clause
+_WHERE_END = frozenset({'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'UNION', 'RETURNING'})
+
+# Everything _scan_sql looks at: quoted spans and comments (skipped whole, so
+# keywords inside them do not count), words, parentheses, commas and semicolons
+_SQL_TOKEN = re.compile(SKIPPED_SPANS + r"""
+  | [A-Za-z_][\w$]*
+  | [(),;]
+""", re.S | re.X)
+
+_COLUMN_ALIAS = re.compile(r'\s+AS\s+\w+', re.I)
+
+# Cleanup of LLM responses: markdown fences and leading labels
+_MARKDOWN_FENCE = re.compile(r'```(?:sql)?\s*')
+_SQL_PREFIX = re.compile(r'^SQL[:\s]*', re.I)
+_QUERY_PREFIX = re.compile(r'^Query[:\s]*', re.I)
+
+_SQL_KEYWORD = re.compile(r'SELECT|INSERT|UPDATE|DELETE|CREATE', re.I)
+
+
+class SQLParts(NamedTuple):
+    """Metadata pulled out of a SQL statement"""
+    query_type: str
+    tables: Tuple[str, ...]
+    columns: Tuple[str, ...]
+    conditions: Tuple[str, ...]
+    paren_depth: int  # opening minus closing parentheses outside quotes and comments
+
+
+def _leading_keyword(sql: str) -> str:
+    """First word of a statement in upper case, skipping comments; '' if there is none"""
+    for token in _SQL_TOKEN.finditer(sql):
+        text = token.group()
+        if text[0].isalpha() or text[0] == '_':
+            return text.upper()
+    return ''
+
+
+def _select_column(item: str) -> Optional[str]:
+    """Column named by a select-list item, or None for *, functions and expressions"""
+    column = _COLUMN_ALIAS.sub('', item).strip()
+    if not column or column == '*' or '(' in column:
+        return None
+    return column
+
+
+@lru_cache(maxsize=256)
+def _scan_sql(sql: str) -> SQLParts:
+    """
+    Pull the query type, tables, select-list columns and WHERE conditions out
+    of a statement in a single pass over its tokens
+    """
+    query_type = None
+    tables: Dict[str, None] = {}  # ordered set
+    columns: List[str] = []
+    conditions: List[str] = []
+    
+    depth = 0
+    previous = None
+    select_depth = None  # depth of the first SELECT while its list is open
+    select_done = False
+    where_depth = None  # depth of the first WHERE while its clause is open
+    where_done = False
+    between = False
+    column_start = 0  # offset where the current select-list item begins
+    condition_start = 0  # offset where the current condition begins
+    
+    def close_where(end: int):
+        nonlocal where_depth, where_done
+        conditions.append(sql[condition_start:end])
+        where_depth = None
+        where_done = True
+    
+    for token in _SQL_TOKEN.finditer(sql):
+        text = token.group()
+        first = text[0]
+        if text.startswith(('--', '/*')):
+            continue
+        
+        if is_skipped(text):
+            # A quoted identifier after FROM/JOIN/INTO/UPDATE names a table
+            if first == '"' and (previous in ('FROM', 'JOIN', 'UPDATE')
+                                 or (previous == 'INTO' and query_type == 'INSERT')):
+                tables[text[1:-1].replace('""', '"')] = None
+        elif first == '(':
+            depth += 1
+        elif first == ')':
+            depth -= 1
+            if where_depth is not None and depth < where_depth:
+                close_where(token.start())
+        elif first == ',':
+            if select_depth == depth:
+                columns.append(sql[column_start:token.start()])
+                column_start = token.end()
+        elif first == ';':
+            if where_depth is not None:
+                close_where(token.start())
+        else:
+            word = text.upper()
+            if query_type is None:
+                query_type = word if word in QUERY_TYPES else 'UNKNOWN'
+            
+            if previous in ('FROM', 'JOIN', 'UPDATE') or (previous == 'INTO' and query_type == 'INSERT'):
+                tables[text] = None
+            
+            if word == 'SELECT' and select_depth is None and not select_done:
+                select_depth = depth
+                column_start = token.end()
+            elif word == 'FROM' and select_depth == depth:
+                columns.append(sql[column_start:token.start()])
+                select_depth = None
+                select_done = True
+            elif word == 'WHERE' and where_depth is None and not where_done:
+                where_depth = depth
+                condition_start = token.end()
+            elif where_depth == depth:
+                if word == 'BETWEEN':
+                    between = True
+                elif word == 'AND' and between:
+                    between = False
+                elif word in ('AND', 'OR'):
+                    conditions.append(sql[condition_start:token.start()])
+                    condition_start = token.end()
+                elif word in _WHERE_END:
+                    close_where(token.start())
+            previous = word
+            continue
+        previous = first
+    
+    if where_depth is not None:
+        close_where(len(sql))
+    
+    # A select list is only complete once its FROM is reached
+    selected = (_select_column(item) for item in columns) if select_done else ()
+    return SQLParts(
+        query_type=query_type or 'UNKNOWN',
+        tables=tuple(tables),
+        columns=tuple(column for column in selected if column),
+        conditions=tuple(c.strip() for c in conditions if c.strip()),
+        paren_depth=depth
+    )
+
+
+def _table_context_lines(table_name: str, columns: List[Dict[str, Any]]) -> Iterator[str]:
+    """Schema context lines for one table, ending with a blank separator"""
+    yield f"Table: {table_name}"
+    for col in columns:
+        nullable = "NULL" if col['is_nullable'] else "NOT NULL"
+        default = f" DEFAULT {col['column_default']}" if col['column_default'] else ""
+        yield f"  - {col['column_name']}: {col['data_type']} {nullable}{default}"
+    yield ""
+
+
+@dataclass(frozen=True, **_SLOTS)
 class SQLQuery:
     """Represents a SQL query with metadata"""
     query: str
     query_type: str  # SELECT, INSERT, UPDATE, DELETE, CREATE, etc.
-    tables: List[str]
-    columns: List[str]
-    conditions: List[str]
+    tables: Tuple[str, ...]  # in order of first appearance
+    columns: Tuple[str, ...]
+    conditions: Tuple[str, ...]
     explanation: str
     confidence: float
 
@@ -26,11 +191,70 @@ class SQLQuery:
 class TextToSQLConverter:
     """Converts natural language text to SQL queries"""
     
-    def __init__(self, llm_manager, db_connection):
+    def __init__(self, llm_manager, db_connection, schema_ttl: float = 300.0):
         self.llm_manager = llm_manager
         self.db_connection = db_connection
-        self.schema_cache: Dict[str, Any] = {}
-        self._load_schema()
+        # The schema is read from the database on first use rather than here.
+        # Once older than schema_ttl seconds it keeps being served while a
+        # background thread fetches a fresh copy.
+        self._schema_cache: Dict[str, Any] = {}
+        self._schema_names: FrozenSet[str] = frozenset()
+        self._schema_context: Optional[str] = None
+        self._schema_fetched_at = 0.0
+        self.schema_ttl = schema_ttl
+        self.schema_loaded = False
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+    
+    @property
+    def schema_cache(self) -> Dict[str, Any]:
+        """Database schema used as context, keyed by table name (loaded on first access)"""
+        self._ensure_schema()
+        return self._schema_cache
+    
+    @schema_cache.setter
+    def schema_cache(self, schema: Dict[str, Any]):
+        self._schema_cache = schema
+        self._schema_names = frozenset(schema)
+        self._schema_context = None
+        self._schema_fetched_at = time.monotonic()
+        self.schema_loaded = True
+    
+    def _ensure_schema(self):
+        """Load the schema on first use and start a refresh once it is stale"""
+        if not self.schema_loaded:
+            with self._load_lock:
+                if not self.schema_loaded:
+                    self._load_schema()
+        elif time.monotonic() - self._schema_fetched_at >= self.schema_ttl and not self._refreshing:
+            with self._load_lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh_schema, daemon=True).start()
+    
+    def _refresh_schema(self):
+        """Fetch the schema in the background, keeping the current one on failure"""
+        try:
+            schema = self.db_connection.get_schema()
+            # Providers report a failed catalog read as an empty schema
+            if not schema and self._schema_cache:
+                logger.warning("Schema refresh returned no tables; keeping the current schema")
+                self._schema_fetched_at = time.monotonic()
+                return
+            with self._load_lock:
+                self.schema_cache = schema
+            logger.info(f"Refreshed schema for {len(schema)} tables")
+        except Exception as e:
+            logger.warning(f"Failed to refresh schema: {e}")
+            self._schema_fetched_at = time.monotonic()
+        finally:
+            self._refreshing = False
+    
+    def reload_schema(self):
+        """Read the schema from the database again"""
+        with self._load_lock:
+            self._load_schema()
     
     def _load_schema(self):
         """Load database schema for context"""
@@ -94,30 +318,29 @@ class TextToSQLConverter:
         return sql
     
     def _format_schema_context(self) -> str:
-        """Format database schema for LLM context"""
+        """Format database schema for LLM context (built once per loaded schema)"""
+        if self._schema_context is None:
+            self._schema_context = self._build_schema_context()
+        return self._schema_context
+    
+    def _build_schema_context(self) -> str:
+        """Render the schema as the text block given to the LLM"""
         if not self.schema_cache:
             return "No schema information available"
         
-        schema_text = []
-        for table_name, columns in self.schema_cache.items():
-            schema_text.append(f"Table: {table_name}")
-            for col in columns:
-                nullable = "NULL" if col['is_nullable'] else "NOT NULL"
-                default = f" DEFAULT {col['column_default']}" if col['column_default'] else ""
-                schema_text.append(f"  - {col['column_name']}: {col['data_type']} {nullable}{default}")
-            schema_text.append("")
-        
-        return "\n".join(schema_text)
+        return "\n".join(chain.from_iterable(
+            _table_context_lines(table_name, columns)
+            for table_name, columns in self.schema_cache.items()
+        ))
     
     def _extract_sql_from_response(self, response: str) -> str:
         """Extract SQL query from LLM response"""
         # Remove markdown code blocks
-        sql = re.sub(r'```sql\s*', '', response)
-        sql = re.sub(r'```\s*', '', sql)
+        sql = _MARKDOWN_FENCE.sub('', response)
         
         # Remove common prefixes
-        sql = re.sub(r'^SQL[:\s]*', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'^Query[:\s]*', '', sql, flags=re.IGNORECASE)
+        sql = _SQL_PREFIX.sub('', sql)
+        sql = _QUERY_PREFIX.sub('', sql)
         
         # Clean up whitespace
         sql = sql.strip()
@@ -127,17 +350,13 @@ class TextToSQLConverter:
     def _parse_sql(self, sql: str) -> SQLQuery:
         """Parse SQL query and extract metadata"""
         try:
-            # Determine query type
-            query_type = self._detect_query_type(sql)
-            
-            # Extract tables
-            tables = self._extract_tables(sql)
-            
-            # Extract columns
-            columns = self._extract_columns(sql)
-            
-            # Extract conditions
-            conditions = self._extract_conditions(sql)
+            # Query type, tables, columns and conditions from one scan; its
+            # tuples are immutable, so they are shared rather than copied
+            parts = _scan_sql(sql)
+            query_type = parts.query_type
+            tables = parts.tables
+            columns = parts.columns
+            conditions = parts.conditions
             
             # Generate explanation
             explanation = self._generate_explanation(sql, query_type, tables, columns)
@@ -160,98 +379,32 @@ class TextToSQLConverter:
             return SQLQuery(
                 query=sql,
                 query_type="UNKNOWN",
-                tables=[],
-                columns=[],
-                conditions=[],
+                tables=(),
+                columns=(),
+                conditions=(),
                 explanation=f"Error parsing SQL: {str(e)}",
                 confidence=0.0
             )
     
     def _detect_query_type(self, sql: str) -> str:
         """Detect the type of SQL query"""
-        sql_upper = sql.upper().strip()
-        
-        if sql_upper.startswith('SELECT'):
-            return 'SELECT'
-        elif sql_upper.startswith('INSERT'):
-            return 'INSERT'
-        elif sql_upper.startswith('UPDATE'):
-            return 'UPDATE'
-        elif sql_upper.startswith('DELETE'):
-            return 'DELETE'
-        elif sql_upper.startswith('CREATE'):
-            return 'CREATE'
-        elif sql_upper.startswith('ALTER'):
-            return 'ALTER'
-        elif sql_upper.startswith('DROP'):
-            return 'DROP'
-        else:
-            return 'UNKNOWN'
+        keyword = _leading_keyword(sql)
+        return keyword if keyword in QUERY_TYPES else 'UNKNOWN'
     
     def _extract_tables(self, sql: str) -> List[str]:
         """Extract table names from SQL query"""
-        tables = []
-        
-        # Extract FROM clause tables
-        from_match = re.search(r'FROM\s+(\w+)', sql, re.IGNORECASE)
-        if from_match:
-            tables.append(from_match.group(1))
-        
-        # Extract JOIN clause tables
-        join_matches = re.findall(r'JOIN\s+(\w+)', sql, re.IGNORECASE)
-        tables.extend(join_matches)
-        
-        # Extract INSERT/UPDATE table
-        insert_match = re.search(r'INSERT\s+INTO\s+(\w+)', sql, re.IGNORECASE)
-        if insert_match:
-            tables.append(insert_match.group(1))
-        
-        update_match = re.search(r'UPDATE\s+(\w+)', sql, re.IGNORECASE)
-        if update_match:
-            tables.append(update_match.group(1))
-        
-        # Remove duplicates and return
-        return list(set(tables))
+        return list(_scan_sql(sql).tables)
     
     def _extract_columns(self, sql: str) -> List[str]:
         """Extract column names from SQL query"""
-        columns = []
-        
-        # Extract SELECT columns
-        select_match = re.search(r'SELECT\s+(.*?)\s+FROM', sql, re.IGNORECASE | re.DOTALL)
-        if select_match:
-            select_clause = select_match.group(1)
-            # Split by comma and clean up
-            cols = [col.strip() for col in select_clause.split(',')]
-            for col in cols:
-                # Remove aliases and functions
-                clean_col = re.sub(r'\s+AS\s+\w+', '', col, flags=re.IGNORECASE)
-                clean_col = re.sub(r'\w+\(', '', clean_col)  # Remove function names
-                clean_col = re.sub(r'\)', '', clean_col)
-                if clean_col.strip() and clean_col.strip() != '*':
-                    columns.append(clean_col.strip())
-        
-        return columns
+        return list(_scan_sql(sql).columns)
     
     def _extract_conditions(self, sql: str) -> List[str]:
         """Extract WHERE conditions from SQL query"""
-        conditions = []
-        
-        where_match = re.search(r'WHERE\s+(.*?)(?:\s+GROUP\s+BY|\s+ORDER\s+BY|\s+LIMIT|$)', 
-                               sql, re.IGNORECASE | re.DOTALL)
-        if where_match:
-            where_clause = where_match.group(1)
-            # Split by AND/OR and clean up
-            conds = re.split(r'\s+AND\s+|\s+OR\s+', where_clause, flags=re.IGNORECASE)
-            for cond in conds:
-                clean_cond = cond.strip()
-                if clean_cond:
-                    conditions.append(clean_cond)
-        
-        return conditions
+        return list(_scan_sql(sql).conditions)
     
-    def _generate_explanation(self, sql: str, query_type: str, tables: List[str], 
-                            columns: List[str]) -> str:
+    def _generate_explanation(self, sql: str, query_type: str, tables: Sequence[str], 
+                            columns: Sequence[str]) -> str:
         """Generate explanation of what the SQL query does"""
         explanation_parts = []
         
@@ -268,21 +421,21 @@ class TextToSQLConverter:
         
         return " ".join(explanation_parts)
     
-    def _calculate_confidence(self, sql: str, tables: List[str]) -> float:
+    def _calculate_confidence(self, sql: str, tables: Sequence[str]) -> float:
         """Calculate confidence score for the generated SQL"""
         confidence = 1.0
         
         # Check if tables exist in schema
-        for table in tables:
-            if table not in self.schema_cache:
-                confidence -= 0.2
+        self._ensure_schema()
+        missing = len(set(tables) - self._schema_names)
+        confidence -= 0.2 * missing
         
         # Check for basic SQL syntax
-        if not re.search(r'SELECT|INSERT|UPDATE|DELETE|CREATE', sql, re.IGNORECASE):
+        if not _SQL_KEYWORD.search(sql):
             confidence -= 0.3
         
-        # Check for balanced parentheses
-        if sql.count('(') != sql.count(')'):
+        # Check for balanced parentheses (counted by the cached metadata scan)
+        if _scan_sql(sql).paren_depth:
             confidence -= 0.1
         
         return max(0.0, confidence)
@@ -291,7 +444,7 @@ class TextToSQLConverter:
         """Validate SQL query against database schema"""
         try:
             # Try to execute the query (for SELECT queries)
-            if sql.upper().strip().startswith('SELECT'):
+            if _leading_keyword(sql) == 'SELECT':
                 self.db_connection.execute_query(sql)
                 return True, "SQL query is valid"
             else:
@@ -2,9 +2,32 @@
 Unit tests for Agent Manager
 """
 
+import asyncio
+from types import SimpleNamespace
 import pytest
-from unittest.mock import Mock, patch
-from src.core.agent_manager import AgentManager, Agent, AgentRole
+from unittest.mock import Mock, AsyncMock, patch
+from src.core.agent_manager import AgentManager, Agent, AgentRole, SQL_PROMPT_PREFIX
+
+
+# Role definitions shared read-only by every agent_config
+AGENT_ROLES = (
+    {
+        'name': 'analyst',
+        'description': 'Data analyst for business intelligence',
+        'capabilities': ('sql_generation', 'data_analysis')
+    },
+    {
+        'name': 'engineer',
+        'description': 'Database engineer',
+        'capabilities': ('schema_design', 'query_optimization')
+    },
+)
+
+
+@pytest.fixture(scope="module")
+def mock_db_connection():
+    """Create a fake database connection"""
+    return SimpleNamespace(get_schema=lambda: {}, execute_query=lambda query, params=None: [])
 
 
 class TestAgentManager:
@@ -18,34 +41,19 @@ class TestAgentManager:
         return mock
     
     @pytest.fixture
-    def mock_db_connection(self):
-        """Create a mock database connection"""
-        mock = Mock()
-        mock.get_schema.return_value = {}
-        return mock
-    
-    @pytest.fixture
-    def agent_config(self):
+    def agent_config(self, tmp_path):
         """Sample agent configuration"""
         return {
             'max_iterations': 5,
-            'roles': [
-                {
-                    'name': 'analyst',
-                    'description': 'Data analyst for business intelligence',
-                    'capabilities': ['sql_generation', 'data_analysis']
-                },
-                {
-                    'name': 'engineer',
-                    'description': 'Database engineer',
-                    'capabilities': ['schema_design', 'query_optimization']
-                }
-            ]
+            'results_log_file': str(tmp_path / 'results.jsonl'),
+            'roles': AGENT_ROLES
         }
     
     @pytest.fixture
-    def agent_manager(self, mock_llm_manager, mock_db_connection, agent_config):
+    def agent_manager(self, mock_llm_manager, mock_db_connection, agent_config, tmp_path, monkeypatch):
         """Create an AgentManager instance for testing"""
+        # run() writes result_summary.txt to the working directory; keep it per test
+        monkeypatch.chdir(tmp_path)
         return AgentManager(agent_config, mock_llm_manager, mock_db_connection)
     
     def test_agent_manager_initialization(self, agent_manager, agent_config):
@@ -63,6 +71,12 @@ class TestAgentManager:
         assert 'sql_generation' in analyst_agent.capabilities
         assert analyst_agent.is_active is True
     
+    def test_agent_for_role(self, agent_manager):
+        """Test looking up agents by role"""
+        assert agent_manager.agent_for(AgentRole.ANALYST) is agent_manager.agents['analyst']
+        assert agent_manager.agent_for(AgentRole.ENGINEER) is agent_manager.agents['engineer']
+        assert agent_manager.agent_for(AgentRole.RESEARCHER) is None
+    
     def test_run_method_creates_initial_task(self, agent_manager):
         """Test that run method creates initial task"""
         objective = "Analyze sales data"
@@ -83,10 +97,62 @@ class TestAgentManager:
             assert agent_manager.current_objective == objective
             mock_create.assert_called_once_with(objective)
     
+    def test_run_async_completes_objective(self, agent_manager):
+        """Test that run_async executes tasks and stops once the objective is complete"""
+        agent_manager.llm_manager.agenerate = AsyncMock(return_value="YES")
+        
+        asyncio.run(agent_manager.run_async("Analyze sales data"))
+        
+        assert agent_manager.current_objective == "Analyze sales data"
+        assert agent_manager.task_history[0]['status'] == 'completed'
+        # initial task + task execution + follow-up tasks + completion check + summary
+        assert agent_manager.llm_manager.agenerate.await_count == 5
+        agent_manager.llm_manager.generate.assert_not_called()
+    
+    def test_run_appends_completed_tasks_to_results_log(self, agent_manager):
+        """Test that completed tasks are written to the results log as they finish"""
+        agent_manager.llm_manager.generate.return_value = "YES"
+        
+        agent_manager.run("Analyze sales data")
+        
+        records = list(agent_manager.result_log)
+        assert [record['task_id'] for record in records] == ['task_1']
+        assert records[0]['result']['status'] == 'success'
+        assert 'result' not in agent_manager.task_history[0]
+    
+    def test_each_run_starts_a_new_results_log(self, agent_manager):
+        """Test that a second run replaces the log and its count"""
+        agent_manager.llm_manager.generate.return_value = "YES"
+        
+        agent_manager.run("Analyze sales data")
+        agent_manager.run("Analyze sales data again")
+        
+        assert len(list(agent_manager.result_log)) == len(agent_manager.result_log) == 1
+    
+    def test_run_async_overlaps_follow_up_calls(self, agent_manager):
+        """Test that new-task generation and completion check run concurrently"""
+        in_flight = 0
+        max_in_flight = 0
+        
+        async def fake_agenerate(prompt, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "NO"
+        
+        agent_manager.llm_manager.agenerate = fake_agenerate
+        agent_manager.config['max_iterations'] = 1
+        
+        asyncio.run(agent_manager.run_async("Analyze sales data"))
+        
+        assert max_in_flight == 2
+    
     def test_get_next_task_returns_highest_priority(self, agent_manager):
         """Test that get_next_task returns highest priority task"""
         # Add tasks with different priorities
-        agent_manager.task_history = [
+        for task in [
             {
                 'task_id': 'task_1',
                 'priority': 'LOW',
@@ -102,10 +168,33 @@ class TestAgentManager:
                 'priority': 'MEDIUM',
                 'status': 'pending'
             }
-        ]
+        ]:
+            agent_manager._enqueue(task)
         
         next_task = agent_manager._get_next_task()
         assert next_task['task_id'] == 'task_2'  # HIGH priority
+        assert len(agent_manager.task_history) == 3
+    
+    def test_pending_tasks_drain_in_rank_then_insertion_order(self, agent_manager):
+        """Test the full pop order, with unknown priorities ranked after LOW"""
+        corpus = [('LOW', 'a'), ('UNKNOWN', 'b'), ('CRITICAL', 'c'), ('LOW', 'd'), ('CRITICAL', 'e')]
+        for priority, task_id in corpus:
+            agent_manager._enqueue({'task_id': task_id, 'priority': priority})
+        
+        order = [task['task_id'] for task in agent_manager._get_next_tasks(len(corpus))]
+        
+        assert order == ['c', 'e', 'a', 'd', 'b']
+        assert agent_manager._get_next_task() is None
+    
+    def test_get_next_task_is_fifo_within_priority(self, agent_manager):
+        """Test that tasks with equal priority are returned in insertion order"""
+        for task_id in ['task_1', 'task_2', 'task_3']:
+            agent_manager._enqueue({'task_id': task_id, 'priority': 'MEDIUM', 'status': 'pending'})
+        
+        order = [agent_manager._get_next_task()['task_id'] for _ in range(3)]
+        
+        assert order == ['task_1', 'task_2', 'task_3']
+        assert agent_manager._get_next_task() is None
     
     def test_execute_task_with_analyst(self, agent_manager):
         """Test task execution with analyst agent"""
@@ -141,6 +230,22 @@ class TestAgentManager:
             assert result['status'] == 'success'
             mock_execute.assert_called_once_with(task)
     
+    def test_execute_tasks_batches_same_kind_prompts(self, agent_manager):
+        """Test that same-kind tasks share one batched LLM call"""
+        tasks = [
+            {'task_name': f'Query {i}', 'task_description': f'Query number {i}', 'agent_role': 'analyst'}
+            for i in range(3)
+        ]
+        tasks.append({'task_name': 'Design', 'task_description': 'Design schema', 'agent_role': 'engineer'})
+        agent_manager.llm_manager.batch_generate.side_effect = lambda prompts: [p.split('Task: ')[1] for p in prompts]
+        
+        results = agent_manager._execute_tasks(tasks)
+        
+        assert agent_manager.llm_manager.batch_generate.call_count == 1
+        assert [result['sql_query'] for result in results[:3]] == [f'Query number {i}\n' for i in range(3)]
+        assert results[3]['type'] == 'schema_design'
+        assert all(task['status'] == 'completed' for task in tasks)
+    
     def test_execute_task_with_unknown_agent(self, agent_manager):
         """Test task execution with unknown agent role"""
         task = {
@@ -154,43 +259,108 @@ class TestAgentManager:
         assert result['status'] == 'error'
         assert 'No agent for role unknown_agent' in result['message']
     
+    def test_aexecute_task_awaits_the_llm(self, agent_manager):
+        """Test that async task execution uses agenerate rather than the blocking generate"""
+        agent_manager.llm_manager.agenerate = AsyncMock(return_value="SELECT 1")
+        task = {'task_name': 'Query', 'task_description': 'Count rows', 'agent_role': 'analyst'}
+        
+        result = asyncio.run(agent_manager._aexecute_task(task))
+        
+        assert result == {'type': 'sql_generation', 'sql_query': 'SELECT 1', 'status': 'success'}
+        assert task['status'] == 'completed'
+        agent_manager.llm_manager.generate.assert_not_called()
+        
+        unknown = {'task_name': 'Unknown task', 'task_description': 'Task', 'agent_role': 'unknown_agent'}
+        assert asyncio.run(agent_manager._aexecute_task(unknown))['status'] == 'error'
+    
     def test_create_initial_task(self, agent_manager):
         """Test initial task creation"""
         objective = "Analyze customer data"
         
-        with patch.object(agent_manager.llm_manager, 'generate') as mock_generate:
-            mock_generate.return_value = "Mock SQL query"
-            
-            task = agent_manager._create_initial_task(objective)
-            
-            assert task['task_name'] == f'Initial analysis of: {objective}'
-            assert task['priority'] == 'HIGH'
-            assert task['agent_role'] == 'analyst'
-            assert task['status'] == 'pending'
+        agent_manager.llm_manager.generate.return_value = "Mock SQL query"
+        
+        task = agent_manager._create_initial_task(objective)
+        
+        assert task['task_name'] == f'Initial analysis of: {objective}'
+        assert task['priority'] == 'HIGH'
+        assert task['agent_role'] == 'analyst'
+        assert task['status'] == 'pending'
+    
+    def test_create_new_tasks_parses_json_response(self, agent_manager):
+        """Test that follow-up tasks are parsed from JSON wrapped in prose"""
+        response = (
+            'Here are the next tasks:\n```json\n'
+            '[{"task_name": "Check indexes", "task_description": "List missing indexes",'
+            ' "priority": "high", "agent_role": "Engineer"},'
+            ' {"task_name": "Ignored"}, "not a task"]\n```'
+        )
+        
+        agent_manager.llm_manager.generate.return_value = response
+        tasks = agent_manager._create_new_tasks({'type': 'analysis', 'status': 'success'})
+        
+        assert [task['task_name'] for task in tasks] == ['Check indexes', 'Ignored']
+        assert tasks[0]['priority'] == 'HIGH'
+        assert tasks[0]['agent_role'] == 'engineer'
+        assert tasks[1]['priority'] == 'MEDIUM'
+        assert tasks[0]['task_id'] != tasks[1]['task_id']
+    
+    def test_task_prompts_share_static_prefix(self, agent_manager):
+        """Test that task prompts start with a byte-identical static prefix"""
+        tasks = [
+            {'task_description': 'Count active users'},
+            {'task_description': 'Find the top 10 products by revenue'}
+        ]
+        
+        prompts = [agent_manager._task_prompt(SQL_PROMPT_PREFIX, task) for task in tasks]
+        
+        for prompt, task in zip(prompts, tasks):
+            assert prompt.startswith(SQL_PROMPT_PREFIX)
+            assert prompt.endswith(f"Task: {task['task_description']}\n")
     
     def test_is_objective_complete_returns_true(self, agent_manager):
         """Test objective completion check returns True"""
         agent_manager.current_objective = "Analyze data"
         result = {'type': 'analysis', 'status': 'success'}
         
-        with patch.object(agent_manager.llm_manager, 'generate') as mock_generate:
-            mock_generate.return_value = "YES"
-            
-            is_complete = agent_manager._is_objective_complete(result)
-            
-            assert is_complete is True
+        agent_manager.llm_manager.generate.return_value = "YES"
+        
+        is_complete = agent_manager._is_objective_complete(result)
+        
+        assert is_complete is True
     
     def test_is_objective_complete_returns_false(self, agent_manager):
         """Test objective completion check returns False"""
         agent_manager.current_objective = "Analyze data"
         result = {'type': 'analysis', 'status': 'success'}
         
-        with patch.object(agent_manager.llm_manager, 'generate') as mock_generate:
-            mock_generate.return_value = "NO"
-            
-            is_complete = agent_manager._is_objective_complete(result)
-            
-            assert is_complete is False
+        agent_manager.llm_manager.generate.return_value = "NO"
+        
+        is_complete = agent_manager._is_objective_complete(result)
+        
+        assert is_complete is False
+    
+    def test_is_objective_complete_reuses_cached_decision(self, agent_manager):
+        """Test repeated results reuse the cached completion decision"""
+        agent_manager.current_objective = "Analyze data"
+        result = {'type': 'analysis', 'status': 'success'}
+        
+        agent_manager.llm_manager.generate.return_value = "YES"
+        
+        assert agent_manager._is_objective_complete(result) is True
+        assert agent_manager._is_objective_complete(dict(result)) is True
+        
+        assert agent_manager.llm_manager.generate.call_count == 1
+    
+    def test_is_objective_complete_without_cache(self, mock_llm_manager, mock_db_connection, agent_config):
+        """Test every check reaches the LLM when caching is disabled"""
+        agent_manager = AgentManager({**agent_config, 'llm_cache': False}, mock_llm_manager, mock_db_connection)
+        agent_manager.current_objective = "Analyze data"
+        result = {'type': 'analysis', 'status': 'success'}
+        
+        agent_manager._is_objective_complete(result)
+        agent_manager._is_objective_complete(result)
+        
+        assert mock_llm_manager.generate.call_count == 2
 
 
 class TestAgent:
@@ -209,7 +379,7 @@ class TestAgent:
         assert agent.name == "test_agent"
         assert agent.role == AgentRole.ANALYST
         assert agent.description == "Test agent description"
-        assert agent.capabilities == ["sql_generation", "data_analysis"]
+        assert agent.capabilities == frozenset({"sql_generation", "data_analysis"})
         assert agent.is_active is True
     
     def test_agent_default_values(self):
@@ -222,6 +392,19 @@ class TestAgent:
         )
         
         assert agent.is_active is True  # Default value
+    
+    def test_agent_is_immutable_and_hashable(self):
+        """Test Agent instances are frozen and usable as dict keys"""
+        agent = Agent(
+            name="test_agent",
+            role=AgentRole.ENGINEER,
+            description="Test agent",
+            capabilities=["schema_design"]
+        )
+        
+        with pytest.raises(AttributeError):
+            agent.is_active = False
+        assert {agent: 'engineer'}[agent] == 'engineer'
 
 
 class TestAgentRole:
@@ -0,0 +1,133 @@
+"""
+Unit tests for Configuration Manager
+"""
+
+import os
+import pickle
+import pytest
+from src.utils import config as config_module
+from src.utils.config import Config
+
+
+CONFIG_YAML = """\
+llm:
+  provider: openai
+  model: gpt-4
+  api_key: sk-test
+database:
+  type: sqlite
+  database_path: test.db
+agent:
+  max_iterations: 5
+task:
+  max_tasks: 10
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    """Path of a small config file"""
+    path = tmp_path / 'config.yaml'
+    path.write_text(CONFIG_YAML)
+    return str(path)
+
+
+@pytest.fixture
+def yaml_loads(monkeypatch):
+    """Count the times the YAML file is actually parsed"""
+    loads = []
+    load = config_module.yaml.load
+    monkeypatch.setattr(config_module.yaml, 'load', lambda *args, **kwargs: loads.append(1) or load(*args, **kwargs))
+    return loads
+
+
+class TestConfig:
+    """Test cases for Config class"""
+    
+    def test_loaded_on_first_use(self, config_path, yaml_loads):
+        """Test that the file is read lazily and only once"""
+        config = Config(config_path)
+        assert yaml_loads == []
+        
+        assert config.get('llm.model') == 'gpt-4'
+        assert config.agent == {'max_iterations': 5}
+        assert len(yaml_loads) == 1
+    
+    def test_missing_file_uses_defaults(self, tmp_path):
+        """Test that a missing config file falls back to the defaults"""
+        config = Config(str(tmp_path / 'missing.yaml'))
+        
+        assert config.get('database.type') == 'sqlite'
+        assert config.get('logging.level') == 'INFO'
+    
+    def test_parsed_file_reused_from_sidecar(self, config_path, yaml_loads):
+        """Test that an unchanged file is loaded from its pickled sidecar"""
+        Config(config_path).get('llm')
+        assert os.path.exists(f"{config_path}.cache.pkl")
+        
+        assert Config(config_path).get('llm.model') == 'gpt-4'
+        assert len(yaml_loads) == 1
+    
+    def test_sidecar_ignored_after_file_changes(self, config_path, yaml_loads):
+        """Test that a change to the file's mtime or size makes the sidecar stale"""
+        Config(config_path).get('llm')
+        
+        # Same size, newer mtime
+        with open(config_path, 'w') as f:
+            f.write(CONFIG_YAML.replace('gpt-4', 'gpt-5'))
+        stat = os.stat(config_path)
+        os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert Config(config_path).get('llm.model') == 'gpt-5'
+        
+        # Different size
+        with open(config_path, 'w') as f:
+            f.write(CONFIG_YAML.replace('gpt-4', 'gpt-4o'))
+        assert Config(config_path).get('llm.model') == 'gpt-4o'
+        assert len(yaml_loads) == 3
+    
+    def test_corrupt_sidecar_is_ignored(self, config_path):
+        """Test that an unreadable sidecar is replaced by a fresh parse"""
+        with open(f"{config_path}.cache.pkl", 'wb') as f:
+            f.write(b'not a pickle')
+        
+        assert Config(config_path).get('llm.model') == 'gpt-4'
+        with open(f"{config_path}.cache.pkl", 'rb') as f:
+            assert pickle.load(f)[1]['llm']['model'] == 'gpt-4'
+    
+    def test_save_removes_sidecar(self, config_path):
+        """Test that saving over the config file drops its sidecar"""
+        config = Config(config_path)
+        config.set('llm.model', 'gpt-5')
+        
+        config.save()
+        
+        assert not os.path.exists(f"{config_path}.cache.pkl")
+        assert Config(config_path).get('llm.model') == 'gpt-5'
+    
+    def test_set_clears_get_cache(self, config_path):
+        """Test that set() is seen by later get() calls, including for absent keys"""
+        config = Config(config_path)
+        assert config.get('llm.model') == 'gpt-4'
+        assert config.get('llm.organization', 'none') == 'none'
+        
+        config.set('llm.model', 'gpt-5')
+        config.set('llm.organization', 'acme')
+        
+        assert config.get('llm.model') == 'gpt-5'
+        assert config.get('llm.organization', 'none') == 'acme'
+    
+    def test_environment_references_in_strings(self, config_path, monkeypatch):
+        """Test that ${VAR} is replaced inside longer strings and unset variables are kept"""
+        monkeypatch.setenv('DB_USER', 'ada')
+        monkeypatch.setenv('DB_HOST', 'db.local')
+        monkeypatch.delenv('DB_MISSING', raising=False)
+        config = Config(config_path)
+        config.set('database.url', 'postgresql://${DB_USER}@${DB_HOST}:5432/app')
+        config.set('database.note', 'user ${DB_MISSING}')
+        
+        resolved = config.get_resolved_config()
+        
+        assert resolved['database']['url'] == 'postgresql://ada@db.local:5432/app'
+        assert resolved['database']['note'] == 'user ${DB_MISSING}'
+        assert resolved['llm'] is config.llm
+        assert config.resolve_environment_variables('${DB_USER}/${DB_HOST}') == 'ada/db.local'
@@ -0,0 +1,212 @@
+"""
+Unit tests for Database Connection
+"""
+
+import os
+import pytest
+from unittest.mock import MagicMock
+from src.database import connection as connection_module
+from src.database.connection import DatabaseConnection, PostgreSQLProvider, _is_read_statement
+
+
+@pytest.fixture
+def db_connection(tmp_path):
+    """SQLite database with an empty users table"""
+    connection = DatabaseConnection({'type': 'sqlite', 'database_path': str(tmp_path / 'test.db')})
+    connection.connect()
+    connection.execute_query("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    yield connection
+    connection.disconnect()
+
+
+def _run_script(connection, tmp_path, script):
+    path = tmp_path / 'script.sql'
+    path.write_text(script)
+    return connection.execute_sql_file(str(path))
+
+
+@pytest.mark.parametrize("query, is_read", [
+    ("SELECT * FROM users", True),
+    ("  show tables", True),
+    ("WITH recent AS (SELECT * FROM users) SELECT * FROM recent", True),
+    ("WITH recent AS (SELECT 'delete' AS verb) SELECT * FROM recent -- update later", True),
+    ("EXPLAIN SELECT * FROM users", True),
+    ("WITH gone AS (DELETE FROM users RETURNING *) SELECT COUNT(*) FROM gone", False),
+    ("WITH ids AS (SELECT 1 AS id) UPDATE users SET name = 'x' WHERE id IN (SELECT id FROM ids)", False),
+    ("EXPLAIN ANALYZE DELETE FROM users", False),
+    ("PRAGMA user_version = 3", False),
+    ("INSERT INTO users VALUES (1, 'Ada')", False),
+])
+def test_is_read_statement(query, is_read):
+    """Test which statements leave data_version alone"""
+    assert _is_read_statement(query) is is_read
+
+
+class TestSQLiteScripts:
+    """Test cases for running SQL files on SQLite"""
+    
+    def test_script_runs_in_one_transaction(self, db_connection, tmp_path):
+        """Test that a failing statement rolls back the whole script"""
+        script = "INSERT INTO users VALUES (1, 'Ada');\nINSERT INTO missing VALUES (2);"
+        
+        with pytest.raises(Exception):
+            _run_script(db_connection, tmp_path, script)
+        
+        assert db_connection.execute_query("SELECT COUNT(*) AS n FROM users") == [{'n': 0}]
+    
+    def test_script_with_its_own_transaction(self, db_connection, tmp_path):
+        """Test that scripts with BEGIN/COMMIT are run as written"""
+        script = (
+            "-- load users\n"
+            "BEGIN TRANSACTION;\n"
+            "INSERT INTO users VALUES (1, 'Ada');\n"
+            "INSERT INTO users VALUES (2, 'Grace; Hopper');\n"
+            "COMMIT;\n"
+        )
+        
+        assert _run_script(db_connection, tmp_path, script) == [{'affected_rows': 2}]
+        assert db_connection.execute_query("SELECT COUNT(*) AS n FROM users") == [{'n': 2}]
+    
+    def test_failed_script_transaction_is_rolled_back(self, db_connection, tmp_path):
+        """Test that a transaction the script opened is not left open on error"""
+        script = "BEGIN;\nINSERT INTO users VALUES (1, 'Ada');\nINSERT INTO missing VALUES (2);\nCOMMIT;"
+        
+        with pytest.raises(Exception):
+            _run_script(db_connection, tmp_path, script)
+        
+        assert not db_connection.provider.connection.in_transaction
+        assert db_connection.execute_query("SELECT COUNT(*) AS n FROM users") == [{'n': 0}]
+    
+    def test_trigger_bodies_stay_in_the_script_transaction(self, db_connection, tmp_path):
+        """Test that BEGIN ... END inside a trigger is not taken as transaction control"""
+        script = (
+            "CREATE TABLE audit (user_id INTEGER);\n"
+            "CREATE TRIGGER log_user AFTER INSERT ON users BEGIN\n"
+            "    INSERT INTO audit VALUES (new.id);\n"
+            "END;\n"
+            "INSERT INTO users VALUES (1, 'Ada');\n"
+        )
+        
+        _run_script(db_connection, tmp_path, script)
+        
+        assert db_connection.execute_query("SELECT user_id FROM audit") == [{'user_id': 1}]
+
+
+class TestDatabaseConnection:
+    """Test cases for the caching in DatabaseConnection"""
+    
+    def test_data_version_bumped_by_writes_only(self, db_connection):
+        """Test that reads leave data_version alone and writes and DDL bump it"""
+        version = db_connection.data_version
+        db_connection.execute_query("SELECT * FROM users")
+        assert db_connection.data_version == version
+        
+        db_connection.execute_query("INSERT INTO users VALUES (1, 'Ada')")
+        assert db_connection.data_version == version + 1
+        
+        db_connection.execute_query("CREATE TABLE audit (id INTEGER)")
+        assert db_connection.data_version == version + 2
+        
+        db_connection.execute_transaction(["SELECT * FROM users"])
+        assert db_connection.data_version == version + 2
+        
+        db_connection.execute_transaction(["DELETE FROM users"])
+        assert db_connection.data_version == version + 3
+        
+        db_connection.execute_query("WITH old AS (SELECT 1) DELETE FROM users")
+        assert db_connection.data_version == version + 4
+    
+    def test_schema_cached_until_ddl(self, db_connection, monkeypatch):
+        """Test that the schema is read once and re-read after a schema change"""
+        calls = []
+        get_schema = db_connection.provider.get_schema
+        monkeypatch.setattr(db_connection.provider, 'get_schema', lambda: calls.append(1) or get_schema())
+        
+        assert db_connection.list_tables() == ['users']
+        assert db_connection.list_tables() == ['users']
+        assert len(calls) == 1
+        
+        db_connection.execute_query("CREATE TABLE audit (id INTEGER)")
+        
+        assert sorted(db_connection.list_tables()) == ['audit', 'users']
+        assert len(calls) == 2
+    
+    def test_table_count_cleared_by_writes(self, db_connection):
+        """Test that cached row counts are dropped once the table is written to"""
+        assert db_connection.get_table_count('users') == 0
+        
+        db_connection.execute_query("INSERT INTO users VALUES (1, 'Ada')")
+        
+        assert db_connection.get_table_count('users') == 1
+    
+    def test_sql_file_reread_when_modified(self, db_connection, tmp_path):
+        """Test that a changed SQL file is read again rather than served from the cache"""
+        path = tmp_path / 'load.sql'
+        path.write_text("INSERT INTO users VALUES (1, 'Ada');")
+        db_connection.execute_sql_file(str(path))
+        
+        path.write_text("INSERT INTO users VALUES (2, 'Grace');")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        db_connection.execute_sql_file(str(path))
+        
+        assert db_connection.execute_query("SELECT id FROM users ORDER BY id") == [{'id': 1}, {'id': 2}]
+    
+    def test_get_connection_connects_on_demand(self, tmp_path):
+        """Test that get_connection opens the database when needed"""
+        connection = DatabaseConnection({'type': 'sqlite', 'database_path': str(tmp_path / 'lazy.db')})
+        
+        with connection.get_connection() as conn:
+            assert conn.execute_query("SELECT 1 AS one") == [{'one': 1}]
+        
+        connection.disconnect()
+
+
+class TestPostgreSQLProvider:
+    """Test cases for PostgreSQLProvider's commit and rollback handling"""
+    
+    @pytest.fixture
+    def conn(self):
+        """Mock SQLAlchemy connection returning one row per statement"""
+        conn = MagicMock()
+        result = conn.execute.return_value
+        result.returns_rows = True
+        result.mappings.return_value = [{'id': 1}]
+        return conn
+    
+    @pytest.fixture
+    def provider(self, conn, monkeypatch):
+        """Provider whose engine hands out the mock connection"""
+        monkeypatch.setattr(connection_module, 'text', lambda query: query)
+        provider = PostgreSQLProvider({})
+        provider.engine = MagicMock()
+        provider.engine.connect.return_value.__enter__.return_value = conn
+        return provider
+    
+    def test_write_returning_rows_is_committed(self, provider, conn):
+        """Test that INSERT ... RETURNING commits before the connection is returned"""
+        assert provider.execute_query("INSERT INTO users (name) VALUES ('Ada') RETURNING id") == [{'id': 1}]
+        conn.commit.assert_called_once()
+    
+    def test_write_without_rows_is_committed(self, provider, conn):
+        """Test that a plain write reports its row count and commits"""
+        conn.execute.return_value.returns_rows = False
+        conn.execute.return_value.rowcount = 3
+        
+        assert provider.execute_query("DELETE FROM users") == [{'affected_rows': 3}]
+        conn.commit.assert_called_once()
+    
+    def test_read_is_not_committed(self, provider, conn):
+        """Test that a SELECT does not commit"""
+        provider.execute_query("SELECT id FROM users")
+        conn.commit.assert_not_called()
+    
+    def test_failed_statement_in_session_is_rolled_back(self, provider, conn):
+        """Test that a failure inside session() leaves the connection usable"""
+        conn.execute.side_effect = [RuntimeError("syntax error"), conn.execute.return_value]
+        
+        with provider.session():
+            with pytest.raises(RuntimeError):
+                provider.execute_query("SELEC 1")
+            conn.rollback.assert_called_once()
+            assert provider.execute_query("SELECT id FROM users") == [{'id': 1}]
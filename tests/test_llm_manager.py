@@ -0,0 +1,340 @@
+"""
+Unit tests for LLM Manager
+"""
+
+import asyncio
+import contextlib
+import sys
+from types import SimpleNamespace
+import pytest
+from unittest.mock import Mock, AsyncMock
+from src.llm.llm_manager import LLMManager, LocalLLMProvider, OpenAIProvider, VLLMProvider
+
+
+def completion(*texts, order=None):
+    """Completions API response with one choice per text, listed in the given index order"""
+    order = range(len(texts)) if order is None else order
+    return SimpleNamespace(choices=[SimpleNamespace(index=i, text=texts[i]) for i in order])
+
+
+def chat_completion(content):
+    """Chat completions API response with a single message"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FakeTensor:
+    """Stand-in for a 2-D torch tensor of token ids"""
+    
+    device = 'cpu'
+    
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+    
+    @property
+    def shape(self):
+        return (len(self.rows), len(self.rows[0]))
+    
+    def to(self, device):
+        return self
+    
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self.rows[index]
+        rows, columns = index
+        return FakeTensor(row[columns] for row in self.rows[rows])
+
+
+class FakeTokenizer:
+    """Tokenizer with one token per word that pads on the side set in padding_side"""
+    
+    pad_token_id = 0
+    
+    def __init__(self):
+        self.padding_side = 'right'
+        self.vocab = {}
+        self.words = {}
+    
+    def encode_words(self, text):
+        ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.vocab) + 1
+                self.words[self.vocab[word]] = word
+            ids.append(self.vocab[word])
+        return ids
+    
+    def __call__(self, text, return_tensors=None, padding=False, truncation=False, max_length=None,
+                 add_special_tokens=True):
+        rows = [self.encode_words(t) for t in ([text] if isinstance(text, str) else text)]
+        width = max(len(row) for row in rows)
+        masks = []
+        for row in rows:
+            pad = [self.pad_token_id] * (width - len(row)) if padding else []
+            mask = [0] * len(pad) + [1] * len(row)
+            if self.padding_side == 'left':
+                row[:0] = pad
+                masks.append(mask)
+            else:
+                row.extend(pad)
+                masks.append(mask[::-1])
+        encoding = {'input_ids': FakeTensor(rows), 'attention_mask': FakeTensor(masks)}
+        return SimpleNamespace(input_ids=encoding['input_ids'], items=encoding.items)
+    
+    def decode(self, ids, skip_special_tokens=False):
+        return ' '.join(self.words[i] for i in ids if i != self.pad_token_id)
+    
+    def batch_decode(self, tensor, skip_special_tokens=False):
+        return [self.decode(row, skip_special_tokens) for row in tensor.rows]
+
+
+class FakeModel:
+    """Causal LM that answers 'answer <last prompt word>' and records its calls"""
+    
+    device = 'cpu'
+    
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.prefills = []
+        self.generate_calls = []
+    
+    def __call__(self, input_ids, use_cache=False):
+        self.prefills.append(input_ids.rows)
+        return SimpleNamespace(past_key_values=[['kv'] for _ in input_ids.rows[0]])
+    
+    def generate(self, **kwargs):
+        self.generate_calls.append(kwargs)
+        answer = self.tokenizer.encode_words('answer')
+        return FakeTensor(row + answer + row[-1:] for row in kwargs['input_ids'].rows)
+
+
+@pytest.fixture
+def openai_module(monkeypatch):
+    """Fake openai package whose clients record requests instead of sending them"""
+    module = Mock()
+    module.OpenAI.return_value.completions.create.return_value = completion("Mock response")
+    module.AsyncOpenAI.return_value.completions.create = AsyncMock(return_value=completion("Async response"))
+    monkeypatch.setitem(sys.modules, 'openai', module)
+    return module
+
+
+@pytest.fixture
+def torch_module(monkeypatch):
+    """Fake torch with just the functions the local provider calls"""
+    module = SimpleNamespace(
+        inference_mode=contextlib.nullcontext,
+        cat=lambda tensors, dim: FakeTensor([sum((t.rows[0] for t in tensors), [])]),
+        ones_like=lambda tensor: FakeTensor([1] * len(row) for row in tensor.rows),
+        cuda=SimpleNamespace(is_available=lambda: False),
+        float16='float16',
+        float32='float32'
+    )
+    monkeypatch.setitem(sys.modules, 'torch', module)
+    return module
+
+
+class TestOpenAIProvider:
+    """Test cases for OpenAIProvider class"""
+    
+    @pytest.fixture
+    def provider(self, openai_module):
+        """Create an OpenAIProvider with a fake client"""
+        openai_module.OpenAI.return_value.chat.completions.create.return_value = chat_completion("Mock response")
+        return OpenAIProvider({'api_key': 'sk-test', 'model': 'gpt-4', 'max_tokens': 64,
+                               'temperature': 0.2, 'timeout': 5})
+    
+    def test_request_kwargs(self, provider):
+        """Test that per-call overrides apply to known arguments only, never to the model"""
+        messages = [{"role": "user", "content": "Hello"}]
+        
+        assert provider._request_kwargs(messages, {}) == {
+            'model': 'gpt-4', 'max_tokens': 64, 'temperature': 0.2, 'timeout': 5, 'messages': messages
+        }
+        assert provider._request_kwargs(messages, {'max_tokens': 10, 'model': 'other', 'stream': True}) == {
+            'model': 'gpt-4', 'max_tokens': 10, 'temperature': 0.2, 'timeout': 5, 'messages': messages
+        }
+        assert provider._default_kwargs['max_tokens'] == 64
+    
+    def test_context_prefix_built_once_per_context(self, provider):
+        """Test that the system messages for a context are cached and reused"""
+        prefix = provider._context_prefix(["Schema", "Rules"])
+        
+        assert prefix == [{"role": "system", "content": "Schema"}, {"role": "system", "content": "Rules"}]
+        assert provider._context_prefix(["Schema", "Rules"]) is prefix
+        assert provider._context_prefix(["Schema"]) is not prefix
+    
+    def test_generate_with_context_payload(self, provider, openai_module):
+        """Test the messages sent with a cached context, which is not modified by the calls"""
+        create = openai_module.OpenAI.return_value.chat.completions.create
+        
+        assert provider.generate_with_context("First", ["Schema"]) == "Mock response"
+        provider.generate_with_context("Second", ["Schema"], temperature=0.0)
+        
+        assert create.call_args.kwargs == {
+            'model': 'gpt-4', 'max_tokens': 64, 'temperature': 0.0, 'timeout': 5,
+            'messages': [{"role": "system", "content": "Schema"}, {"role": "user", "content": "Second"}]
+        }
+        assert provider._context_prefix(["Schema"]) == [{"role": "system", "content": "Schema"}]
+    
+    def test_agenerate_with_context_uses_async_client(self, provider, openai_module):
+        """Test that the async path sends the same payload through the async client"""
+        create = openai_module.AsyncOpenAI.return_value.chat.completions.create = AsyncMock(
+            return_value=chat_completion("Async response"))
+        
+        assert asyncio.run(provider.agenerate_with_context("Hello", ["Schema"])) == "Async response"
+        create.assert_awaited_once_with(
+            model='gpt-4', max_tokens=64, temperature=0.2, timeout=5,
+            messages=[{"role": "system", "content": "Schema"}, {"role": "user", "content": "Hello"}]
+        )
+
+
+class TestLocalLLMProvider:
+    """Test cases for LocalLLMProvider class"""
+    
+    @pytest.fixture
+    def provider(self, torch_module, monkeypatch):
+        """Create a LocalLLMProvider around the fake tokenizer and model"""
+        monkeypatch.setattr(LocalLLMProvider, '_load_model', lambda self: None)
+        provider = LocalLLMProvider({'model_path': 'model', 'device': 'cpu', 'context_length': 16})
+        provider.tokenizer = FakeTokenizer()
+        provider.tokenizer.padding_side = 'left'
+        provider.model = FakeModel(provider.tokenizer)
+        return provider
+    
+    def test_load_model_pads_on_the_left(self, torch_module, monkeypatch):
+        """Test that the loaded tokenizer pads on the left and falls back to EOS for padding"""
+        tokenizer = SimpleNamespace(pad_token=None, eos_token='</s>', padding_side='right')
+        transformers = Mock()
+        transformers.AutoTokenizer.from_pretrained.return_value = tokenizer
+        monkeypatch.setitem(sys.modules, 'transformers', transformers)
+        
+        LocalLLMProvider({'model_path': 'model', 'device': 'cpu'})
+        
+        assert tokenizer.padding_side == 'left'
+        assert tokenizer.pad_token == '</s>'
+    
+    def test_batch_generate_slices_each_output(self, provider):
+        """Test that prompts share one left-padded generate call and each gets only its new tokens"""
+        assert provider.batch_generate(["show all users", "count"], max_tokens=8) == [
+            "answer users", "answer count"
+        ]
+        
+        assert len(provider.model.generate_calls) == 1
+        call = provider.model.generate_calls[0]
+        assert call['input_ids'].rows[1][:2] == [0, 0]
+        assert call['attention_mask'].rows == [[1, 1, 1], [0, 0, 1]]
+        assert call['max_new_tokens'] == 8
+    
+    def test_generate_is_a_batch_of_one(self, provider):
+        """Test that generate goes through the batched path"""
+        assert provider.generate("list orders") == "answer orders"
+        assert len(provider.model.generate_calls) == 1
+    
+    def test_context_prefill_is_reused(self, provider):
+        """Test that a repeated context is run through the model once and its cache is copied"""
+        assert provider.generate_with_context("list orders", ["schema"]) == "answer orders"
+        assert provider.generate_with_context("count users", ["schema"]) == "answer users"
+        
+        assert len(provider.model.prefills) == 1
+        context_ids, past_key_values = provider._kv_cache.get("schema\n\n")
+        for call in provider.model.generate_calls:
+            assert call['input_ids'].rows[0][:len(context_ids.rows[0])] == context_ids.rows[0]
+            assert call['past_key_values'] == past_key_values
+            assert call['past_key_values'] is not past_key_values
+        
+        provider.generate_with_context("count users", ["other schema"])
+        assert len(provider.model.prefills) == 2
+    
+    def test_long_context_falls_back_to_plain_generate(self, provider):
+        """Test that a context and prompt over context_length are sent without the cache"""
+        context = [" ".join(f"word{i}" for i in range(20))]
+        
+        assert provider.generate_with_context("count users", context) == "answer users"
+        assert 'past_key_values' not in provider.model.generate_calls[0]
+
+
+class TestVLLMProvider:
+    """Test cases for VLLMProvider class"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_vllm_env(self, monkeypatch):
+        """Run each test without VLLM_* variables from the environment"""
+        monkeypatch.delenv('VLLM_BASE_URL', raising=False)
+        monkeypatch.delenv('VLLM_API_KEY', raising=False)
+    
+    @pytest.fixture
+    def provider(self, openai_module):
+        """Create a VLLMProvider with a fake client"""
+        return VLLMProvider({'model': 'llama', 'max_tokens': 64, 'temperature': 0.2, 'timeout': 5})
+    
+    def test_selected_by_llm_manager(self, openai_module):
+        """Test that provider: vllm picks VLLMProvider with the default server address"""
+        manager = LLMManager({'provider': 'vllm', 'model': 'llama'})
+        
+        assert isinstance(manager.provider, VLLMProvider)
+        openai_module.OpenAI.assert_called_once_with(api_key='EMPTY', base_url='http://localhost:8000/v1')
+        openai_module.AsyncOpenAI.assert_called_once_with(api_key='EMPTY', base_url='http://localhost:8000/v1')
+        assert manager.get_model_info()['provider'] == 'vllm'
+    
+    def test_base_url_and_key_from_environment(self, openai_module, monkeypatch):
+        """Test that VLLM_BASE_URL and VLLM_API_KEY are used when the config has no value"""
+        monkeypatch.setenv('VLLM_BASE_URL', 'http://gpu-box:9000/v1')
+        monkeypatch.setenv('VLLM_API_KEY', 'secret')
+        
+        provider = VLLMProvider({'model': 'llama'})
+        
+        assert provider.base_url == 'http://gpu-box:9000/v1'
+        openai_module.OpenAI.assert_called_once_with(api_key='secret', base_url='http://gpu-box:9000/v1')
+    
+    def test_config_overrides_environment(self, openai_module, monkeypatch):
+        """Test that base_url and api_key in the config win over the environment"""
+        monkeypatch.setenv('VLLM_BASE_URL', 'http://gpu-box:9000/v1')
+        
+        VLLMProvider({'model': 'llama', 'base_url': 'http://other:8000/v1', 'api_key': 'key'})
+        
+        openai_module.OpenAI.assert_called_once_with(api_key='key', base_url='http://other:8000/v1')
+    
+    def test_model_is_required(self, openai_module):
+        """Test that a config without a model name is rejected"""
+        with pytest.raises(ValueError):
+            VLLMProvider({})
+    
+    def test_generate_payload(self, provider, openai_module):
+        """Test the completions request sent for one prompt, with per-call overrides"""
+        assert provider.generate("Hello", max_tokens=10) == "Mock response"
+        
+        openai_module.OpenAI.return_value.completions.create.assert_called_once_with(
+            model='llama', prompt="Hello", max_tokens=10, temperature=0.2, timeout=5
+        )
+    
+    def test_generate_with_context_prepends_context(self, provider, openai_module):
+        """Test that the context is joined in front of the prompt"""
+        provider.generate_with_context("Question", ["Schema", "Rules"])
+        
+        request = openai_module.OpenAI.return_value.completions.create.call_args.kwargs
+        assert request['prompt'] == "Schema\n\nRules\n\nQuestion"
+    
+    def test_batch_generate_sends_one_request(self, provider, openai_module):
+        """Test that a batch is one request and results follow the prompt order"""
+        create = openai_module.OpenAI.return_value.completions.create
+        create.return_value = completion("first", "second", "third", order=[2, 0, 1])
+        
+        assert provider.batch_generate(["a", "b", "c"]) == ["first", "second", "third"]
+        create.assert_called_once_with(
+            model='llama', prompt=["a", "b", "c"], max_tokens=64, temperature=0.2, timeout=5
+        )
+    
+    def test_agenerate_uses_async_client(self, provider, openai_module):
+        """Test that agenerate awaits the async client instead of a worker thread"""
+        assert asyncio.run(provider.agenerate("Hello")) == "Async response"
+        
+        openai_module.OpenAI.return_value.completions.create.assert_not_called()
+        openai_module.AsyncOpenAI.return_value.completions.create.assert_awaited_once_with(
+            model='llama', prompt="Hello", max_tokens=64, temperature=0.2, timeout=5
+        )
+    
+    def test_errors_are_returned_as_text(self, provider, openai_module):
+        """Test that a failed request is reported in the result for every prompt"""
+        openai_module.OpenAI.return_value.completions.create.side_effect = RuntimeError("server down")
+        
+        assert provider.generate("Hello") == "Error generating response: server down"
+        assert provider.batch_generate(["a", "b"]) == ["Error generating response: server down"] * 2
@@ -0,0 +1,281 @@
+"""
+Unit tests for Query Executor
+"""
+
+import threading
+import time
+import pytest
+from src.database.connection import DatabaseConnection
+from src.database.query_executor import QueryExecutor, _validation_error, parameterize_query
+
+
+USERS = [{'id': 1, 'name': 'Ada'}, {'id': 2, 'name': 'Grace'}]
+
+
+@pytest.fixture
+def db_connection(tmp_path):
+    """SQLite database with a small users table"""
+    connection = DatabaseConnection({'type': 'sqlite', 'database_path': str(tmp_path / 'test.db')})
+    connection.connect()
+    connection.execute_query("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    connection.execute_query("INSERT INTO users (id, name) VALUES (1, 'Ada'), (2, 'Grace')")
+    yield connection
+    connection.disconnect()
+
+
+@pytest.fixture
+def executor(db_connection):
+    """Create a QueryExecutor instance for testing"""
+    return QueryExecutor(db_connection)
+
+
+@pytest.fixture
+def sent_queries(db_connection, monkeypatch):
+    """Record the query text each call sends to the database connection"""
+    sent = []
+    execute_query = db_connection.execute_query
+    
+    def record(query, params=None):
+        sent.append(query)
+        return execute_query(query, params)
+    
+    monkeypatch.setattr(db_connection, 'execute_query', record)
+    return sent
+
+
+class FakeConcurrentConnection:
+    """Connection fake that allows concurrent queries and notes the threads used"""
+    
+    supports_concurrent_queries = True
+    data_version = 0
+    
+    def __init__(self):
+        self.threads = set()
+    
+    def execute_query(self, query, params=None):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        if 'missing' in query:
+            raise RuntimeError("no such table: missing")
+        return [{'query': query}]
+
+
+@pytest.mark.parametrize("query, template, params", [
+    ("SELECT * FROM t WHERE a = 'x' AND b = 2",
+     "SELECT * FROM t WHERE a = :p0 AND b = :p1", (('p0', 'x'), ('p1', 2))),
+    ("SELECT * FROM t WHERE name = 'O''Brien'", "SELECT * FROM t WHERE name = :p0", (('p0', "O'Brien"),)),
+    # Literals inside strings, quoted identifiers and comments
+    ("SELECT * FROM t WHERE note = 'a = 1'", "SELECT * FROM t WHERE note = :p0", (('p0', 'a = 1'),)),
+    ("SELECT 'id = 1' AS label FROM t", "SELECT 'id = 1' AS label FROM t", ()),
+    ('SELECT * FROM t WHERE "a = 1" = 2', 'SELECT * FROM t WHERE "a = 1" = :p0', (('p0', 2),)),
+    ("SELECT * FROM t -- WHERE a = 1\nWHERE b = 2", "SELECT * FROM t -- WHERE a = 1\nWHERE b = :p0", (('p0', 2),)),
+    ("SELECT * FROM t /* a = 'x' */ WHERE b = 'y'", "SELECT * FROM t /* a = 'x' */ WHERE b = :p0", (('p0', 'y'),)),
+    # Casts keep their literal, so the cast still applies to a constant
+    ("SELECT * FROM t WHERE d = '2024-01-01'::date", "SELECT * FROM t WHERE d = '2024-01-01'::date", ()),
+    ("SELECT * FROM t WHERE a > -5", "SELECT * FROM t WHERE a > :p0", (('p0', -5),)),
+    ("SELECT * FROM t WHERE name LIKE 'A%'", "SELECT * FROM t WHERE name LIKE :p0", (('p0', 'A%'),)),
+    ("SELECT * FROM t WHERE a <> 3 AND b != 4", "SELECT * FROM t WHERE a <> :p0 AND b != :p1", (('p0', 3), ('p1', 4))),
+    ("SELECT * FROM t WHERE price = 1.5", "SELECT * FROM t WHERE price = 1.5", ()),
+    ("SELECT k, COUNT(*) FROM t GROUP BY k HAVING COUNT(*) > 5",
+     "SELECT k, COUNT(*) FROM t GROUP BY k HAVING COUNT(*) > :p0", (('p0', 5),)),
+    # Only the top-level WHERE and HAVING are bound
+    ("UPDATE t SET a = 'x' WHERE id = 1", "UPDATE t SET a = 'x' WHERE id = :p0", (('p0', 1),)),
+    ("SELECT CASE WHEN x = 1 THEN 'a' END AS k, COUNT(*) FROM t GROUP BY CASE WHEN x = 1 THEN 'a' END",
+     "SELECT CASE WHEN x = 1 THEN 'a' END AS k, COUNT(*) FROM t GROUP BY CASE WHEN x = 1 THEN 'a' END", ()),
+    ("SELECT * FROM a JOIN b ON b.kind = 'x' WHERE a.id = 1",
+     "SELECT * FROM a JOIN b ON b.kind = 'x' WHERE a.id = :p0", (('p0', 1),)),
+    ("SELECT * FROM t WHERE id IN (SELECT id FROM u WHERE a = 1) AND b = 2",
+     "SELECT * FROM t WHERE id IN (SELECT id FROM u WHERE a = 1) AND b = :p0", (('p0', 2),)),
+    # A :name marker, even inside a literal, leaves the whole query alone
+    ("SELECT * FROM t WHERE note = 'at :p0' AND b = 2", "SELECT * FROM t WHERE note = 'at :p0' AND b = 2", ()),
+    ("SELECT * FROM t WHERE at = '10:30'", "SELECT * FROM t WHERE at = :p0", (('p0', '10:30'),)),
+    # DDL is left alone
+    ("CREATE TABLE t (a INT DEFAULT 1 CHECK (a = 1))", "CREATE TABLE t (a INT DEFAULT 1 CHECK (a = 1))", ()),
+])
+def test_parameterize_query(query, template, params):
+    """Test which literals become bind parameters"""
+    assert parameterize_query(query) == (template, params)
+
+
+@pytest.mark.parametrize("query, error", [
+    ("SELECT * FROM t", None),
+    ("WITH x AS (SELECT 1) SELECT * FROM x", None),
+    ("SELECT ')' FROM t", None),
+    ("select name from t", None),
+    ("SELECT 1", "SELECT query must contain FROM clause"),
+    ("SELECT 'from' AS x", "SELECT query must contain FROM clause"),
+    ("SELECT (a FROM t", "Unbalanced parentheses in query"),
+    ("SELECT a) FROM (t", "Unbalanced parentheses in query"),
+    ("-- SELECT\nEXPLAIN SELECT 1", "Query must contain a valid SQL command"),
+    ("", "Query must contain a valid SQL command"),
+])
+def test_validation_error(query, error):
+    """Test the first problem reported for a query"""
+    assert _validation_error(query) == error
+
+
+class TestQueryExecutor:
+    """Test cases for QueryExecutor class"""
+    
+    def test_execute_query(self, executor):
+        """Test running a SELECT"""
+        result = executor.execute_query("SELECT id, name FROM users ORDER BY id")
+        
+        assert result['success'] is True
+        assert result['results'] == USERS
+        assert result['row_count'] == 2
+    
+    def test_execute_query_failure(self, executor):
+        """Test that errors are reported in the result"""
+        result = executor.execute_query("SELECT * FROM missing")
+        
+        assert result['success'] is False
+        assert 'missing' in result['error']
+    
+    def test_literals_are_sent_as_parameters(self, executor, sent_queries):
+        """Test that compared literals reach the database as bind parameters"""
+        result = executor.execute_query("SELECT name FROM users WHERE name = 'Grace' OR name = 'a = 1'")
+        
+        assert sent_queries == ["SELECT name FROM users WHERE name = :p0 OR name = :p1"]
+        assert result['results'] == [{'name': 'Grace'}]
+    
+    def test_literals_sent_verbatim_when_disabled(self, db_connection, sent_queries):
+        """Test that parameterize_literals=False sends the query text unchanged"""
+        executor = QueryExecutor(db_connection, parameterize_literals=False)
+        query = "SELECT name FROM users WHERE id = 2"
+        
+        assert executor.execute_query(query)['results'] == [{'name': 'Grace'}]
+        assert sent_queries == [query]
+    
+    def test_columnar_results(self, executor):
+        """Test the column-list result shape"""
+        result = executor.execute_query("SELECT id, name FROM users ORDER BY id", columnar=True)
+        
+        assert result['results'] == {'columns': ['id', 'name'], 'rows': [[1, 'Ada'], [2, 'Grace']]}
+    
+    def test_repeated_select_is_served_from_cache(self, executor, sent_queries):
+        """Test that a repeated SELECT, even with different spacing, skips the database"""
+        first = executor.execute_query("SELECT id, name FROM users ORDER BY id")
+        second = executor.execute_query("SELECT  id,\n name FROM users ORDER BY id;")
+        
+        assert len(sent_queries) == 1
+        assert second['results'] == first['results'] == USERS
+    
+    def test_cache_disabled_with_zero_ttl(self, db_connection, sent_queries):
+        """Test that cache_ttl=0 sends every query"""
+        executor = QueryExecutor(db_connection, cache_ttl=0)
+        executor.execute_query("SELECT id FROM users")
+        executor.execute_query("SELECT id FROM users")
+        
+        assert len(sent_queries) == 2
+    
+    def test_cache_invalidated_by_write(self, executor):
+        """Test that a write through the connection makes cached results stale"""
+        query = "SELECT COUNT(*) AS n FROM users"
+        assert executor.execute_query(query)['results'] == [{'n': 2}]
+        
+        assert executor.execute_query("INSERT INTO users (id, name) VALUES (3, 'Linus')")['success']
+        
+        assert executor.execute_query(query)['results'] == [{'n': 3}]
+    
+    def test_cache_invalidated_by_cte_write(self, executor):
+        """Test that a write behind a WITH clause also makes cached results stale"""
+        query = "SELECT COUNT(*) AS n FROM users"
+        assert executor.execute_query(query)['results'] == [{'n': 2}]
+        
+        assert executor.execute_query("WITH old AS (SELECT 1 AS id) DELETE FROM users WHERE id IN (SELECT id FROM old)")['success']
+        
+        assert executor.execute_query(query)['results'] == [{'n': 1}]
+    
+    def test_invalidate_drops_cache(self, executor, sent_queries):
+        """Test that invalidate() forces the next SELECT to the database"""
+        executor.execute_query("SELECT id FROM users")
+        executor.invalidate()
+        executor.execute_query("SELECT id FROM users")
+        
+        assert len(sent_queries) == 2
+    
+    def test_cached_rows_are_copies(self, executor):
+        """Test that editing a returned row leaves the cached result intact"""
+        query = "SELECT id, name FROM users ORDER BY id"
+        first = executor.execute_query(query)
+        first['results'][0]['name'] = 'changed'
+        first['results'].clear()
+        
+        second = executor.execute_query(query)
+        second['results'][0]['name'] = 'changed again'
+        third = executor.execute_query(query)
+        
+        assert third['results'] == USERS
+    
+    def test_batch_with_writes_runs_in_order(self, executor):
+        """Test that a batch containing writes runs sequentially and stops at the first failure"""
+        results = executor.execute_batch([
+            "INSERT INTO users (id, name) VALUES (3, 'Linus')",
+            "SELECT COUNT(*) AS n FROM users",
+            "SELECT * FROM missing",
+            "INSERT INTO users (id, name) VALUES (4, 'Barbara')",
+        ])
+        
+        assert [result['success'] for result in results] == [True, True, False]
+        assert results[1]['results'] == [{'n': 3}]
+        assert executor.execute_query("SELECT COUNT(*) AS n FROM users")['results'] == [{'n': 3}]
+    
+    def test_read_only_batch_runs_concurrently(self):
+        """Test that independent reads run on the pool and are reported in order"""
+        connection = FakeConcurrentConnection()
+        executor = QueryExecutor(connection, max_workers=4)
+        queries = [f"SELECT * FROM t{i}" for i in range(4)]
+        
+        results = executor.execute_batch(queries)
+        
+        assert [result['results'] for result in results] == [[{'query': query}] for query in queries]
+        assert threading.get_ident() not in connection.threads
+    
+    def test_concurrent_batch_stops_at_first_failure(self):
+        """Test that concurrent results are cut off after the first failure, like sequential ones"""
+        executor = QueryExecutor(FakeConcurrentConnection(), max_workers=4)
+        
+        results = executor.execute_batch(["SELECT * FROM a", "SELECT * FROM missing", "SELECT * FROM c"])
+        
+        assert [result['success'] for result in results] == [True, False]
+    
+    def test_transaction_commits(self, executor):
+        """Test that a transaction returns the results of each statement"""
+        result = executor.execute_transaction([
+            "INSERT INTO users (id, name) VALUES (3, 'Linus')",
+            "SELECT name FROM users WHERE id = 3",
+        ])
+        
+        assert result['success'] is True
+        assert result['queries_executed'] == 2
+        assert result['results'][0]['results'] == [{'affected_rows': 1}]
+        assert result['results'][1]['results'] == [{'name': 'Linus'}]
+    
+    def test_failed_transaction_rolls_back(self, executor):
+        """Test that a failing statement undoes the earlier ones"""
+        result = executor.execute_transaction([
+            "INSERT INTO users (id, name) VALUES (3, 'Linus')",
+            "INSERT INTO missing VALUES (1)",
+        ])
+        
+        assert result['success'] is False
+        assert result['queries_executed'] == 0
+        assert executor.execute_query("SELECT COUNT(*) AS n FROM users")['results'] == [{'n': 2}]
+    
+    def test_validate_query(self, executor):
+        """Test the validate_query result shape"""
+        assert executor.validate_query("SELECT * FROM users")['valid'] is True
+        assert executor.validate_query("SELECT 1") == {
+            'valid': False,
+            'error': 'SELECT query must contain FROM clause'
+        }
+    
+    def test_get_table_stats(self, executor):
+        """Test table statistics on SQLite, where the row count is exact"""
+        stats = executor.get_table_stats('users')
+        
+        assert stats['success'] is True
+        assert stats['row_count'] == 2
+        assert stats['approximate'] is False
+        assert [col['column_name'] for col in stats['columns']] == ['id', 'name']
@@ -0,0 +1,176 @@
+"""
+Unit tests for Schema Manager
+"""
+
+import json
+from types import SimpleNamespace
+import pytest
+from src.database.connection import DatabaseConnection
+from src.database.schema_manager import SchemaManager
+
+
+@pytest.fixture
+def db_connection(tmp_path):
+    """SQLite database with a small users table"""
+    connection = DatabaseConnection({'type': 'sqlite', 'database_path': str(tmp_path / 'test.db')})
+    connection.connect()
+    connection.execute_query("CREATE TABLE users (id INTEGER NOT NULL, name TEXT DEFAULT 'anon')")
+    yield connection
+    connection.disconnect()
+
+
+@pytest.fixture
+def schema_reads(db_connection, monkeypatch):
+    """Count the schema reads that reach the database connection"""
+    reads = []
+    get_schema = db_connection.get_schema
+    monkeypatch.setattr(db_connection, 'get_schema', lambda: reads.append(1) or get_schema())
+    return reads
+
+
+@pytest.fixture
+def schema_manager(db_connection):
+    """Create a SchemaManager instance for testing"""
+    return SchemaManager(db_connection)
+
+
+class TestSchemaManager:
+    """Test cases for SchemaManager class"""
+    
+    def test_schema_loaded_on_first_use(self, schema_manager, schema_reads):
+        """Test that the schema is read lazily and only once"""
+        assert schema_manager.schema_loaded is False
+        assert schema_reads == []
+        
+        assert schema_manager.list_tables() == ['users']
+        assert schema_manager.get_table_columns('users') == ['id', 'name']
+        assert len(schema_reads) == 1
+    
+    def test_column_lookups(self, schema_manager):
+        """Test column metadata as read from SQLite"""
+        assert schema_manager.get_column_info('users', 'name') == {
+            'column_name': 'name',
+            'data_type': 'TEXT',
+            'is_nullable': True,
+            'column_default': "'anon'"
+        }
+        assert schema_manager.get_column_info('users', 'missing') is None
+        assert schema_manager.get_table_columns('missing') == []
+    
+    def test_create_table_updates_cache_without_reload(self, schema_manager, schema_reads):
+        """Test that create_table records the new table in place"""
+        schema_manager.list_tables()
+        
+        assert schema_manager.create_table('orders', [
+            {'name': 'id', 'type': 'INTEGER', 'nullable': False},
+            {'name': 'status', 'type': 'TEXT', 'default': "'new'"},
+        ])
+        
+        assert sorted(schema_manager.list_tables()) == ['orders', 'users']
+        assert schema_manager.get_table_columns('orders') == ['id', 'status']
+        assert len(schema_reads) == 1
+    
+    def test_ddl_updates_match_a_fresh_read(self, schema_manager, db_connection):
+        """Test that in-place updates describe columns the way the database does"""
+        schema_manager.list_tables()
+        schema_manager.create_table('orders', [
+            {'name': 'id', 'type': 'INTEGER', 'nullable': False},
+            {'name': 'status', 'type': 'TEXT', 'default': "'new'"},
+        ])
+        schema_manager.add_column('users', 'email', 'TEXT')
+        
+        assert schema_manager.get_schema() == SchemaManager(db_connection).get_schema()
+    
+    def test_ddl_updates_use_postgresql_nullability(self):
+        """Test that in-place updates on PostgreSQL report is_nullable as YES/NO"""
+        db_connection = SimpleNamespace(
+            db_type='postgresql',
+            get_schema=lambda: {'users': [
+                {'column_name': 'id', 'data_type': 'integer', 'is_nullable': 'NO', 'column_default': None}
+            ]},
+            execute_query=lambda query, params=None: [{'affected_rows': 0}]
+        )
+        schema_manager = SchemaManager(db_connection)
+        schema_manager.list_tables()
+        
+        schema_manager.add_column('users', 'email', 'text')
+        schema_manager.add_column('users', 'age', 'integer', nullable=False, default='0')
+        
+        assert [col['is_nullable'] for col in schema_manager.get_table_schema('users')] == ['NO', 'YES', 'NO']
+    
+    def test_add_and_drop_column(self, schema_manager, schema_reads):
+        """Test column changes on a loaded schema"""
+        schema_manager.list_tables()
+        
+        assert schema_manager.add_column('users', 'email', 'TEXT')
+        assert schema_manager.get_table_columns('users') == ['id', 'name', 'email']
+        
+        assert schema_manager.drop_column('users', 'name')
+        assert schema_manager.get_table_columns('users') == ['id', 'email']
+        assert schema_manager.get_column_info('users', 'name') is None
+        assert len(schema_reads) == 1
+    
+    def test_drop_table(self, schema_manager):
+        """Test that a dropped table leaves the cache"""
+        schema_manager.list_tables()
+        
+        assert schema_manager.drop_table('users')
+        
+        assert schema_manager.list_tables() == []
+        assert schema_manager.get_column_info('users', 'id') is None
+    
+    def test_failed_ddl_leaves_cache_unchanged(self, schema_manager):
+        """Test that statements the database rejects do not touch the cache"""
+        schema = schema_manager.get_schema()
+        
+        assert schema_manager.create_table('users', [{'name': 'id', 'type': 'INTEGER'}]) is False
+        assert schema_manager.add_column('missing', 'email', 'TEXT') is False
+        assert schema_manager.drop_table('missing') is False
+        
+        assert schema_manager.get_schema() == schema
+    
+    def test_ddl_before_first_load(self, schema_manager, schema_reads):
+        """Test that changes made before the first load are picked up by it"""
+        assert schema_manager.create_table('orders', [{'name': 'id', 'type': 'INTEGER'}])
+        assert schema_reads == []
+        
+        assert sorted(schema_manager.list_tables()) == ['orders', 'users']
+    
+    def test_validation_reused_until_schema_changes(self, schema_manager):
+        """Test that validate_schema results are cached and recomputed after DDL"""
+        first = schema_manager.validate_schema()
+        first['errors'].append('edited by caller')
+        
+        assert schema_manager.validate_schema() == {
+            'valid': True,
+            'errors': [],
+            'warnings': [],
+            'tables_checked': 1
+        }
+        
+        schema_manager.create_table('orders', [{'name': 'id', 'type': 'INTEGER'}])
+        
+        assert schema_manager.validate_schema()['tables_checked'] == 2
+    
+    def test_refresh_schema(self, schema_manager, db_connection):
+        """Test that refresh_schema picks up changes made behind the manager's back"""
+        schema_manager.list_tables()
+        db_connection.execute_query("CREATE TABLE audit (id INTEGER)")
+        
+        schema_manager.refresh_schema()
+        
+        assert sorted(schema_manager.list_tables()) == ['audit', 'users']
+    
+    def test_export_schema(self, schema_manager):
+        """Test the JSON and SQL exports"""
+        assert json.loads(schema_manager.export_schema('json')) == schema_manager.get_schema()
+        assert json.loads(schema_manager.export_schema('json', as_bytes=True)) == schema_manager.get_schema()
+        assert schema_manager.export_schema('sql') == (
+            "CREATE TABLE users (\n"
+            "  id INTEGER NOT NULL,\n"
+            "  name TEXT DEFAULT 'anon'\n"
+            ");"
+        )
+        
+        with pytest.raises(ValueError):
+            schema_manager.export_schema('xml')
@@ -0,0 +1,49 @@
+"""
+Unit tests for the shared SQL tokenizing helpers
+"""
+
+import re
+import pytest
+from src.utils.sql_tokens import SKIPPED_SPANS, is_skipped, split_statements
+
+
+@pytest.mark.parametrize("script, statements", [
+    ("SELECT 1; SELECT 2;", ("SELECT 1", "SELECT 2")),
+    ("SELECT 1", ("SELECT 1",)),
+    (";;\n ;", ()),
+    ("INSERT INTO t VALUES ('a;b'); SELECT 2", ("INSERT INTO t VALUES ('a;b')", "SELECT 2")),
+    ("INSERT INTO t VALUES ('it''s;'); SELECT 2", ("INSERT INTO t VALUES ('it''s;')", "SELECT 2")),
+    ('SELECT "odd;name" FROM t; SELECT 2', ('SELECT "odd;name" FROM t', "SELECT 2")),
+    ("SELECT 1 -- one; two\n; SELECT 2", ("SELECT 1 -- one; two", "SELECT 2")),
+    ("SELECT 1 /* one;\ntwo */; SELECT 2", ("SELECT 1 /* one;\ntwo */", "SELECT 2")),
+    ("CREATE FUNCTION f() AS $body$ BEGIN; END; $body$; SELECT 2",
+     ("CREATE FUNCTION f() AS $body$ BEGIN; END; $body$", "SELECT 2")),
+    ("SELECT $$;$$; SELECT 2", ("SELECT $$;$$", "SELECT 2")),
+])
+def test_split_statements(script, statements):
+    """Test that only semicolons outside quotes and comments end statements"""
+    assert split_statements(script) == statements
+
+
+@pytest.mark.parametrize("token, skipped", [
+    ("'text'", True),
+    ('"name"', True),
+    ("$tag$ body $tag$", True),
+    ("-- comment", True),
+    ("/* comment */", True),
+    ("SELECT", False),
+    ("(", False),
+])
+def test_is_skipped(token, skipped):
+    """Test that is_skipped recognizes each kind of skipped span"""
+    assert is_skipped(token) is skipped
+
+
+def test_skipped_spans_match_whole_spans():
+    """Test that each skipped span is consumed as a single token"""
+    pattern = re.compile(SKIPPED_SPANS, re.S | re.X)
+    sql = "'a''b' \"c\"\"d\" $x$ 'q' $x$ -- e\n/* f\n*/"
+    
+    tokens = [match.group() for match in pattern.finditer(sql)]
+    
+    assert tokens == ["'a''b'", '"c""d"', "$x$ 'q' $x$", "-- e", "/* f\n*/"]
@@ -0,0 +1,312 @@
+"""
+Unit tests for Task Manager
+"""
+
+import errno
+import io
+import json
+import sys
+import time
+import pytest
+from src.core.task_manager import TaskManager, TaskPriority, TaskStatus
+
+
+class TestTaskManager:
+    """Test cases for TaskManager class"""
+    
+    @pytest.fixture
+    def task_config(self, tmp_path):
+        """Sample task configuration"""
+        return {
+            'task_list_file': str(tmp_path / 'task_list.json'),
+            'result_summary_file': str(tmp_path / 'result_summary.json'),
+            'flush_batch_size': 3,
+            'flush_interval_s': 60
+        }
+    
+    @pytest.fixture
+    def task_manager(self, task_config):
+        """Create a TaskManager instance for testing"""
+        manager = TaskManager(task_config)
+        yield manager
+        manager.flush()
+    
+    def _create(self, manager, name='Task', priority=TaskPriority.MEDIUM):
+        return manager.create_task(name, f'{name} description', priority, 'analyst', 'output')
+    
+    def test_create_and_lookup(self, task_manager):
+        """Test task creation and lookup by id"""
+        task = self._create(task_manager)
+        
+        assert task.task_id == 'task_1'
+        assert task_manager.get_task_status('task_1') == TaskStatus.PENDING
+        assert task_manager.get_task_status('task_99') is None
+    
+    def test_to_json_dict(self, task_manager):
+        """Test the JSON view of a task"""
+        task = self._create(task_manager, 'First', TaskPriority.HIGH)
+        task_manager.complete_task(task.task_id, {'rows': [1, 2]})
+        
+        data = task.to_json_dict()
+        
+        assert data['priority'] == 'HIGH'
+        assert data['status'] == 'completed'
+        assert data['created_at'] == task.created_at.isoformat()
+        assert data['started_at'] is None
+        assert data['result'] is task.result
+        assert json.loads(json.dumps(data))['task_name'] == 'First'
+    
+    @pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need Python 3.10+")
+    def test_task_uses_slots(self, task_manager):
+        """Test that tasks carry no per-instance __dict__"""
+        task = self._create(task_manager)
+        
+        assert not hasattr(task, '__dict__')
+        with pytest.raises(AttributeError):
+            task.notes = 'not a field'
+    
+    def test_lifecycle(self, task_manager):
+        """Test moving tasks through their states"""
+        first = self._create(task_manager, 'First')
+        second = self._create(task_manager, 'Second')
+        
+        assert task_manager.start_task(first.task_id)
+        assert not task_manager.start_task(first.task_id)
+        assert task_manager.complete_task(first.task_id, {'rows': 1})
+        assert task_manager.fail_task(second.task_id, 'boom')
+        assert not task_manager.cancel_task('task_99')
+        
+        assert task_manager.get_task_status(first.task_id) == TaskStatus.COMPLETED
+        assert first.result == {'rows': 1}
+        assert second.error_message == 'boom'
+    
+    def test_next_task_by_priority(self, task_manager):
+        """Test that the highest priority pending task comes first"""
+        self._create(task_manager, 'Low', TaskPriority.LOW)
+        critical = self._create(task_manager, 'Critical', TaskPriority.CRITICAL)
+        self._create(task_manager, 'High', TaskPriority.HIGH)
+        
+        assert task_manager.get_next_task() is critical
+        assert task_manager.get_next_task() is critical
+        task_manager.start_task(critical.task_id)
+        assert task_manager.get_next_task().task_name == 'High'
+        
+        task_manager.reset_all_tasks()
+        assert task_manager.get_next_task() is critical
+    
+    def test_next_task_ties_by_creation(self, task_manager):
+        """Test that tasks of equal priority come out oldest first"""
+        first = self._create(task_manager, 'First')
+        second = self._create(task_manager, 'Second')
+        
+        assert task_manager.get_next_task() is first
+        task_manager.cancel_task(first.task_id)
+        assert task_manager.get_next_task() is second
+        task_manager.complete_task(second.task_id, {})
+        assert task_manager.get_next_task() is None
+    
+    def test_duplicate_tasks_are_merged(self, task_manager):
+        """Test that resubmitting active work returns the existing task"""
+        first = self._create(task_manager, 'First')
+        
+        assert self._create(task_manager, 'First') is first
+        task_manager.start_task(first.task_id)
+        assert self._create(task_manager, 'First') is first
+        assert len(task_manager.tasks) == 1
+        
+        task_manager.complete_task(first.task_id, {})
+        again = self._create(task_manager, 'First')
+        
+        assert again is not first
+        assert again.task_id == 'task_2'
+    
+    def test_deduplication_disabled(self, task_config):
+        """Test that deduplication can be turned off"""
+        task_config['deduplicate_tasks'] = False
+        manager = TaskManager(task_config)
+        
+        assert self._create(manager).task_id == 'task_1'
+        assert self._create(manager).task_id == 'task_2'
+        manager.flush()
+    
+    def test_filtered_queries(self, task_manager):
+        """Test the status, priority and agent queries"""
+        first = self._create(task_manager, 'First', TaskPriority.HIGH)
+        second = self._create(task_manager, 'Second')
+        task_manager.start_task(first.task_id)
+        
+        assert task_manager.get_tasks_by_status(TaskStatus.IN_PROGRESS) == [first]
+        assert task_manager.get_tasks_by_status(TaskStatus.PENDING) == [second]
+        assert task_manager.get_tasks_by_priority(TaskPriority.HIGH) == [first]
+        assert task_manager.get_tasks_by_agent('analyst') == [first, second]
+        assert task_manager.get_tasks_by_agent('engineer') == []
+        
+        task_manager.reset_all_tasks()
+        
+        assert task_manager.get_tasks_by_status(TaskStatus.IN_PROGRESS) == []
+        pending = task_manager.get_tasks_by_status(TaskStatus.PENDING)
+        assert sorted(task.task_id for task in pending) == ['task_1', 'task_2']
+    
+    def test_clear_completed_tasks(self, task_manager):
+        """Test that cleared tasks can no longer be looked up"""
+        first = self._create(task_manager, 'First')
+        second = self._create(task_manager, 'Second')
+        task_manager.complete_task(first.task_id, {})
+        
+        task_manager.clear_completed_tasks()
+        
+        assert task_manager.tasks == [second]
+        assert task_manager.get_task_status(first.task_id) is None
+        assert task_manager.get_task_status(second.task_id) == TaskStatus.PENDING
+    
+    def test_cleared_completion_survives_reload(self, task_config):
+        """Test that a completion cleared before the batched flush is still logged"""
+        manager = TaskManager(task_config)
+        self._create(manager)
+        manager.close()
+        
+        reopened = TaskManager(task_config)
+        reopened.complete_task('task_1', {'rows': 1})
+        reopened.clear_completed_tasks()
+        reopened.close()
+        
+        reloaded = TaskManager(task_config)
+        
+        assert [(task.task_id, task.status) for task in reloaded.tasks] == [('task_1', TaskStatus.COMPLETED)]
+    
+    def test_failed_write_is_retried(self, task_config):
+        """Test that tasks whose log write failed are written by the next flush"""
+        class FullDisk(io.StringIO):
+            def flush(self):
+                raise OSError(errno.ENOSPC, 'No space left on device')
+        
+        manager = TaskManager(task_config)
+        manager._log_fh = FullDisk()
+        self._create(manager, 'First')
+        manager.flush()
+        assert manager._log_fh is None
+        
+        self._create(manager, 'Second')
+        manager.close()
+        
+        reloaded = TaskManager(task_config)
+        
+        assert [task.task_name for task in reloaded.tasks] == ['First', 'Second']
+    
+    def test_statistics(self, task_manager):
+        """Test task statistics"""
+        first = self._create(task_manager, 'First', TaskPriority.HIGH)
+        self._create(task_manager, 'Second')
+        task_manager.complete_task(first.task_id, {})
+        
+        stats = task_manager.get_task_statistics()
+        assert stats['total_tasks'] == 2
+        assert stats['completed_tasks'] == 1
+        assert stats['pending_tasks'] == 1
+        assert stats['completion_rate'] == 50
+        assert stats['priority_distribution']['HIGH'] == 1
+        assert stats['priority_distribution']['MEDIUM'] == 1
+    
+    def test_writes_are_batched(self, task_manager, task_config):
+        """Test that changes reach the task file in batches"""
+        self._create(task_manager, 'First')
+        self._create(task_manager, 'Second')
+        
+        assert list(task_manager._dirty) == ['task_1', 'task_2']
+        with pytest.raises(FileNotFoundError):
+            open(task_manager.task_log_file)
+        
+        self._create(task_manager, 'Third')
+        task_manager._write_queue.join()
+        
+        assert not task_manager._dirty
+        with open(task_manager.task_log_file) as f:
+            assert [json.loads(line)['task_id'] for line in f] == ['task_1', 'task_2', 'task_3']
+    
+    def test_writer_flushes_on_interval(self, task_config):
+        """Test that a change below the batch size is written after flush_interval_s"""
+        task_config['flush_interval_s'] = 0.01
+        manager = TaskManager(task_config)
+        self._create(manager)
+        
+        deadline = time.monotonic() + 5
+        while manager._dirty and time.monotonic() < deadline:
+            time.sleep(0.01)
+        manager.close()
+        
+        assert not manager._dirty
+        with open(manager.task_log_file) as f:
+            assert json.loads(f.readline())['task_id'] == 'task_1'
+    
+    def test_compaction(self, task_config):
+        """Test that a full task log is folded into the snapshot"""
+        task_config['compact_log_bytes'] = 1
+        manager = TaskManager(task_config)
+        for name in ('First', 'Second', 'Third'):
+            self._create(manager, name)
+        manager.flush()
+        
+        with open(task_config['task_list_file']) as f:
+            snapshot = json.load(f)
+        assert snapshot['task_counter'] == 3
+        assert len(snapshot['tasks']) == 3
+        with open(manager.task_log_file) as f:
+            assert f.read() == ''
+        
+        manager.complete_task('task_2', {'rows': 2})
+        manager.close()
+        reloaded = TaskManager(task_config)
+        
+        assert [task.task_id for task in reloaded.tasks] == ['task_1', 'task_2', 'task_3']
+        assert reloaded.get_task_status('task_2') == TaskStatus.COMPLETED
+    
+    def test_load_legacy_task_list(self, task_manager, task_config):
+        """Test loading a task file written as a bare list of tasks"""
+        first = self._create(task_manager, 'First')
+        second = self._create(task_manager, 'Second')
+        with open(task_config['task_list_file'], 'w') as f:
+            json.dump([first.to_json_dict(), second.to_json_dict()], f, indent=2)
+        
+        reloaded = TaskManager(task_config)
+        
+        assert [task.task_name for task in reloaded.tasks] == ['First', 'Second']
+        assert reloaded.task_counter == 2
+    
+    def test_counter_survives_cleared_tasks(self, task_config):
+        """Test that ids of tasks dropped from the snapshot are not reused"""
+        task_config['compact_log_bytes'] = 1
+        manager = TaskManager(task_config)
+        for name in ('First', 'Second', 'Third'):
+            self._create(manager, name)
+        manager.complete_task('task_3', {})
+        manager.clear_completed_tasks()
+        manager.close()
+        
+        reloaded = TaskManager(task_config)
+        
+        assert self._create(reloaded, 'Fourth').task_id == 'task_4'
+    
+    def test_load_skips_partial_log_line(self, task_manager, task_config):
+        """Test that a torn last log entry does not stop the replay"""
+        self._create(task_manager, 'First')
+        task_manager.close()
+        with open(task_manager.task_log_file, 'a') as f:
+            f.write('{"task_id": "task_2", "task_na')
+        
+        reloaded = TaskManager(task_config)
+        
+        assert [task.task_name for task in reloaded.tasks] == ['First']
+    
+    def test_reload(self, task_manager, task_config):
+        """Test that flushed tasks are restored by a new manager"""
+        first = self._create(task_manager, 'First', TaskPriority.HIGH)
+        self._create(task_manager, 'Second')
+        task_manager.complete_task(first.task_id, {'rows': 1})
+        task_manager.flush()
+        
+        reloaded = TaskManager(task_config)
+        
+        assert [task.task_name for task in reloaded.tasks] == ['First', 'Second']
+        assert reloaded.get_task_status('task_1') == TaskStatus.COMPLETED
+        assert reloaded._get_task_by_id('task_1').result == {'rows': 1}
+        assert self._create(reloaded).task_id == 'task_3'
@@ -2,53 +2,77 @@
 Unit tests for Text-to-SQL Converter
 """
 
+import sys
+from collections import deque
+from types import SimpleNamespace
 import pytest
 from unittest.mock import Mock, patch
 from src.utils.text_to_sql import TextToSQLConverter, SQLQuery
 
 
-class TestTextToSQLConverter:
-    """Test cases for TextToSQLConverter class"""
-    
-    @pytest.fixture
-    def mock_llm_manager(self):
-        """Create a mock LLM manager"""
-        mock = Mock()
-        mock.generate.return_value = "SELECT * FROM users WHERE active = true"
-        return mock
+# (query, query_type, tables) of the SELECT used in conversion tests
+EXPECTED_SELECT = ("SELECT * FROM users WHERE active = true", "SELECT", ("users",))
+
+
+class FakeLLM:
+    """LLM manager fake that answers with queued responses, then a default"""
     
-    @pytest.fixture
-    def mock_db_connection(self):
-        """Create a mock database connection"""
-        mock = Mock()
-        mock.get_schema.return_value = {
-            'users': [
-                {
-                    'column_name': 'id',
-                    'data_type': 'integer',
-                    'is_nullable': False,
-                    'column_default': None
-                },
-                {
-                    'column_name': 'name',
-                    'data_type': 'varchar',
-                    'is_nullable': True,
-                    'column_default': None
-                },
-                {
-                    'column_name': 'active',
-                    'data_type': 'boolean',
-                    'is_nullable': True,
-                    'column_default': 'true'
-                }
-            ]
-        }
-        return mock
+    def __init__(self, default: str):
+        self.default = default
+        self.responses = deque()
     
-    @pytest.fixture
-    def converter(self, mock_llm_manager, mock_db_connection):
-        """Create a TextToSQLConverter instance for testing"""
-        return TextToSQLConverter(mock_llm_manager, mock_db_connection)
+    def generate(self, prompt, **kwargs):
+        return self.responses.popleft() if self.responses else self.default
+
+
+@pytest.fixture(scope="module")
+def mock_llm_manager():
+    """Create a fake LLM manager"""
+    return FakeLLM("SELECT * FROM users WHERE active = true")
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_responses(mock_llm_manager):
+    """Drop responses a previous test queued but did not consume"""
+    mock_llm_manager.responses.clear()
+
+
+@pytest.fixture(scope="module")
+def mock_db_connection():
+    """Create a fake database connection"""
+    schema = {
+        'users': [
+            {
+                'column_name': 'id',
+                'data_type': 'integer',
+                'is_nullable': False,
+                'column_default': None
+            },
+            {
+                'column_name': 'name',
+                'data_type': 'varchar',
+                'is_nullable': True,
+                'column_default': None
+            },
+            {
+                'column_name': 'active',
+                'data_type': 'boolean',
+                'is_nullable': True,
+                'column_default': 'true'
+            }
+        ]
+    }
+    return SimpleNamespace(get_schema=lambda: schema, execute_query=lambda query, params=None: [])
+
+
+@pytest.fixture(scope="module")
+def converter(mock_llm_manager, mock_db_connection):
+    """Create a TextToSQLConverter instance for testing"""
+    return TextToSQLConverter(mock_llm_manager, mock_db_connection)
+
+
+class TestTextToSQLConverter:
+    """Test cases for TextToSQLConverter class"""
     
     def test_converter_initialization(self, converter, mock_db_connection):
         """Test TextToSQLConverter initialization"""
@@ -56,19 +80,44 @@ class TestTextToSQLConverter:
         assert converter.db_connection is not None
         assert 'users' in converter.schema_cache
     
+    def test_schema_loaded_on_first_use(self, mock_llm_manager):
+        """Test that the schema is read lazily and only once"""
+        db_connection = Mock()
+        db_connection.get_schema.return_value = {}
+        converter = TextToSQLConverter(mock_llm_manager, db_connection)
+        db_connection.get_schema.assert_not_called()
+        
+        converter._format_schema_context()
+        converter._calculate_confidence("SELECT * FROM users", ["users"])
+        db_connection.get_schema.assert_called_once()
+        
+        converter.reload_schema()
+        assert db_connection.get_schema.call_count == 2
+    
+    def test_empty_refresh_keeps_schema(self, mock_llm_manager, mock_db_connection):
+        """Test that a refresh reading no tables (a failed catalog read) keeps the old schema"""
+        db_connection = Mock()
+        db_connection.get_schema.return_value = mock_db_connection.get_schema()
+        converter = TextToSQLConverter(mock_llm_manager, db_connection)
+        context = converter._format_schema_context()
+        
+        db_connection.get_schema.return_value = {}
+        converter._refresh_schema()
+        
+        assert 'users' in converter.schema_cache
+        assert converter._format_schema_context() == context
+    
     def test_convert_basic_query(self, converter):
         """Test basic text to SQL conversion"""
         text = "Show me all active users"
         
         with patch.object(converter, '_generate_sql') as mock_generate:
-            mock_generate.return_value = "SELECT * FROM users WHERE active = true"
+            mock_generate.return_value = EXPECTED_SELECT[0]
             
             result = converter.convert(text)
             
             assert isinstance(result, SQLQuery)
-            assert result.query == "SELECT * FROM users WHERE active = true"
-            assert result.query_type == "SELECT"
-            assert "users" in result.tables
+            assert (result.query, result.query_type, result.tables) == EXPECTED_SELECT
     
     def test_format_schema_context(self, converter):
         """Test schema context formatting"""
@@ -79,79 +128,49 @@ class TestTextToSQLConverter:
         assert "name: varchar NULL" in context
         assert "active: boolean NULL DEFAULT true" in context
     
-    def test_extract_sql_from_response(self, converter):
+    @pytest.mark.parametrize("response", [
+        "```sql\nSELECT * FROM users\n```",  # markdown code block
+        "SQL: SELECT * FROM users",
+        "Query: SELECT * FROM users",
+        "SELECT * FROM users",  # already clean
+    ])
+    def test_extract_sql_from_response(self, converter, response):
         """Test SQL extraction from LLM response"""
-        # Test with markdown code blocks
-        response = "```sql\nSELECT * FROM users\n```"
-        sql = converter._extract_sql_from_response(response)
-        assert sql == "SELECT * FROM users"
-        
-        # Test with SQL prefix
-        response = "SQL: SELECT * FROM users"
-        sql = converter._extract_sql_from_response(response)
-        assert sql == "SELECT * FROM users"
-        
-        # Test with Query prefix
-        response = "Query: SELECT * FROM users"
-        sql = converter._extract_sql_from_response(response)
-        assert sql == "SELECT * FROM users"
-        
-        # Test clean SQL
-        response = "SELECT * FROM users"
-        sql = converter._extract_sql_from_response(response)
-        assert sql == "SELECT * FROM users"
+        assert converter._extract_sql_from_response(response) == "SELECT * FROM users"
     
-    def test_parse_sql_select(self, converter):
-        """Test parsing SELECT query"""
-        sql = "SELECT id, name FROM users WHERE active = true"
+    @pytest.mark.parametrize("sql, query_type, columns, condition", [
+        ("SELECT id, name FROM users WHERE active = true", "SELECT", ["id", "name"], "active = true"),
+        ("INSERT INTO users (name, active) VALUES ('John', true)", "INSERT", [], None),
+        ("UPDATE users SET active = false WHERE id = 1", "UPDATE", [], "id = 1"),
+        ("DELETE FROM users WHERE id = 1", "DELETE", [], "id = 1"),
+        ('SELECT * FROM "users" WHERE id = 1', "SELECT", [], "id = 1"),  # quoted table
+    ])
+    def test_parse_sql(self, converter, sql, query_type, columns, condition):
+        """Test parsing each kind of query"""
         result = converter._parse_sql(sql)
         
-        assert result.query_type == "SELECT"
+        assert isinstance(result.tables, tuple)
+        assert result.query_type == query_type
         assert "users" in result.tables
-        assert "id" in result.columns
-        assert "name" in result.columns
-        assert "active = true" in result.conditions
+        for column in columns:
+            assert column in result.columns
+        if condition is not None:
+            assert condition in result.conditions
         assert result.confidence > 0.0
     
-    def test_parse_sql_insert(self, converter):
-        """Test parsing INSERT query"""
-        sql = "INSERT INTO users (name, active) VALUES ('John', true)"
-        result = converter._parse_sql(sql)
-        
-        assert result.query_type == "INSERT"
-        assert "users" in result.tables
-        assert result.confidence > 0.0
-    
-    def test_parse_sql_update(self, converter):
-        """Test parsing UPDATE query"""
-        sql = "UPDATE users SET active = false WHERE id = 1"
-        result = converter._parse_sql(sql)
-        
-        assert result.query_type == "UPDATE"
-        assert "users" in result.tables
-        assert "id = 1" in result.conditions
-        assert result.confidence > 0.0
-    
-    def test_parse_sql_delete(self, converter):
-        """Test parsing DELETE query"""
-        sql = "DELETE FROM users WHERE id = 1"
-        result = converter._parse_sql(sql)
-        
-        assert result.query_type == "DELETE"
-        assert "users" in result.tables
-        assert "id = 1" in result.conditions
-        assert result.confidence > 0.0
-    
-    def test_detect_query_type(self, converter):
+    @pytest.mark.parametrize("sql, query_type", [
+        ("SELECT * FROM users", "SELECT"),
+        ("INSERT INTO users", "INSERT"),
+        ("UPDATE users SET", "UPDATE"),
+        ("DELETE FROM users", "DELETE"),
+        ("CREATE TABLE users", "CREATE"),
+        ("ALTER TABLE users", "ALTER"),
+        ("DROP TABLE users", "DROP"),
+        ("INVALID QUERY", "UNKNOWN"),
+    ])
+    def test_detect_query_type(self, converter, sql, query_type):
         """Test query type detection"""
-        assert converter._detect_query_type("SELECT * FROM users") == "SELECT"
-        assert converter._detect_query_type("INSERT INTO users") == "INSERT"
-        assert converter._detect_query_type("UPDATE users SET") == "UPDATE"
-        assert converter._detect_query_type("DELETE FROM users") == "DELETE"
-        assert converter._detect_query_type("CREATE TABLE users") == "CREATE"
-        assert converter._detect_query_type("ALTER TABLE users") == "ALTER"
-        assert converter._detect_query_type("DROP TABLE users") == "DROP"
-        assert converter._detect_query_type("INVALID QUERY") == "UNKNOWN"
+        assert converter._detect_query_type(sql) == query_type
     
     def test_extract_tables(self, converter):
         """Test table extraction from SQL"""
@@ -170,6 +189,10 @@ class TestTextToSQLConverter:
         sql = "UPDATE users SET name = 'John'"
         tables = converter._extract_tables(sql)
         assert "users" in tables
+        
+        # Quoted identifiers
+        sql = 'SELECT * FROM "users" JOIN "order ""items""" ON true WHERE id = 1'
+        assert converter._extract_tables(sql) == ["users", 'order "items"']
     
     def test_extract_columns(self, converter):
         """Test column extraction from SQL"""
@@ -235,53 +258,50 @@ class TestTextToSQLConverter:
         confidence = converter._calculate_confidence(sql, tables)
         assert confidence < 1.0
     
-    def test_validate_sql_success(self, converter):
+    def test_validate_sql_success(self, converter, monkeypatch):
         """Test SQL validation success"""
         sql = "SELECT * FROM users"
+        monkeypatch.setattr(converter.db_connection, 'execute_query',
+                            lambda query, params=None: [{"id": 1, "name": "John"}])
         
-        with patch.object(converter.db_connection, 'execute_query') as mock_execute:
-            mock_execute.return_value = [{"id": 1, "name": "John"}]
-            
-            is_valid, message = converter.validate_sql(sql)
-            
-            assert is_valid is True
-            assert "valid" in message.lower()
+        is_valid, message = converter.validate_sql(sql)
+        
+        assert is_valid is True
+        assert "valid" in message.lower()
     
-    def test_validate_sql_failure(self, converter):
+    def test_validate_sql_failure(self, converter, monkeypatch):
         """Test SQL validation failure"""
         sql = "SELECT * FROM non_existent_table"
         
-        with patch.object(converter.db_connection, 'execute_query') as mock_execute:
-            mock_execute.side_effect = Exception("Table does not exist")
-            
-            is_valid, message = converter.validate_sql(sql)
-            
-            assert is_valid is False
-            assert "failed" in message.lower()
+        def execute_query(query, params=None):
+            raise Exception("Table does not exist")
+        
+        monkeypatch.setattr(converter.db_connection, 'execute_query', execute_query)
+        
+        is_valid, message = converter.validate_sql(sql)
+        
+        assert is_valid is False
+        assert "failed" in message.lower()
     
     def test_optimize_sql(self, converter):
         """Test SQL optimization"""
         sql = "SELECT * FROM users WHERE active = true"
+        converter.llm_manager.responses.append("SELECT id, name FROM users WHERE active = true LIMIT 100")
         
-        with patch.object(converter.llm_manager, 'generate') as mock_generate:
-            mock_generate.return_value = "SELECT id, name FROM users WHERE active = true LIMIT 100"
-            
-            optimized = converter.optimize_sql(sql)
-            
-            assert "LIMIT" in optimized
-            assert optimized != sql
+        optimized = converter.optimize_sql(sql)
+        
+        assert "LIMIT" in optimized
+        assert optimized != sql
     
     def test_explain_sql(self, converter):
         """Test SQL explanation"""
         sql = "SELECT * FROM users WHERE active = true"
+        converter.llm_manager.responses.append("This query retrieves all active users from the users table.")
         
-        with patch.object(converter.llm_manager, 'generate') as mock_generate:
-            mock_generate.return_value = "This query retrieves all active users from the users table."
-            
-            explanation = converter.explain_sql(sql)
-            
-            assert "retrieves" in explanation
-            assert "users" in explanation
+        explanation = converter.explain_sql(sql)
+        
+        assert "retrieves" in explanation
+        assert "users" in explanation
 
 
 class TestSQLQuery:
@@ -292,17 +312,31 @@ class TestSQLQuery:
         query = SQLQuery(
             query="SELECT * FROM users",
             query_type="SELECT",
-            tables=["users"],
-            columns=["*"],
-            conditions=[],
+            tables=("users",),
+            columns=("*",),
+            conditions=(),
             explanation="Retrieves all users",
             confidence=0.9
         )
         
         assert query.query == "SELECT * FROM users"
         assert query.query_type == "SELECT"
-        assert query.tables == ["users"]
-        assert query.columns == ["*"]
-        assert query.conditions == []
+        assert query.tables == ("users",)
+        assert query.columns == ("*",)
+        assert query.conditions == ()
         assert query.explanation == "Retrieves all users"
-        assert query.confidence == 0.9 
\ No newline at end of file
+        assert query.confidence == 0.9
+    
+    @pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need Python 3.10+")
+    def test_sql_query_uses_slots(self):
+        """Test that SQLQuery instances carry no per-instance __dict__"""
+        query = SQLQuery("SELECT 1", "SELECT", (), (), (), "", 1.0)
+        
+        assert not hasattr(query, '__dict__')
+    
+    def test_sql_query_is_frozen(self):
+        """Test that SQLQuery fields cannot be reassigned"""
+        query = SQLQuery("SELECT 1", "SELECT", (), (), (), "", 1.0)
+        
+        with pytest.raises(AttributeError):
+            query.confidence = 0.5